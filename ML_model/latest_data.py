@@ -1,5 +1,4 @@
 import requests # Import the requests library for making HTTP requests to external APIs
-import pandas as pd # Import the pandas library, although not strictly used in this specific file, it's a common dependency for data handling
 
 def fetch_latest_ohlcv_from_binance():
     """
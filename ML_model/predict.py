@@ -1,10 +1,16 @@
-import joblib # Used for loading pre-trained machine learning models
-import pandas as pd # Data manipulation library, used for creating DataFrames
+import functools
 from ML_model.latest_data import get_latest_btc_input # Custom function to fetch the latest data for prediction input
 
-# Load the pre-trained Random Forest Regressor model from the specified path.
-# This avoids retraining the model every time a prediction is needed.
-model = joblib.load("ML_model/model_btc_e.pkl")
+MODEL_PATH = "ML_model/model_btc_e.pkl"
+
+
+@functools.lru_cache(maxsize=None)
+def load_model():
+    # Load the pre-trained Random Forest Regressor model from the specified path.
+    # Loaded once, on the first prediction rather than at startup: joblib and
+    # scikit-learn take over a second to import and most sessions never predict.
+    import joblib # Used for loading pre-trained machine learning models
+    return joblib.load(MODEL_PATH)
 
 # Define an asynchronous function to handle Bitcoin price prediction requests.
 # 'bot' is the Telegram Bot API instance, 'user_id' is the chat ID to send the message to.
@@ -12,6 +18,7 @@ async def predict_btc(bot , user_id):
     # Call a custom function to get the most recent Bitcoin market data.
     # This data will serve as input features for the ML model.
     latest_data = get_latest_btc_input()
+    import pandas as pd # Data manipulation library, used for creating DataFrames
 
     # Convert the dictionary of latest data into a Pandas DataFrame.
     # The ML model expects its input in a DataFrame format with feature columns matching its training.
@@ -23,7 +30,7 @@ async def predict_btc(bot , user_id):
 
     # Use the loaded ML model to make a prediction on the prepared input data.
     # .predict() returns an array, so [0] extracts the single predicted value.
-    prediction = model.predict(input_df)[0]
+    prediction = load_model().predict(input_df)[0]
 
     # Construct the message string to be sent to the user via Telegram.
     # It includes the predicted close price and the latest snapshot of market data.
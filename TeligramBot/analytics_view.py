@@ -0,0 +1,245 @@
+"""
+Rendering for /View_full_analytics.
+
+Each asset report is made of four parts (header, recent prices, threshold
+changes, hedge logs). Every part is rendered with a single `"\\n".join` and
+cached per (user, asset) together with a cheap fingerprint of the data it was
+built from, so a part is only re-rendered when its own data changed, e.g. a
+new price tick does not re-render the hedge log.
+
+Threshold changes and hedge logs are paged (newest first). The summary shows
+the newest page and inline buttons (`an:<asset>:<section>:<page>`) let the
+user page through older entries; `handlers.button_callback` answers them with
+`render_history_page`. Several asset summaries are packed into one message up
+to Telegram's 4096 character limit.
+"""
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+MAX_MESSAGE_LEN = 4096  # Telegram's hard limit for a text message.
+PAGE_SIZE = 10  # History entries per page.
+RECENT_PRICES = 5  # Price history entries shown in the summary.
+CALLBACK_PREFIX = "an"
+
+SECTIONS = {
+    "thr": ("Threshold Changes", "risk_threshold_history", "No threshold change history."),
+    "hedge": ("Hedge Logs", "hedge_logs", "No hedge logs available."),
+}
+
+# (user_id, asset, part) -> (fingerprint, rendered text)
+_cache = {}
+
+
+def _format_threshold(t: dict) -> str:
+    return f" - {t['time']}: {t['old_threshold']:.2f}% ➜ {t['new_threshold']:.2f}%"
+
+
+def _format_hedge(h: dict) -> str:
+    return f" - {h['time']} | Order: {h['order_id']} | {h['side']} {h['size']} | {h['status']}"
+
+
+_FORMATTERS = {"thr": _format_threshold, "hedge": _format_hedge}
+
+
+def page_count(entries) -> int:
+    return max(1, -(-len(entries) // PAGE_SIZE))
+
+
+def _page(entries, page: int):
+    # Page 0 holds the newest entries; entries themselves stay in time order.
+    end = len(entries) - page * PAGE_SIZE
+    return entries[max(0, end - PAGE_SIZE):max(0, end)]
+
+
+def _cached(user_id, asset: str, part: str, fingerprint, render):
+    key = (user_id, asset, part)
+    hit = _cache.get(key)
+    if hit is not None and hit[0] == fingerprint:
+        return hit[1]
+    text = render()
+    _cache[key] = (fingerprint, text)
+    return text
+
+
+def _render_header(asset: str, data: dict) -> str:
+    return "\n".join((
+        f"*Analytics for {asset}*:",
+        f" Entry Price: ${data['entry_price']:.2f}",
+        f"️ Threshold: {data['risk_threshold']}%",
+        f" Auto-Hedge: {'ON' if data.get('auto_hedge') else 'OFF'}",
+    ))
+
+
+def _render_prices(data: dict) -> str:
+    history = data.get("price_history") or []
+    lines = [f"\n *Price History (Last {RECENT_PRICES})*:"]
+    if history:
+        lines.extend(f" - {p['time'][:16].replace('T', ' ')} UTC ➜ ${p['price']:.2f}"
+                     for p in history[-RECENT_PRICES:])
+    else:
+        lines.append(" - No price history available.")
+    return "\n".join(lines)
+
+
+def _render_section(data: dict, section: str, page: int) -> str:
+    title, field, empty = SECTIONS[section]
+    entries = data.get(field) or []
+    pages = page_count(entries)
+    lines = [f"\n *{title}*" + (f" (page {page + 1}/{pages})" if pages > 1 else "") + ":"]
+    if entries:
+        lines.extend(map(_FORMATTERS[section], _page(entries, page)))
+    else:
+        lines.append(f" - {empty}")
+    return "\n".join(lines)
+
+
+def _section_fingerprint(data: dict, section: str):
+    entries = data.get(SECTIONS[section][1]) or []
+    # Histories are append-only, so length and last entry identify the content;
+    # the time also tells apart a position that was replaced by a new one.
+    return len(entries), entries[-1]["time"] if entries else None
+
+
+def render_summary(user_id, asset: str, data: dict) -> str:
+    """
+    Renders the analytics summary for one asset, reusing cached parts whose
+    data has not changed.
+    """
+    history = data.get("price_history") or []
+    parts = [
+        _cached(user_id, asset, "header",
+                (data["entry_price"], data["risk_threshold"], bool(data.get("auto_hedge"))),
+                lambda: _render_header(asset, data)),
+        _cached(user_id, asset, "prices",
+                (len(history), history[-1]["time"] if history else None),
+                lambda: _render_prices(data)),
+    ]
+    for section in SECTIONS:
+        parts.append(_cached(user_id, asset, section, _section_fingerprint(data, section),
+                             lambda section=section: _render_section(data, section, 0)))
+    return "\n".join(parts)
+
+
+def render_history_page(user_id, asset: str, data: dict, section: str, page: int):
+    """
+    Renders one page of an asset's threshold or hedge history.
+
+    Returns:
+        tuple: (text, InlineKeyboardMarkup or None)
+    """
+    entries = data.get(SECTIONS[section][1]) or []
+    page = max(0, min(page, page_count(entries) - 1))
+    text = f"*{asset}*" + _cached(user_id, asset, f"{section}:{page}", _section_fingerprint(data, section),
+                                  lambda: _render_section(data, section, page))
+    return text, history_keyboard(asset, section, page, page_count(entries))
+
+
+def history_keyboard(asset: str, section: str, page: int, pages: int):
+    """
+    Builds ◀ / ▶ buttons for a history page, or None if there is only one page.
+    """
+    buttons = []
+    if page + 1 < pages:
+        buttons.append(InlineKeyboardButton("◀ Older", callback_data=f"{CALLBACK_PREFIX}:{asset}:{section}:{page + 1}"))
+    if page > 0:
+        buttons.append(InlineKeyboardButton("Newer ▶", callback_data=f"{CALLBACK_PREFIX}:{asset}:{section}:{page - 1}"))
+    return InlineKeyboardMarkup([buttons]) if buttons else None
+
+
+def summary_buttons(asset: str, data: dict) -> list:
+    """
+    Buttons opening the older pages of an asset's histories, if it has any.
+    """
+    buttons = []
+    for section, (title, field, _) in SECTIONS.items():
+        if page_count(data.get(field) or []) > 1:
+            buttons.append(InlineKeyboardButton(f"{asset} {title} ◀",
+                                                callback_data=f"{CALLBACK_PREFIX}:{asset}:{section}:1"))
+    return buttons
+
+
+def build_report(user_id, assets: dict) -> list:
+    """
+    Packs the summaries of all of a user's assets into as few messages as
+    possible without exceeding MAX_MESSAGE_LEN.
+
+    Args:
+        user_id (int): The user the report is for.
+        assets (dict): {asset: data} for that user.
+
+    Returns:
+        list: [(text, InlineKeyboardMarkup or None), ...], one per message.
+    """
+    messages = []
+    chunks, buttons, length = [], [], 0
+
+    def flush():
+        if chunks:
+            markup = InlineKeyboardMarkup([[b] for b in buttons]) if buttons else None
+            messages.append(("\n\n".join(chunks), markup))
+
+    for asset, data in list(assets.items()):
+        text = render_summary(user_id, asset, data)
+        # +2 for the blank line separating assets within a message.
+        if chunks and length + 2 + len(text) > MAX_MESSAGE_LEN:
+            flush()
+            chunks, buttons, length = [], [], 0
+        chunks.append(text)
+        buttons.extend(summary_buttons(asset, data))
+        length += len(text) + (2 if length else 0)
+    flush()
+    return messages
+
+
+def render_risk_summary(snapshot, exposures: dict):
+    """
+    Renders the portfolio-level figures from the streaming statistics: 1-day
+    volatility per asset, their correlations and the portfolio's 1-day 95% VaR.
+
+    Args:
+        snapshot (StatsSnapshot): `riskEngine.streaming_stats.stats.snapshot()`.
+        exposures (dict): {asset: USD exposure} of the user's positions.
+
+    Returns:
+        str or None: Markdown text, or None until the statistics have warmed up.
+    """
+    vols = {asset: snapshot.volatility(asset) for asset in exposures}
+    ready = [asset for asset, vol in vols.items() if vol is not None]
+    if not ready:
+        return None
+    lines = ["*Portfolio Risk* (streaming):"]
+    lines.extend(f" {asset} 1-Day Volatility: {vols[asset] * 100:.2f}%" for asset in ready)
+    if len(ready) > 1:
+        corr = snapshot.correlation(ready)
+        lines.append("\n *Correlations*:")
+        lines.extend(f" - {ready[i]} / {ready[j]}: {corr[i, j]:+.2f}"
+                     for i in range(len(ready)) for j in range(i + 1, len(ready)) if corr[i, j] == corr[i, j])
+    var = snapshot.portfolio_var(exposures)
+    if var is not None:
+        lines.append(f"\n Portfolio 1-Day 95% VaR: ${var:,.2f}")
+    return "\n".join(lines)
+
+
+def forget(user_id, asset: str = None):
+    """
+    Drops cached renders for a user (or one of their assets) once it is no
+    longer monitored.
+    """
+    for key in [k for k in _cache if k[0] == user_id and (asset is None or k[1] == asset)]:
+        _cache.pop(key, None)
+
+
+def parse_callback(data: str):
+    """
+    Parses `an:<asset>:<section>:<page>` callback data.
+
+    Returns:
+        tuple or None: (asset, section, page), or None if `data` is not ours.
+    """
+    parts = (data or "").split(":")
+    if len(parts) != 4 or parts[0] != CALLBACK_PREFIX or parts[2] not in SECTIONS:
+        return None
+    try:
+        return parts[1], parts[2], int(parts[3])
+    except ValueError:
+        return None
@@ -0,0 +1,161 @@
+"""
+PNG charts for /View_full_analytics.
+
+Charts (price history with hedge markers, plus the drawdown curve) are drawn
+with matplotlib in a process pool, so plotting never blocks the bot's event
+loop. Rendered images are cached by (user, asset, last price timestamp,
+hedge count): repeated requests for a chart whose data has not changed get
+the same bytes back without re-rendering.
+Concurrent requests for a chart that is still being drawn await the same
+pending result.
+"""
+
+import asyncio
+import atexit
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from riskEngine import retention
+from riskEngine.position import Position, ms_to_iso
+
+MAX_POINTS = 500  # Most recent price points plotted per chart.
+CACHE_SIZE = int(os.getenv("CHART_CACHE_SIZE", "256"))  # Rendered PNGs kept in memory.
+WORKERS = int(os.getenv("CHART_WORKERS", "2"))  # Processes used for rendering.
+
+
+def render_chart_png(asset: str, times: list, prices: list, hedge_times: list) -> bytes:
+    """
+    Draws the price / drawdown chart for one asset. Runs in a worker process.
+
+    Args:
+        asset (str): Asset symbol, used for the title.
+        times (list): ISO timestamps of the price points.
+        prices (list): Prices matching `times`.
+        hedge_times (list): "%Y-%m-%d %H:%M:%S" timestamps of hedge orders.
+
+    Returns:
+        bytes: The chart as PNG.
+    """
+    # Imported here so only the worker processes pay for matplotlib.
+    import io
+    from datetime import datetime
+
+    import matplotlib
+    matplotlib.use("Agg")  # No display in the worker.
+    import matplotlib.pyplot as plt
+    import numpy as np
+
+    x = [datetime.fromisoformat(t) for t in times]
+    y = np.asarray(prices, dtype=float)
+    running_max = np.maximum.accumulate(y)
+    drawdown = (y - running_max) / running_max * 100
+
+    fig, (ax_price, ax_dd) = plt.subplots(2, 1, figsize=(8, 5), sharex=True,
+                                          gridspec_kw={"height_ratios": [3, 1]})
+    ax_price.plot(x, y, color="tab:blue", linewidth=1.2)
+    ax_price.set_title(f"{asset} price history")
+    ax_price.set_ylabel("Price ($)")
+    ax_price.grid(alpha=0.3)
+
+    # Mark hedge orders that fall inside the plotted window.
+    hedge_x = [datetime.strptime(t, "%Y-%m-%d %H:%M:%S") for t in hedge_times]
+    hedge_x = [t for t in hedge_x if x and x[0] <= t <= x[-1]]
+    for index, t in enumerate(hedge_x):
+        ax_price.axvline(t, color="tab:red", linestyle="--", linewidth=0.8,
+                         label="Hedge" if index == 0 else None)
+    if hedge_x:
+        ax_price.legend(loc="best")
+
+    ax_dd.fill_between(x, drawdown, 0, color="tab:red", alpha=0.3)
+    ax_dd.set_ylabel("Drawdown (%)")
+    ax_dd.grid(alpha=0.3)
+    fig.autofmt_xdate()
+    fig.tight_layout()
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=100)
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+class ChartRenderer:
+    """
+    Renders charts in a process pool with an LRU cache of PNG bytes and
+    de-duplication of in-flight renders.
+    """
+
+    def __init__(self, workers: int = WORKERS, cache_size: int = CACHE_SIZE):
+        self.workers = workers
+        self.cache_size = cache_size
+        self._pool = None  # Created on first use so importing this module is cheap.
+        self._cache = OrderedDict()  # key -> PNG bytes
+        self._pending = {}  # key -> asyncio.Future of a render in progress
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            atexit.register(self._pool.shutdown, wait=False, cancel_futures=True)
+        return self._pool
+
+    @staticmethod
+    def cache_key(user_id, asset: str, data: dict):
+        # Per user: two positions on the same asset differ in entry window and hedges.
+        history = data.get("price_history") or []
+        last_time = history[-1]["time"] if history else None
+        return user_id, asset, last_time, len(data.get("hedge_logs") or [])
+
+    async def get_chart(self, user_id, asset: str, data: dict):
+        """
+        Returns the PNG chart for an asset, rendering it off the event loop if
+        it is not cached yet.
+
+        Args:
+            user_id (int): Owner of the position.
+            asset (str): Asset symbol.
+            data (dict): The position entry from `positions`.
+
+        Returns:
+            bytes or None: PNG bytes, or None if there is nothing to plot.
+        """
+        history = data.get("price_history") or []
+        if len(history) < 2:
+            return None
+
+        key = self.cache_key(user_id, asset, data)
+        png = self._cache.get(key)
+        if png is not None:
+            self._cache.move_to_end(key)
+            return png
+
+        pending = self._pending.get(key)
+        if pending is None:
+            # Copy what the worker needs now: the lists keep growing on the event loop.
+            if isinstance(data, Position):
+                # The whole lifetime, at the coarsest tier giving about MAX_POINTS points.
+                series = retention.history(data, max_points=MAX_POINTS)
+                times = [ms_to_iso(t) for t in series["time"][-MAX_POINTS:]]
+                prices = series["close"][-MAX_POINTS:].tolist()
+            else:
+                window = history[-MAX_POINTS:]
+                times = [p["time"] for p in window]
+                prices = [p["price"] for p in window]
+            hedge_times = [h["time"] for h in data.get("hedge_logs") or []]
+
+            loop = asyncio.get_running_loop()
+            pending = loop.run_in_executor(self._executor(), render_chart_png, asset, times, prices, hedge_times)
+            self._pending[key] = pending
+            try:
+                png = await pending
+            finally:
+                self._pending.pop(key, None)
+            self._cache[key] = png
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return png
+
+        return await asyncio.shield(pending)
+
+
+# Shared renderer used by the handlers.
+renderer = ChartRenderer()
@@ -9,31 +9,53 @@ hedging, and provides analytics.
 Key Features:
 - User onboarding and command listing (`/start`).
 - Monitoring of cryptocurrency assets with user-defined risk thresholds (`/monitor_risk`).
+- Registering a whole portfolio at once from a message or CSV file (`/monitor_portfolio`).
+- Adding option legs to a monitored asset, with delta / gamma limits (`/monitor_option`).
 - Toggling automated hedging based on risk breaches (`/auto_hedge`, `/disable_auto_hedge`).
 - Manual placement of hedge orders (`/hedge_now`).
 - Stopping asset monitoring (`/stop_monitor_risk`).
 - Updating risk thresholds for existing positions (`/update_threshold`).
 - Providing comprehensive analytics and history for monitored assets (`/View_full_analytics`).
+- Proposing and placing delta-neutral rebalancing orders (`/rebalance`).
+- Profiling the monitor loop and handlers for a fixed window (`/profile`, admins only).
 
 Data Storage:
-- `user_positions`: A global dictionary used to store all user-specific data
-  related to their monitored assets, including entry prices, position sizes,
-  risk thresholds, price history, auto-hedge status, and hedge logs.
+- `positions` (riskEngine.position_store): A thread-safe store holding a
+  `riskEngine.position.Position` per user and asset, with entry prices,
+  position sizes, risk thresholds, price history, auto-hedge status, and hedge
+  logs. Handlers change it only through its API so the monitor can iterate it
+  concurrently.
 """
 
 # IMPORTS
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import CallbackContext, ContextTypes
-import requests
-from datetime import datetime
+from datetime import datetime, timezone
 
-from ML_model.predict import predict_btc
-from exchanges.bybit import get_spot_price
+from exchanges.aggregator import get_spot_price, get_mark_price, get_spot_prices
 from riskEngine.hedge import place_hedge_order
-
-# Global dictionary to store user-specific asset monitoring data.
-# Structure: {user_id: {asset_symbol: { "entry_price": float, "position_size": float, "risk_threshold": float, "price_history": [], "auto_hedge": bool, "hedge_logs": [], "risk_threshold_history": [] }}}
-user_positions = {}
+from riskEngine.position import (Position, validate_config, validate_greek_limit, validate_option,
+                                 validate_threshold)
+from riskEngine.position_store import positions
+from riskEngine import rebalancer, vol_surface
+from riskEngine.streaming_stats import stats, position_exposures
+from exchanges.delta import product_id, OPTION_SETTLEMENT_HOUR
+from TeligramBot import analytics_view
+from TeligramBot.charts import renderer as chart_renderer
+from observability import profiler
+from observability.log import get_logger, log_event
+import asyncio
+import logging
+import os
+import re
+
+logger = get_logger("handlers")
+
+# Telegram user IDs allowed to run admin commands (/profile), comma separated.
+ADMIN_USER_IDS = frozenset(int(i) for i in os.getenv("ADMIN_USER_IDS", "").split(",") if i.strip())
+
+# User-specific asset monitoring data lives in `positions`.
+# Structure: {user_id: {asset_symbol: Position(entry_price, position_size, risk_threshold, auto_hedge, prices, hedge_logs, risk_threshold_history)}}
 
 # --- Start command ---
 async def start(update: Update, context: CallbackContext):
@@ -52,11 +74,15 @@ async def start(update: Update, context: CallbackContext):
         " /predict_Bitcoin_price\n"
         "️ /auto_hedge <asset> @your hedge automatically started when threshold get trick of the monitor_risk \n"
         " /update_threshold <asset> <new threshold>\n"
-        " /View_full_analytics <to get whole report about all assets\n"
+        " /View_full_analytics [chart] <to get whole report about all assets\n"
         " /stop_monitor_risk <asset>\n"
         " /hedge_now <asset> <size>\n"
         " /disable_auto_hedge <asset>\n"
         " /hedge_history <asset> <timeframe>\n"
+        " /rebalance [band_usd] <bring your net delta back to neutral\n"
+        " /monitor_portfolio <one 'asset size threshold' per line, or send a CSV with this caption\n"
+        " /monitor_option <asset> <call|put> <strike> <expiry YYYY-MM-DD> <size> [delta_limit_usd] [gamma_limit_usd]\n"
+        " /profile [seconds] <admins: profile the monitor loop and handlers\n"
     )
     await update.message.reply_text(message) # Send the predefined message back to the user.
 
@@ -70,7 +96,7 @@ async def disable_auto_hedge(update: Update, context: ContextTypes.DEFAULT_TYPE)
     """
     user_id = update.effective_user.id # Get the user's ID.
     # Check if the user has any positions being monitored.
-    if user_id not in user_positions:
+    if not positions.has(user_id):
         await update.message.reply_text("You have not yet started monitoring any assets.")
         return
 
@@ -78,15 +104,18 @@ async def disable_auto_hedge(update: Update, context: ContextTypes.DEFAULT_TYPE)
         if context.args:
             # If an asset is specified, disable auto-hedge for that specific asset.
             asset = context.args[0].upper() # Get asset name and convert to uppercase.
-            if asset in user_positions[user_id]:
-                user_positions[user_id][asset]["auto_hedge"] = False # Set auto_hedge flag to False.
+            with positions.edit(user_id, asset) as position:
+                if position is not None:
+                    position.auto_hedge = False # Set auto_hedge flag to False.
+            if position is not None:
                 await update.message.reply_text(f"Auto hedge disabled for {asset}.")
             else:
                 await update.message.reply_text(f"{asset} not in your holdings. Please add it via /monitor_risk.")
         else:
             # If no asset is specified, disable auto-hedge for all monitored assets for the user.
-            for asset_name in user_positions[user_id]:
-                user_positions[user_id][asset_name]["auto_hedge"] = False
+            with positions.edit_all(user_id) as assets:
+                for position in assets.values():
+                    position.auto_hedge = False
             await update.message.reply_text("Auto hedge disabled for all your monitored assets.")
     except Exception as e:
         # Catch any unexpected errors during the process.
@@ -101,7 +130,7 @@ async def Stop_monitor(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     user_id = update.effective_user.id # Get the user's ID.
     # Check if the user is monitoring any assets.
-    if user_id not in user_positions:
+    if not positions.has(user_id):
         await update.message.reply_text("You are not monitoring any assets.")
         return
 
@@ -109,17 +138,16 @@ async def Stop_monitor(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if context.args:
             # If an asset is specified, stop monitoring for that specific asset.
             asset = context.args[0].upper() # Get asset name and convert to uppercase.
-            if asset in user_positions[user_id]:
-                del user_positions[user_id][asset] # Remove the asset from the user's monitored positions.
-                # If the user has no more assets being monitored, remove their entry from user_positions.
-                if not user_positions[user_id]:
-                    del user_positions[user_id]
+            # Remove the asset from the user's monitored positions (the user's entry goes with the last one).
+            if positions.remove(user_id, asset):
+                analytics_view.forget(user_id, asset) # Drop its cached analytics.
                 await update.message.reply_text(f"Stopped monitoring for {asset}.")
             else:
                 await update.message.reply_text(" You are not monitoring this asset.")
         else:
             # If no asset is specified, stop monitoring for all assets for the user.
-            del user_positions[user_id] # Remove all entries for the user ID.
+            positions.remove(user_id) # Remove all entries for the user ID.
+            analytics_view.forget(user_id)
             await update.message.reply_text(" Stopped monitoring for all assets.")
     except Exception as e:
         # Catch any unexpected errors.
@@ -144,34 +172,33 @@ async def monitor_risk(update: Update, context: ContextTypes.DEFAULT_TYPE):
         position_size = float(context.args[1]) # Get the user's position size (e.g., 5 BTC).
         risk_threshold = float(context.args[2]) # Get the user's acceptable risk threshold in percentage (e.g., 20%).
 
-        # Fetch the current spot price of the asset.
-        current_price = get_spot_price(asset)
+        # Validate the settings once, here, so the monitor never has to.
+        try:
+            validate_config(position_size, risk_threshold)
+        except ValueError as e:
+            await update.message.reply_text(f" {e}")
+            return
+
+        # Fetch the current spot price of the asset. Off the event loop: concurrent
+        # requests for the same asset share one upstream call (exchanges.singleflight).
+        current_price = await asyncio.to_thread(get_spot_price, asset)
         if current_price is None:
             await update.message.reply_text("Failed to fetch current price for the asset. Please try again later.")
             return
 
-        # Initialize the user's entry in user_positions if it doesn't exist.
-        if user_id not in user_positions:
-            user_positions[user_id] = {}
-
-        # Store the asset's monitoring data in the nested dictionary.
+        # Store the asset's monitoring data in the position store.
         # This structure allows tracking multiple assets per user:
-        # user_positions = {
+        # positions = {
         #   user_id_1: {
-        #     "BTC": { "entry_price": X, "position_size": Y, "risk_threshold": Z, "auto_hedge": False, ... },
-        #     "ETH": { "entry_price": A, "position_size": B, "risk_threshold": C, "auto_hedge": False, ... }
+        #     "BTC": Position(entry_price=X, position_size=Y, risk_threshold=Z, auto_hedge=False, ...),
+        #     "ETH": Position(entry_price=A, position_size=B, risk_threshold=C, auto_hedge=False, ...)
         #   },
         #   user_id_2: { ... }
         # }
-        user_positions[user_id][asset] = {
-            "entry_price": current_price, # The price at which monitoring started.
-            "position_size": position_size,
-            "risk_threshold": risk_threshold,
-            "auto_hedge": False, # Auto-hedge is off by default.
-            "price_history": [{"time": datetime.utcnow().isoformat(), "price": current_price}], # Initialize price history.
-            "hedge_logs": [], # Initialize an empty list for hedge logs.
-            "risk_threshold_history": [], # Initialize an empty list for threshold change logs.
-        }
+        # The entry price (the price at which monitoring started) is also the first history sample;
+        # auto-hedge is off by default.
+        positions.put(user_id, asset, Position.open(asset, current_price, position_size, risk_threshold))
+        analytics_view.forget(user_id, asset) # Any cached analytics are for the replaced position.
 
         # Send a confirmation message to the user.
         await update.message.reply_text(
@@ -191,6 +218,198 @@ async def monitor_risk(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(f" An error occurred: {e}. Please try again.")
 
 
+# --- Option legs ---
+def price_options(user_id, asset: str, position: Position):
+    """
+    Greeks of one position's option legs at the current price, refreshing
+    the underlying's IV surface if it is due. Blocking; run in a worker thread.
+
+    Returns:
+        dict or None: `vol_surface.option_book()` output, or None if the price could not be fetched.
+    """
+    price = get_spot_price(asset)
+    if price is None:
+        return None
+    vol_surface.surfaces.refresh([asset])
+    return vol_surface.option_book([(user_id, asset, position)], {asset: price})
+
+
+async def monitor_option(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handles the /monitor_option command. Adds a call or put leg to an asset
+    the user already monitors. The monitor then values every leg from the
+    underlying's implied volatility surface and alerts when the position's
+    net delta (spot + hedges + options) or gamma goes over its USD limit.
+
+    Usage: /monitor_option <asset> <call|put> <strike> <expiry YYYY-MM-DD> <size> [delta_limit_usd] [gamma_limit_usd]
+    Example: /monitor_option BTC put 60000 2026-12-25 -0.5 20000 3000
+             (0.5 BTC of written puts; alert beyond ±$20,000 delta or ±$3,000 gamma per 1% move)
+
+    Args:
+        update (Update): The incoming Telegram update.
+        context (ContextTypes.DEFAULT_TYPE): The context object containing command arguments.
+    """
+    user_id = update.effective_user.id # Get the user's ID.
+    try:
+        asset = context.args[0].upper()
+        option_type = context.args[1].lower()
+        strike = float(context.args[2])
+        expiry = datetime.strptime(context.args[3], "%Y-%m-%d").replace(hour=OPTION_SETTLEMENT_HOUR, tzinfo=timezone.utc)
+        size = float(context.args[4])
+        delta_limit = float(context.args[5]) if len(context.args) > 5 else None
+        gamma_limit = float(context.args[6]) if len(context.args) > 6 else None
+    except (IndexError, ValueError):
+        await update.message.reply_text(
+            " Invalid usage. Please use: `/monitor_option <asset> <call|put> <strike> <expiry YYYY-MM-DD> <size> "
+            "[delta_limit_usd] [gamma_limit_usd]` (e.g. `/monitor_option BTC put 60000 2026-12-25 -0.5`)",
+            parse_mode="Markdown"
+        )
+        return
+
+    expiry_ms = int(expiry.timestamp() * 1000)
+    try:
+        # Validate everything first: nothing may change if any of it is rejected.
+        validate_option(option_type, strike, expiry_ms, size)
+        validate_greek_limit(delta_limit)
+        validate_greek_limit(gamma_limit)
+    except ValueError as e:
+        await update.message.reply_text(f" {e}")
+        return
+
+    with positions.edit(user_id, asset) as position:
+        if position is not None:
+            position.add_option(option_type, strike, expiry_ms, size)
+            if delta_limit is not None or gamma_limit is not None:
+                position.set_greek_limits(delta_limit if delta_limit is not None else position.delta_limit,
+                                          gamma_limit if gamma_limit is not None else position.gamma_limit)
+    if position is None:
+        # Replied outside the edit so the user's lock is not held across a Telegram call.
+        await update.message.reply_text(f" Start monitoring {asset} with /monitor_risk first.")
+        return
+
+    book = await asyncio.to_thread(price_options, user_id, asset, position)
+    lines = [f" Option added to {asset}: {size:+g} {option_type.upper()} {strike:,.0f} expiring {expiry:%Y-%m-%d}"]
+    exposure = (book or {}).get("positions", {}).get((user_id, asset))
+    if exposure is None:
+        lines.append(" Greeks will be shown in alerts once a price and volatility are available.")
+    else:
+        for leg in book["legs"]:
+            lines.append(f" - {leg['contracts']:+g} {leg['type'].upper()} {leg['strike']:,.0f} "
+                         f"({leg['expiry_years'] * 365:.0f}d): IV {leg['iv'] * 100:.1f}%, delta {leg['delta']:+.3f}")
+        lines.append(f"\n Net Delta: ${exposure['delta_usd']:,.2f} (limit ±${exposure['delta_limit']:,.0f})")
+        lines.append(f" Gamma (per 1% move): ${exposure['gamma_usd']:,.2f} (limit ±${exposure['gamma_limit']:,.0f})")
+    await update.message.reply_text("\n".join(lines))
+
+
+# --- Bulk monitor command ---
+MAX_PORTFOLIO_ROWS = 200  # Rows accepted by one /monitor_portfolio.
+MAX_PORTFOLIO_FILE = 64 * 1024  # Bytes; a 200-row CSV is a few KB.
+
+
+def parse_portfolio(text: str):
+    """
+    Parses "asset size threshold" rows, one per line, separated by commas,
+    semicolons or spaces. A header row ("asset,size,threshold") and blank
+    lines are skipped.
+
+    Returns:
+        tuple: ({asset: (position_size, risk_threshold)}, [error message, ...])
+    """
+    rows, errors = {}, []
+    for line_no, line in enumerate(text.splitlines(), 1):
+        fields = [f for f in re.split(r"[,;\s]+", line.strip()) if f]
+        if not fields or (line_no == 1 and fields[0].lower() in ("asset", "symbol")):
+            continue
+        if len(fields) != 3:
+            errors.append(f"line {line_no}: expected asset, size and threshold")
+            continue
+        asset = fields[0].upper()
+        try:
+            position_size, risk_threshold = float(fields[1]), float(fields[2])
+        except ValueError:
+            errors.append(f"line {line_no} ({asset}): size and threshold must be numbers")
+            continue
+        try:
+            validate_config(position_size, risk_threshold)
+        except ValueError as e:
+            errors.append(f"line {line_no} ({asset}): {e}")
+            continue
+        if asset in rows:
+            errors.append(f"line {line_no}: {asset} listed twice, keeping the first")
+            continue
+        rows[asset] = (position_size, risk_threshold)
+    if len(rows) > MAX_PORTFOLIO_ROWS:
+        errors.append(f"only the first {MAX_PORTFOLIO_ROWS} assets were read")
+        rows = dict(list(rows.items())[:MAX_PORTFOLIO_ROWS])
+    return rows, errors
+
+
+async def monitor_portfolio(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handles /monitor_portfolio: starts monitoring many assets at once.
+
+    The rows come from the rest of the message, or from a CSV document sent
+    with "/monitor_portfolio" as its caption. All entry prices are fetched in
+    one batched request per venue, and the valid rows are added in a single
+    store operation, so the monitor never sees half a portfolio. The user
+    gets one summary message.
+
+    Usage:
+        /monitor_portfolio
+        BTC 0.5 10
+        ETH 4 15
+
+    Args:
+        update (Update): The incoming Telegram update.
+        context (ContextTypes.DEFAULT_TYPE): The context object.
+    """
+    user_id = update.effective_user.id # Get the user's ID.
+    message = update.message
+    if message.document:
+        if message.document.file_size and message.document.file_size > MAX_PORTFOLIO_FILE:
+            await message.reply_text(f" The file is too large (max {MAX_PORTFOLIO_FILE // 1024} KB).")
+            return
+        data = await (await message.document.get_file()).download_as_bytearray()
+        text = bytes(data).decode("utf-8-sig", errors="replace")
+    else:
+        # Everything after the command itself (and its optional @botname), over any number of lines.
+        text = re.sub(r"^/\S+", "", message.text or "", count=1)
+
+    rows, errors = parse_portfolio(text)
+    if not rows:
+        usage = " Usage: /monitor_portfolio followed by one 'asset size threshold' per line,\n" \
+                "or send a CSV file with /monitor_portfolio as its caption."
+        await message.reply_text("\n".join([usage] + [f" - {e}" for e in errors[:10]]))
+        return
+
+    prices = await asyncio.to_thread(get_spot_prices, list(rows))
+    opened = {}
+    for asset, (size, threshold) in rows.items():
+        if asset not in prices:
+            errors.append(f"{asset}: no price available")
+            continue
+        try:
+            opened[asset] = Position.open(asset, prices[asset], size, threshold)
+        except ValueError as e:
+            # Sizes and thresholds were checked while parsing; this is an unusable quote.
+            errors.append(f"{asset}: {e}")
+    if opened:
+        positions.put_many(user_id, opened)
+        for asset in opened:
+            analytics_view.forget(user_id, asset) # Cached analytics are for the replaced positions.
+
+    lines = [f" Monitoring started for {len(opened)} of {len(rows)} assets."]
+    lines.extend(f" - {asset}: ${p.entry_price:,.2f}, size {p.position_size:g}, threshold {p.risk_threshold:g}%"
+                 for asset, p in opened.items())
+    if errors:
+        lines.append("\n Skipped:")
+        lines.extend(f" - {e}" for e in errors)
+    summary = "\n".join(lines)
+    if len(summary) > analytics_view.MAX_MESSAGE_LEN:
+        summary = summary[:analytics_view.MAX_MESSAGE_LEN - 2] + "\n…"
+    await message.reply_text(summary)
+
+
 # --- Example inline action (Hedge Now) ---
 async def hedge_now(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
@@ -232,28 +451,32 @@ async def hedge_now(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # Check if the user has this asset in their monitored positions.
-    if user_id not in user_positions or asset not in user_positions[user_id]:
+    if not positions.has(user_id, asset):
         await update.message.reply_text(
             f" No monitoring data found for {asset}. Please use /monitor_risk first."
-            f"\nCurrently monitored assets: {', '.join(user_positions.get(user_id, {}).keys())}"
+            f"\nCurrently monitored assets: {', '.join(positions.assets(user_id).keys())}"
         )
         return
 
     try:
         # Get the product ID for the hedging symbol from an external source.
-        get_product_id = product_id(delta_symbol)
+        get_product_id = await asyncio.to_thread(product_id, delta_symbol)
         if not get_product_id:
             await update.message.reply_text(f" Could not find product ID for {delta_symbol}. Cannot place hedge.")
             return
 
-        # Get the current price of the asset for the hedge order.
-        current_price = get_spot_price(asset)
+        # Price the hedge off the hedge venue's mark price, falling back to the aggregated spot price.
+        current_price = await asyncio.to_thread(hedge_prices, [asset])
+        current_price = current_price.get(asset)
         if current_price is None:
             await update.message.reply_text(" Failed to fetch current price. Cannot place hedge.")
             return
 
         # Place the hedge order via the risk engine.
-        response = place_hedge_order(get_product_id, size, current_price)
+        response = await asyncio.to_thread(place_hedge_order, get_product_id, size, current_price)
+        if response.get("error"):
+            await update.message.reply_text(f" Hedge order failed: {response.get('details', response['error'])}")
+            return
 
         # Log the details of the placed hedge order.
         hedge_log = {
@@ -263,8 +486,10 @@ async def hedge_now(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "size": size,
             "status": response.get("state", "UNKNOWN"), # Using 'state' if 'status' isn't available.
         }
-        # Add the hedge log to the asset's history.
-        user_positions[user_id][asset].setdefault("hedge_logs", []).append(hedge_log)
+        # Add the hedge log to the asset's history (unless monitoring stopped meanwhile).
+        with positions.edit(user_id, asset) as position:
+            if position is not None:
+                position.hedge_logs.append(hedge_log)
 
         # Notify the user about the successful hedge placement.
         await update.message.reply_text(
@@ -277,7 +502,7 @@ async def hedge_now(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
     except Exception as e:
-        print(f"Manual hedge error for user {user_id}, asset {asset}: {e}")
+        log_event(logger, logging.ERROR, "manual_hedge_failed", user_id=user_id, asset=asset, error=str(e))
         await update.message.reply_text(" Failed to place hedge order. An internal error occurred.")
 
 async def auto_hedge(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -290,7 +515,7 @@ async def auto_hedge(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     user_id = update.effective_user.id # Get the user's ID.
     # Check if the user has any assets being monitored.
-    if user_id not in user_positions or not user_positions[user_id]:
+    if not positions.has(user_id):
         await update.message.reply_text(" You haven't started monitoring any assets yet. Use /monitor_risk.")
         return
 
@@ -298,60 +523,138 @@ async def auto_hedge(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if context.args:
             # If an asset is specified, enable auto-hedge for that specific asset.
             asset = context.args[0].upper() # Get asset name and convert to uppercase.
-            if asset in user_positions[user_id]:
-                user_positions[user_id][asset]["auto_hedge"] = True # Set auto_hedge flag to True.
+            with positions.edit(user_id, asset) as position:
+                if position is not None:
+                    position.auto_hedge = True # Set auto_hedge flag to True.
+            if position is not None:
                 await update.message.reply_text(f"Auto-hedging enabled for {asset}.")
             else:
                 await update.message.reply_text(f"You don't have {asset} in your monitored positions. Please add it via /monitor_risk.")
         else:
             # If no asset is specified, enable auto-hedge for all monitored assets for the user.
-            for asset_name in user_positions[user_id]:
-                user_positions[user_id][asset_name]["auto_hedge"] = True
+            with positions.edit_all(user_id) as assets:
+                for position in assets.values():
+                    position.auto_hedge = True
             await update.message.reply_text(" Auto-hedging enabled for all assets in your portfolio.")
     except Exception as e:
         # Catch any unexpected errors.
         await update.message.reply_text(f"Something went wrong while enabling auto-hedge: {e}")
 
 # --- Callback from button press ---
-def button_callback(update: Update, context: CallbackContext):
+async def button_callback(update: Update, context: CallbackContext):
     """
-    Handles callback queries from inline keyboard buttons. (Currently placeholders).
+    Handles callback queries from inline keyboard buttons: analytics history
+    paging and the (placeholder) hedge confirmation buttons.
 
     Args:
         update (Update): The incoming Telegram update (specifically a callback query).
         context (CallbackContext): The context object for the current update.
     """
     query = update.callback_query # Get the callback query object.
-    query.answer() # Acknowledge the callback query to remove the "loading" state from the button.
+    await query.answer() # Acknowledge the callback query to remove the "loading" state from the button.
+
+    # Analytics history paging: "an:<asset>:<section>:<page>".
+    paging = analytics_view.parse_callback(query.data)
+    if paging:
+        asset, section, page = paging
+        data = positions.get(query.from_user.id, asset)
+        if data is None:
+            await query.edit_message_text(f" {asset} is no longer being monitored.")
+            return
+        text, markup = analytics_view.render_history_page(query.from_user.id, asset, data, section, page)
+        await query.edit_message_text(text, parse_mode="Markdown", reply_markup=markup)
+        return
 
     # Check the data associated with the pressed button.
-    if query.data == "confirm_hedge":
-        query.edit_message_text("🛡 Hedging position now... (this would trigger real hedge logic)")
-        # TODO: Implement actual hedge logic here when this button is used.
+    # Rebalance confirmations carry the band: "confirm_hedge:<band_usd>".
+    if query.data.split(":", 1)[0] == "confirm_hedge":
+        band = float(query.data.split(":", 1)[1]) if ":" in query.data else rebalancer.BAND_USD
+        await query.edit_message_text("🛡 Hedging position now...")
+        await query.edit_message_text(await asyncio.to_thread(execute_rebalance, query.from_user.id, band))
     elif query.data == "cancel_hedge":
-        query.edit_message_text(" Hedge cancelled.")
+        await query.edit_message_text(" Hedge cancelled.")
+
+def hedge_prices(assets) -> dict:
+    """Hedge-venue mark price per asset, falling back to the aggregated spot price."""
+    prices = {}
+    for asset in assets:
+        price = get_mark_price(asset) or get_spot_price(asset)
+        if price is not None:
+            prices[asset] = price
+    return prices
 
-def product_id(symbol_name):
+
+def propose_rebalance(user_id, band: float):
+    """Net delta and proposed orders for one user, or None if nothing could be priced."""
+    items = [(user_id, asset, position) for asset, position in positions.assets(user_id).items()]
+    prices = hedge_prices({asset for _, asset, _ in items})
+    options = vol_surface.option_legs(items, prices)
+    proposals = rebalancer.rebalance(items, prices, band, options=options)
+    return proposals.get(user_id)
+
+
+def execute_rebalance(user_id, band: float, may_place=None) -> str:
     """
-    Fetches the product ID for a given symbol from Delta Exchange API.
-    This ID is often required by trading APIs to identify specific trading pairs/products.
+    Re-computes the user's proposal at current prices and places its orders.
+    `may_place` (see `rebalancer.execute`) is checked before each order.
 
-    Args:
-        symbol_name (str): The trading symbol (e.g., "BTCUSDT", "ETHUSDQ").
+    The proposal is recomputed rather than remembered from the /rebalance
+    message, so a confirmation never places orders for stale deltas and any
+    bot node can handle the button press.
+    """
+    try:
+        proposal = propose_rebalance(user_id, band)
+        if proposal is None or not proposal["orders"]:
+            return " Your net delta is already inside the band; nothing to do."
+        results = rebalancer.execute(user_id, proposal["orders"], positions, product_id, place_hedge_order,
+                                     may_place)
+    except Exception as e:
+        # A failing venue (or open circuit) in the price or product lookups.
+        log_event(logger, logging.ERROR, "rebalance_failed", user_id=user_id, error=str(e))
+        return f" Rebalance failed: {e}\nNo orders were placed after the error; try again later."
+    lines = [" Rebalance orders:"]
+    for order, response in results:
+        status = f"failed: {response.get('details', response['error'])}" if response.get("error") \
+            else f"placed (ID {response.get('id', 'N/A')})"
+        lines.append(f" - {order['side'].upper()} {order['size']:g} {order['asset']}: {status}")
+    return "\n".join(lines)
+
+
+async def rebalance(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handles the /rebalance command. Shows the user's net delta across spot
+    positions and placed hedges, and the smallest set of perp orders that
+    brings it back to neutral, with buttons to confirm or cancel.
 
-    Returns:
-        str or None: The product ID if found, otherwise None.
+    Usage: /rebalance [band_usd]
+    Example: /rebalance 500 (rebalance if the net delta is beyond ±$500)
+
+    Args:
+        update (Update): The incoming Telegram update.
+        context (ContextTypes.DEFAULT_TYPE): The context object containing command arguments.
     """
-    url = "https://api.delta.exchange/v2/products" # API endpoint for products.
-    response = requests.get(url) # Make an HTTP GET request.
-    response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx).
-    data = response.json() # Parse the JSON response.
+    user_id = update.effective_user.id # Get the user's ID.
+    if not positions.has(user_id):
+        await update.message.reply_text(" You haven't started monitoring any assets yet. Use /monitor_risk.")
+        return
+    try:
+        band = float(context.args[0]) if context.args else rebalancer.BAND_USD
+    except ValueError:
+        await update.message.reply_text(" Invalid band. Usage: /rebalance [band_usd]")
+        return
+
+    proposal = await asyncio.to_thread(propose_rebalance, user_id, band)
+    if proposal is None:
+        await update.message.reply_text(" Failed to fetch prices for your assets. Please try again later.")
+        return
 
-    # Iterate through the products to find the matching symbol.
-    for product in data["result"]:
-        if product["symbol"] == symbol_name:
-            return product["id"] # Return the product's ID.
-    return None # Return None if no matching symbol is found.
+    markup = None
+    if proposal["orders"]:
+        markup = InlineKeyboardMarkup([[
+            InlineKeyboardButton("✅ Confirm", callback_data=f"confirm_hedge:{band:g}"),
+            InlineKeyboardButton("❌ Cancel", callback_data="cancel_hedge"),
+        ]])
+    await update.message.reply_text(rebalancer.format_proposal(proposal, band), reply_markup=markup)
 
 
 async def update_threshold(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -368,7 +671,7 @@ async def update_threshold(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     user_id = update.effective_user.id # Get the user's ID.
     # Check if the user has any active positions being monitored.
-    if user_id not in user_positions or not user_positions[user_id]:
+    if not positions.has(user_id):
         await update.message.reply_text(" You don't have any active positions being monitored. Use /monitor_risk first.")
         return
 
@@ -376,23 +679,20 @@ async def update_threshold(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if context.args and len(context.args) == 2:
             asset = context.args[0].upper() # Get asset symbol and convert to uppercase.
             new_threshold = float(context.args[1]) # Get the new risk threshold.
+            try:
+                validate_threshold(new_threshold)
+            except ValueError as e:
+                await update.message.reply_text(f" {e}")
+                return
 
-            if asset not in user_positions[user_id]:
+            with positions.edit(user_id, asset) as position:
+                if position is not None:
+                    # Log the old and new threshold with a timestamp, then update the active threshold.
+                    position.set_threshold(new_threshold)
+            if position is None:
                 await update.message.reply_text(f" {asset} is not in your monitored positions.")
                 return
 
-            # Initialize 'risk_threshold_history' list if it doesn't exist for the asset.
-            if "risk_threshold_history" not in user_positions[user_id][asset]:
-                user_positions[user_id][asset]["risk_threshold_history"] = []
-
-            # Log the old and new threshold with a timestamp.
-            user_positions[user_id][asset]["risk_threshold_history"].append({
-                "time": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
-                "old_threshold": user_positions[user_id][asset]["risk_threshold"],
-                "new_threshold": new_threshold,
-            })
-
-            user_positions[user_id][asset]["risk_threshold"] = new_threshold # Update the active threshold.
             await update.message.reply_text(f" Threshold for {asset} updated to {new_threshold:.2f}%.")
         else:
             # Provide correct usage if arguments are missing or incorrect.
@@ -400,7 +700,7 @@ async def update_threshold(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except ValueError:
         await update.message.reply_text(" Invalid threshold format. Please enter a number for the new threshold.")
     except Exception as e:
-        print(f"Threshold update error for user {user_id}, asset {asset}: {e}")
+        log_event(logger, logging.ERROR, "threshold_update_failed", user_id=user_id, asset=asset, error=str(e))
         await update.message.reply_text(" Something went wrong while updating the threshold.")
 
 async def full_analytics(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -409,51 +709,85 @@ async def full_analytics(update: Update, context: ContextTypes.DEFAULT_TYPE):
     on all assets a user is monitoring, including entry price, current threshold,
     auto-hedge status, price history, threshold change history, and hedge logs.
 
+    Usage: /View_full_analytics [chart]
+    With `chart`, a price / drawdown chart with hedge markers is also sent per asset.
+
     Args:
         update (Update): The incoming Telegram update.
         context (ContextTypes.DEFAULT_TYPE): The context object.
     """
     user_id = update.effective_user.id # Get the user's ID.
     # Check if the user has any assets being tracked.
-    if user_id not in user_positions or not user_positions[user_id]:
+    assets = positions.assets(user_id) # Read-only view; later changes don't affect this report.
+    if not assets:
         await update.message.reply_text("No assets are currently being tracked for analytics.")
         return
 
-    # Iterate through each asset the user is monitoring.
-    for asset, data in user_positions[user_id].items():
-        msg = f"*Analytics for {asset}*:\n" # Start building the message for the current asset.
-        msg += f" Entry Price: ${data['entry_price']:.2f}\n"
-        msg += f"️ Threshold: {data['risk_threshold']}%\n"
-        msg += f" Auto-Hedge: {'ON' if data.get('auto_hedge') else 'OFF'}\n" # Display auto-hedge status.
-
-        msg += "\n *Price History (Last 5)*:\n"
-        # Display the last 5 price history entries, if available.
-        if data.get("price_history"):
-            for p in data["price_history"][-5:]:
-                msg += f" - {p['time'][:16].replace('T', ' ')} UTC ➜ ${p['price']:.2f}\n" # Format time for display.
-        else:
-            msg += " - No price history available.\n"
+    # Render (or reuse cached) per-asset summaries, packed into as few messages as
+    # Telegram's size limit allows. Older history pages are reachable via buttons.
+    for text, markup in analytics_view.build_report(user_id, assets):
+        await update.message.reply_text(text, parse_mode='Markdown', reply_markup=markup)
+    risk_summary = analytics_view.render_risk_summary(stats.snapshot(), position_exposures(assets))
+    if risk_summary:
+        await update.message.reply_text(risk_summary, parse_mode='Markdown')
+
+    if context.args and context.args[0].lower() == "chart":
+        # Charts are drawn in a process pool; render every asset concurrently.
+        charts = await asyncio.gather(
+            *(chart_renderer.get_chart(user_id, asset, data) for asset, data in assets.items()),
+            return_exceptions=True,
+        )
+        for asset, png in zip(assets, charts):
+            if isinstance(png, Exception):
+                log_event(logger, logging.ERROR, "chart_render_failed", user_id=user_id, asset=asset, error=str(png))
+                await update.message.reply_text(f" Could not render the chart for {asset}.")
+            elif png is None:
+                await update.message.reply_text(f" Not enough price history to chart {asset} yet.")
+            else:
+                await update.message.reply_photo(photo=png, caption=f"{asset}: price, drawdown and hedges")
 
+async def profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handles the /profile command (admins only, see ADMIN_USER_IDS). Samples
+    the monitor loop and the handlers for a fixed window, then replies with
+    the per-stage timing table and the flame graph files (see
+    `observability.profiler`).
 
-        msg += "\n *Threshold Changes:*\n"
-        # Display historical threshold changes.
-        if data.get("risk_threshold_history"):
-            for t in data["risk_threshold_history"]:
-                msg += f" - {t['time']}: {t['old_threshold']:.2f}% ➜ {t['new_threshold']:.2f}%\n"
-        else:
-            msg += " - No threshold change history.\n"
+    Usage: /profile [seconds]
+    Example: /profile 60
 
+    Args:
+        update (Update): The incoming Telegram update.
+        context (ContextTypes.DEFAULT_TYPE): The context object containing command arguments.
+    """
+    if update.effective_user.id not in ADMIN_USER_IDS:
+        await update.message.reply_text(" This command is only available to admins.")
+        return
+    try:
+        seconds = float(context.args[0]) if context.args else profiler.DEFAULT_SECONDS
+        session = profiler.start(seconds, label="profile")
+    except ValueError:
+        await update.message.reply_text(f" Usage: /profile [seconds], at most {profiler.MAX_SECONDS:g}.")
+        return
+    except RuntimeError:
+        await update.message.reply_text(" A profiling session is already running.")
+        return
+
+    await update.message.reply_text(f" Profiling for {seconds:g}s...")
+    # Handlers run one at a time: reply when the window is over without holding up other updates.
+    context.application.create_task(send_profile(update, session))
+
+
+async def send_profile(update: Update, session):
+    """Waits for a profiling session to end and sends its summary and files."""
+    result = await asyncio.to_thread(session.wait)
+    await update.message.reply_text(f"```\n{result['summary'][:4000]}\n```", parse_mode="Markdown")
+    for path in result["files"]:
+        with open(path, "rb") as f:
+            await update.message.reply_document(document=f, filename=os.path.basename(path))
 
-        msg += "\n *Hedge Logs:*\n"
-        # Display hedge order logs.
-        if data.get("hedge_logs"):
-            for h in data["hedge_logs"]:
-                msg += f" - {h['time']} | Order: {h['order_id']} | {h['side']} {h['size']} | {h['status']}\n"
-        else:
-            msg += " - No hedge logs available.\n"
 
-        # Send the compiled analytics message for the current asset.
-        await update.message.reply_text(msg, parse_mode='Markdown')
 async def predict_btc_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    ans = await predict_btc(context.bot, update.effective_chat.id)
-    print(ans)
\ No newline at end of file
+    # Imported on first use: the model and its dependencies are slow to load.
+    from ML_model.predict import predict_btc
+    await predict_btc(context.bot, update.effective_chat.id)
\ No newline at end of file
@@ -0,0 +1,34 @@
+"""
+Instrumented wrapper around `Bot.send_message`.
+
+All proactive messages (risk alerts, auto-hedge reports) go through
+`send_alert` so their latency and the number of sends still in flight show up
+in the metrics endpoint, and as the "send" stage of a profiling session.
+"""
+
+import time
+
+from observability import metrics, profiler
+
+
+async def send_alert(bot, chat_id, text: str, **kwargs):
+    """
+    Sends a Telegram message and records its latency.
+
+    Args:
+        bot (telegram.Bot): Bot used to send the message.
+        chat_id (int): Target chat / user ID.
+        text (str): Message body.
+        **kwargs: Passed through to `bot.send_message` (e.g. parse_mode).
+
+    Returns:
+        telegram.Message: Whatever `bot.send_message` returns.
+    """
+    metrics.TELEGRAM_INFLIGHT_SENDS.inc()
+    start = time.perf_counter()
+    try:
+        with profiler.stage("send"):
+            return await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+    finally:
+        metrics.TELEGRAM_SEND_LATENCY.observe(time.perf_counter() - start)
+        metrics.TELEGRAM_INFLIGHT_SENDS.dec()
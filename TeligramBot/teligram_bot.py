@@ -5,12 +5,25 @@ from telegram.ext import (
     ApplicationBuilder,
     CommandHandler,
     CallbackQueryHandler,
+    MessageHandler,
     Application,
+    filters,
 )
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 from TeligramBot import handlers
 from TeligramBot.handlers import start, monitor_risk, hedge_now, button_callback
-from riskEngine.monitor import check_user_risks
+from riskEngine.position import now_ms
+from riskEngine.position_store import PositionStore, positions
+from riskEngine.monitor import check_user_risks, sample_prices
+from riskEngine.streaming_stats import SAMPLE_INTERVAL
+from riskEngine import rebalancer, retention, vol_surface
+from TeligramBot.notify import send_alert
+from riskEngine.scheduler import MonitorScheduler
+from observability.metrics import start_metrics_server
+from observability.log import get_logger, log_event
+from observability import profiler, startup
+import logging
 
 """
 This module initializes and runs a Telegram bot designed for cryptocurrency risk
@@ -24,6 +37,21 @@ load_dotenv()
 # Retrieve the Telegram bot API token from environment variables.
 TELEGRAM_API_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 
+# Webhook mode (used instead of long polling when WEBHOOK_URL is set).
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # Public HTTPS base URL Telegram posts updates to.
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")  # Checked against Telegram's secret token header.
+
+# Seconds between batch rebalancing passes over every user; 0 disables them.
+REBALANCE_INTERVAL = float(os.getenv("REBALANCE_INTERVAL", "0"))
+
+ROLES = ("all", "bot", "monitor")
+POLLER_LEASE = "poller"  # Only the holder of this lease long-polls Telegram.
+
+logger = get_logger("bot")
+
 
 def setup_handlers(app: Application):
     """
@@ -43,43 +71,256 @@ def setup_handlers(app: Application):
     app.add_handler(CommandHandler("update_threshold", handlers.update_threshold))
     app.add_handler(CommandHandler("stop_monitor_risk", handlers.Stop_monitor))
     app.add_handler(CommandHandler("disable_auto_hedge", handlers.disable_auto_hedge))
+    app.add_handler(CommandHandler("rebalance", handlers.rebalance))
+    app.add_handler(CommandHandler("monitor_portfolio", handlers.monitor_portfolio))
+    app.add_handler(CommandHandler("monitor_option", handlers.monitor_option))
+    app.add_handler(CommandHandler("profile", handlers.profile))
+    # A CSV portfolio arrives as a document with the command as its caption.
+    app.add_handler(MessageHandler(filters.Document.FileExtension("csv") & filters.CaptionRegex(r"^/monitor_portfolio"),
+                                   handlers.monitor_portfolio))
     # Register a callback query handler for inline keyboard button presses.
     app.add_handler(CallbackQueryHandler(button_callback))
 
 
-async def run_risk_monitor(app: Application):
+async def run_risk_monitor(app: Application, leases=None):
     """
-    Asynchronously runs a periodic background task to check user risks.
+    Asynchronously runs the background task that checks user risks.
+
+    Each position is re-checked on its own schedule (see `riskEngine.scheduler`):
+    every few seconds when it is close to its risk threshold or the market is
+    volatile, and rarely when it is far away from it.
 
-    This function continuously calls `check_user_risks` at a fixed interval
-    (every 60 seconds) to monitor all active user positions for risk.
+    With `leases`, only positions of users in shards this node holds are
+    checked, so several monitor nodes can share one state database.
 
     Args:
         app (Application): The Telegram bot application instance, used to
                            access the bot object (`app.bot`) for sending messages.
+        leases (LeaseManager, optional): Shard leases of this node; None
+                                         monitors every position.
+    """
+    scheduler = MonitorScheduler()
+    while True:
+        # Pick up positions added or removed by the command handlers (on any node).
+        keys = positions.keys()
+        if leases is not None:
+            leases.maybe_rebalance()
+            keys = [key for key in keys if leases.owns(key[0])]
+        scheduler.sync_keys(keys)
+        due = scheduler.pop_due()
+        if due:
+            # Check only the positions that are due, then schedule their next check.
+            results = await check_user_risks(app.bot, due, safe_notice=scheduler.should_notify_safe,
+                                             may_hedge=leases.confirm if leases is not None else None)
+            for key in due:
+                scheduler.reschedule(key, results.get(key))
+        # Sleep until the next position is due (at most one second).
+        await asyncio.sleep(scheduler.seconds_until_next())
+
+
+async def run_rebalancer(app: Application, leases=None):
+    """
+    Periodically computes every user's net delta in one batch and, for users
+    outside the band (REBALANCE_BAND_USD), places the orders straight away
+    when auto-hedge is on for every asset involved and every asset could be
+    priced, or otherwise sends the proposal with confirm / cancel buttons.
+
+    Args:
+        app (Application): The Telegram bot application instance.
+        leases (LeaseManager, optional): Only users in shards this node holds are rebalanced.
     """
     while True:
-        # Call the risk checking function, passing the bot object.
-        await check_user_risks(app.bot)
-        # Pause execution for 60 seconds before the next check.
-        await asyncio.sleep(60)
+        await asyncio.sleep(REBALANCE_INTERVAL)
+        items = [(user_id, asset, position) for user_id, asset, position in positions.items()
+                 if leases is None or leases.owns(user_id)]
+        if not items:
+            continue
+        try:
+            prices = await asyncio.to_thread(handlers.hedge_prices, {asset for _, asset, _ in items})
+            options = await asyncio.to_thread(vol_surface.option_legs, items, prices)
+            proposals = rebalancer.rebalance(items, prices, rebalancer.BAND_USD, options=options)
+        except Exception as e:
+            # Try again next interval rather than ending the rebalancer.
+            log_event(logger, logging.ERROR, "rebalance_pass_failed", error=str(e))
+            continue
+        auto_hedged = {(user_id, asset) for user_id, asset, position in items if position.auto_hedge}
+
+        for user_id, proposal in proposals.items():
+            if not proposal["orders"]:
+                continue
+            try:
+                # A partial proposal (some assets unpriced) is never placed unattended.
+                if not proposal["unpriced"] and all((user_id, order["asset"]) in auto_hedged
+                                                    for order in proposal["orders"]):
+                    text = await asyncio.to_thread(handlers.execute_rebalance, user_id, rebalancer.BAND_USD,
+                                                   leases.confirm if leases is not None else None)
+                    await send_alert(app.bot, user_id, f" Auto-rebalance:\n{text}")
+                else:
+                    markup = InlineKeyboardMarkup([[
+                        InlineKeyboardButton("✅ Confirm", callback_data=f"confirm_hedge:{rebalancer.BAND_USD:g}"),
+                        InlineKeyboardButton("❌ Cancel", callback_data="cancel_hedge"),
+                    ]])
+                    await send_alert(app.bot, user_id,
+                                     f" Your portfolio is outside its delta band.\n\n"
+                                     f"{rebalancer.format_proposal(proposal)}",
+                                     reply_markup=markup)
+            except Exception as e:
+                # One user's failure must not skip the others.
+                log_event(logger, logging.ERROR, "rebalance_user_failed", user_id=user_id, error=str(e))
+
+
+def compact_histories(keys) -> int:
+    """
+    Rolls up aged-out price history of the given positions (see
+    `riskEngine.retention`) and drops their expired option legs.
+    """
+    moved = 0
+    now = now_ms()
+    for user_id, asset in keys:
+        with positions.edit(user_id, asset) as position:
+            if position is not None:
+                moved += retention.compact(position, now)
+                if any(option["expiry"] <= now for option in position.options):
+                    position.options = [option for option in position.options if option["expiry"] > now]
+    return moved
 
 
-async def run_bot():
+async def run_compactor(leases=None):
+    """
+    Every COMPACT_INTERVAL seconds, rolls up old raw prices into 5-minute bars
+    and old 5-minute bars into hourly ones, in a worker thread. Each pass only
+    touches what aged out since the previous one.
+
+    Args:
+        leases (LeaseManager, optional): Only positions in shards this node holds are compacted.
+    """
+    while True:
+        await asyncio.sleep(retention.COMPACT_INTERVAL)
+        keys = [key for key in positions.keys() if leases is None or leases.owns(key[0])]
+        try:
+            await asyncio.to_thread(compact_histories, keys)
+        except Exception as e:
+            log_event(logger, logging.WARNING, "compaction_failed", error=str(e))
+
+
+async def run_stats_sampler():
+    """
+    Samples every monitored symbol's price at a fixed cadence
+    (STATS_SAMPLE_INTERVAL) into the streaming volatility / correlation
+    statistics used by the alerts, analytics and portfolio VaR.
+    """
+    while True:
+        try:
+            await sample_prices()
+        except Exception as e:
+            # A failed sample only delays the statistics; keep sampling.
+            log_event(logger, logging.WARNING, "stats_sample_failed", error=str(e))
+        await asyncio.sleep(SAMPLE_INTERVAL)
+
+
+async def hold_poller_lease(app: Application, leases):
+    """
+    Keeps renewing the poller lease; if it is ever lost (e.g. this node stalled
+    past the TTL and a standby took over), stops the application so two nodes
+    never poll at once. A process supervisor restarts it as a standby.
+    """
+    from riskEngine.leases import RENEW_EVERY
+
+    while True:
+        await asyncio.sleep(RENEW_EVERY)
+        if not leases.acquire(POLLER_LEASE):
+            log_event(logger, logging.WARNING, "poller_lease_lost", node=leases.node_id)
+            app.stop_running()
+            return
+
+
+async def run_bot(role: str = "all", webhook: bool = None):
     """
     Initializes and starts the Telegram bot, including its command handlers
     and the background risk monitoring task.
+
+    Args:
+        role (str): "all" (commands and monitoring in one process), "bot"
+                    (commands only) or "monitor" (monitoring only). Split
+                    roles need STATE_BACKEND=sqlite so nodes share positions.
+        webhook (bool, optional): Receive updates through a webhook instead of
+                                  long polling. Defaults to whether WEBHOOK_URL is set.
     """
+    if role not in ROLES:
+        raise ValueError(f"Unknown role {role!r}; expected one of {', '.join(ROLES)}")
+    shared = not isinstance(positions, PositionStore)
+    if role != "all" and not shared:
+        raise ValueError(f"Role {role!r} needs a shared state backend (STATE_BACKEND=sqlite)")
+    if webhook is None:
+        webhook = bool(WEBHOOK_URL)
+
+    leases = None
+    if shared:
+        from riskEngine.leases import LeaseManager
+        leases = LeaseManager(role=role)
+        if role == "bot":
+            leases.heartbeat()
+        else:
+            leases.rebalance()  # Claim shards before the first monitor pass.
+
     # Build the Telegram Application instance using the provided API token.
     app = ApplicationBuilder().token(TELEGRAM_API_TOKEN).build()
 
+    # Expose Prometheus-style metrics on a local /metrics endpoint (METRICS_PORT=0 disables it).
+    start_metrics_server()
+    if profiler.ON_START > 0:
+        # Profile the first PROFILE_ON_START seconds; the files land in PROFILE_DIR.
+        profiler.start(profiler.ON_START, label=f"{role}-startup")
+
+    if role == "monitor":
+        # No updates to receive: just initialize the bot for sending alerts.
+        log_event(logger, logging.INFO, "node_started", role=role, node=leases.node_id)
+        async with app:
+            tasks = [run_risk_monitor(app, leases), run_stats_sampler(), run_compactor(leases)]
+            if REBALANCE_INTERVAL > 0:
+                tasks.append(run_rebalancer(app, leases))
+            startup.mark("ready")
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                leases.release_all()
+        return
+
     # Set up all the command and callback handlers.
     setup_handlers(app)
+    # Bot nodes keep their own statistics for /View_full_analytics.
+    app.create_task(run_stats_sampler())
+
+    if role == "all":
+        # Create and run the background risk monitor task.
+        # This task will run concurrently with the bot's polling.
+        app.create_task(run_risk_monitor(app, leases))
+        app.create_task(run_compactor(leases))
+        if REBALANCE_INTERVAL > 0:
+            app.create_task(run_rebalancer(app, leases))
+
+    if webhook:
+        # Any number of bot nodes can sit behind a load balancer in webhook mode.
+        log_event(logger, logging.INFO, "node_started", role=role, mode="webhook")
+        startup.mark("ready")
+        await app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+        )
+        return
 
-    # Create and run the background risk monitor task.
-    # This task will run concurrently with the bot's polling.
-    app.create_task(run_risk_monitor(app))
+    if leases is not None:
+        # Telegram allows one long-polling consumer per token: other bot nodes wait as standbys.
+        if not leases.acquire(POLLER_LEASE):
+            log_event(logger, logging.INFO, "poller_standby", node=leases.node_id)
+            while not leases.acquire(POLLER_LEASE):
+                await asyncio.sleep(leases.ttl_ms / 1000 / 3)
+        app.create_task(hold_poller_lease(app, leases))
 
-    print("🤖 Telegram bot is running...")
+    log_event(logger, logging.INFO, "node_started", role=role, mode="polling")
+    startup.mark("ready")
     # Start polling for updates from Telegram, keeping the bot running.
     await app.run_polling()
\ No newline at end of file
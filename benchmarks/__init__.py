@@ -0,0 +1,10 @@
+"""
+Benchmarks and the load test. They load synthetic books into the process-wide
+position store, so the store must be the in-memory one: STATE_BACKEND is
+pinned here, before anything builds the store. A STATE_BACKEND=sqlite set by
+a .env file cannot override it, since load_dotenv keeps existing variables.
+"""
+
+import os
+
+os.environ["STATE_BACKEND"] = "memory"
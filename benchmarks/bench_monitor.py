@@ -0,0 +1,156 @@
+"""
+End-to-end benchmarks for the risk monitor tick and the command handlers.
+
+The exchange and the Telegram bot are replaced by the fakes in
+`benchmarks.fakes`, so the numbers only reflect our own code: iterating the
+book, computing metrics, formatting alerts and calling into the (stubbed)
+hedging path.
+"""
+
+import asyncio
+import resource
+import time
+import tracemalloc
+
+from benchmarks.fakes import (
+    FakeBot,
+    FakeContext,
+    FakeExchange,
+    FakeUpdate,
+    StageClock,
+    load_book,
+    make_positions,
+    patched_exchange,
+)
+from riskEngine import monitor
+from TeligramBot import handlers
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def bench_tick(n_positions: int, n_symbols: int, ticks: int = 3, latency: float = 0.0) -> dict:
+    """
+    Runs `check_user_risks` over a synthetic book and reports tick latency,
+    per-stage time, allocations and peak RSS.
+
+    Args:
+        n_positions (int): Number of monitored positions in the book.
+        n_symbols (int): Number of distinct symbols in the book.
+        ticks (int): Number of timed ticks.
+        latency (float): Artificial per-call exchange latency in seconds.
+
+    Returns:
+        dict: Benchmark metrics for this configuration.
+    """
+    clock = StageClock()
+    exchange = FakeExchange(clock, latency=latency)
+    bot = FakeBot(clock)
+    load_book(make_positions(n_positions, n_symbols))
+
+    tick_seconds = []
+    stage_totals = {}
+    with patched_exchange(exchange, (monitor, handlers)):
+        for _ in range(ticks):
+            clock.reset()
+            start = time.perf_counter()
+            asyncio.run(monitor.check_user_risks(bot))
+            elapsed = time.perf_counter() - start
+            tick_seconds.append(elapsed)
+            external = sum(clock.seconds.values())
+            for stage in ("fetch", "alert", "hedge"):
+                stage_totals[stage] = stage_totals.get(stage, 0.0) + clock.seconds.get(stage, 0.0)
+            stage_totals["evaluate"] = stage_totals.get("evaluate", 0.0) + elapsed - external
+
+        # One extra traced tick; tracemalloc slows everything down so it is kept
+        # out of the latency numbers above.
+        tracemalloc.start()
+        asyncio.run(monitor.check_user_risks(bot))
+        alloc_current, alloc_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    mean_tick = sum(tick_seconds) / len(tick_seconds)
+    return {
+        "positions": n_positions,
+        "symbols": n_symbols,
+        "ticks": ticks,
+        "tick_mean_s": mean_tick,
+        "tick_p50_s": _percentile(tick_seconds, 50),
+        "tick_max_s": max(tick_seconds),
+        "positions_per_s": n_positions / mean_tick if mean_tick else None,
+        "stage_mean_s": {stage: total / ticks for stage, total in stage_totals.items()},
+        "messages_sent": bot.sent,
+        "alloc_retained_bytes": alloc_current,
+        "alloc_peak_bytes": alloc_peak,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def bench_full_analytics(n_assets: int, history_len: int, repeats: int = 20) -> dict:
+    """
+    Times `/View_full_analytics` for a single user holding `n_assets`
+    positions with `history_len` entries in each history list.
+    """
+    clock = StageClock()
+    positions = make_positions(n_assets, n_assets, positions_per_user=n_assets, history_len=history_len)
+    user_id, assets = next(iter(positions.items()))
+    for position in assets.values():
+        position.risk_threshold_history = [
+            {"time": "2024-01-01 00:00:00", "old_threshold": 10.0, "new_threshold": 12.0}
+        ] * history_len
+        position.hedge_logs = [
+            {"time": "2024-01-01 00:00:00", "order_id": 1, "side": "SELL", "size": 1.0, "status": "open"}
+        ] * history_len
+    load_book(positions)
+
+    update = FakeUpdate(user_id, clock)
+    context = FakeContext(bot=FakeBot(clock))
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        asyncio.run(handlers.full_analytics(update, context))
+        samples.append(time.perf_counter() - start)
+
+    return {
+        "assets": n_assets,
+        "history_len": history_len,
+        "repeats": repeats,
+        "mean_s": sum(samples) / len(samples),
+        "p50_s": _percentile(samples, 50),
+        "max_s": max(samples),
+        "messages_per_call": update.message.replies / repeats,
+    }
+
+
+def bench_monitor_risk(n_commands: int) -> dict:
+    """
+    Times `/monitor_risk` registrations against the fake exchange.
+    """
+    clock = StageClock()
+    exchange = FakeExchange(clock)
+    load_book({})
+    samples = []
+    with patched_exchange(exchange, (handlers,)):
+        for index in range(n_commands):
+            update = FakeUpdate(2_000_000 + index, clock)
+            context = FakeContext(args=[f"SYM{index % 50}", "1.5", "10"])
+            start = time.perf_counter()
+            asyncio.run(handlers.monitor_risk(update, context))
+            samples.append(time.perf_counter() - start)
+
+    return {
+        "commands": n_commands,
+        "mean_s": sum(samples) / len(samples),
+        "p50_s": _percentile(samples, 50),
+        "p99_s": _percentile(samples, 99),
+    }
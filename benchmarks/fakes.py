@@ -0,0 +1,296 @@
+"""
+Local stand-ins for the exchange and the Telegram bot used by the benchmarks.
+
+Nothing in here talks to the network: prices come from a seeded random walk,
+hedge orders are answered with a canned Delta-style response and messages are
+only counted. Every fake records how long it spent so the benchmarks can split
+a monitor tick into its fetch / evaluate / alert / hedge stages.
+
+`FakeTelegramRequest` goes one level lower for the load test: it replaces the
+HTTP layer of a real `telegram.Bot`, so replies go through the whole
+python-telegram-bot stack and only the Bot API server is simulated.
+"""
+
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+from telegram.request import BaseRequest
+
+from riskEngine import position_store
+from riskEngine.position import Position, now_ms
+
+
+class StageClock:
+    """
+    Accumulates wall-clock time per named stage (e.g. "fetch", "alert").
+    """
+
+    def __init__(self):
+        self.seconds = defaultdict(float)  # Total time spent in each stage.
+        self.calls = defaultdict(int)  # Number of calls made in each stage.
+
+    @contextmanager
+    def measure(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[stage] += time.perf_counter() - start
+            self.calls[stage] += 1
+
+    def reset(self):
+        self.seconds.clear()
+        self.calls.clear()
+
+
+class FakeExchange:
+    """
+    Deterministic replacement for `get_spot_price`, `get_spot_prices`,
+    `get_mark_price`, `product_id` and `place_hedge_order`.
+
+    Args:
+        clock (StageClock): Where time spent in the fake calls is recorded.
+        seed (int): Seed for the price random walk.
+        latency (float): Artificial delay in seconds added to every call,
+                         used to emulate a slow venue.
+    """
+
+    def __init__(self, clock: StageClock, seed: int = 7, latency: float = 0.0):
+        self.clock = clock
+        self.latency = latency
+        self._rng = random.Random(seed)
+        self._prices = {}  # Last price handed out per symbol.
+        self._order_seq = 0
+
+    def _sleep(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_spot_price(self, symbol: str) -> float:
+        with self.clock.measure("fetch"):
+            self._sleep()
+            price = self._prices.get(symbol, 100.0 + self._rng.random() * 1000)
+            price *= 1 + self._rng.gauss(0, 0.002)  # ~0.2% move per tick.
+            self._prices[symbol] = price
+            return price
+
+    def get_spot_prices(self, symbols) -> dict:
+        return {symbol: self.get_spot_price(symbol) for symbol in symbols}
+
+    def get_mark_price(self, asset: str, venue: str = None) -> float:
+        with self.clock.measure("hedge"):
+            self._sleep()
+            return self._prices.get(asset)
+
+    def product_id(self, symbol_name: str):
+        with self.clock.measure("hedge"):
+            self._sleep()
+            return abs(hash(symbol_name)) % 100000 + 1
+
+    def place_hedge_order(self, product_id: int, size: float, price: float, order_type: str = "limit",
+                          side: str = "sell") -> dict:
+        with self.clock.measure("hedge"):
+            self._sleep()
+            self._order_seq += 1
+            return {
+                "id": self._order_seq,
+                "order_id": self._order_seq,
+                "product_symbol": f"P{product_id}",
+                "side": side,
+                "size": size,
+                "filled_size": size,
+                "order_type": order_type,
+                "state": "open",
+                "status": "open",
+                "created_at": datetime.utcnow().isoformat(),
+            }
+
+    def get_latest_btc_input(self) -> dict:
+        """Stand-in for `ML_model.latest_data.get_latest_btc_input` (the last hourly BTC candle)."""
+        with self.clock.measure("fetch"):
+            self._sleep()
+            price = self._prices.get("BTC", 60000.0) * (1 + self._rng.gauss(0, 0.002))
+            self._prices["BTC"] = price
+            return {"open": price, "high": price * 1.004, "low": price * 0.996,
+                    "volume": 500 + self._rng.random() * 1000}
+
+
+class FakeBot:
+    """
+    Minimal async stand-in for `telegram.Bot` that only counts messages.
+    """
+
+    def __init__(self, clock: StageClock):
+        self.clock = clock
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        with self.clock.measure("alert"):
+            self.sent += 1
+
+
+class FakeTelegramRequest(BaseRequest):
+    """
+    HTTP layer for `telegram.Bot` that answers every Bot API call locally.
+
+    Args:
+        latency (float): Simulated round-trip time of each call, in seconds
+                         (awaited, like a real non-blocking HTTP request).
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = Counter()  # Bot API method -> calls
+        self._message_id = 0
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        endpoint = url.rsplit("/", 1)[-1]
+        self.calls[endpoint] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        params = request_data.parameters if request_data is not None else {}
+        if endpoint == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "LoadTest", "username": "load_test_bot"}
+        elif endpoint.startswith("send") or endpoint.startswith("edit"):
+            self._message_id += 1
+            chat_id = params.get("chat_id", 1)
+            result = {"message_id": self._message_id, "date": int(time.time()),
+                      "chat": {"id": chat_id, "type": "private"}, "text": str(params.get("text", ""))}
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+class FakeMessage:
+    """Stand-in for `telegram.Message` that swallows replies."""
+
+    def __init__(self, clock: StageClock):
+        self.clock = clock
+        self.replies = 0
+
+    async def reply_text(self, text, **kwargs):
+        with self.clock.measure("alert"):
+            self.replies += 1
+
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.first_name = f"user{user_id}"
+
+
+class FakeUpdate:
+    """Just enough of `telegram.Update` for the command handlers."""
+
+    def __init__(self, user_id: int, clock: StageClock):
+        self.effective_user = FakeUser(user_id)
+        self.effective_chat = self.effective_user
+        self.message = FakeMessage(clock)
+
+
+class FakeContext:
+    """Just enough of `CallbackContext` for the command handlers."""
+
+    def __init__(self, args=None, bot=None):
+        self.args = list(args or [])
+        self.bot = bot
+
+
+def make_positions(n_positions: int, n_symbols: int, positions_per_user: int = 5,
+                   history_len: int = 30, auto_hedge_ratio: float = 0.1, seed: int = 11) -> dict:
+    """
+    Builds a synthetic {user_id: {asset: position}} book in the same shape that
+    `handlers.monitor_risk` produces.
+
+    Args:
+        n_positions (int): Total number of (user, asset) positions.
+        n_symbols (int): Number of distinct asset symbols to spread them over.
+        positions_per_user (int): Assets held by each synthetic user.
+        history_len (int): Price history points pre-filled per position.
+        auto_hedge_ratio (float): Fraction of positions with auto-hedge enabled.
+        seed (int): Seed for the generator.
+
+    Returns:
+        dict: {user_id: {asset: Position}}
+    """
+    rng = random.Random(seed)
+    symbols = [f"SYM{i}" for i in range(n_symbols)]
+    start_ms = now_ms() - history_len * 60_000
+    positions = {}
+
+    for index in range(n_positions):
+        user_id = 1_000_000 + index // positions_per_user
+        assets = positions.setdefault(user_id, {})
+        asset = symbols[index % n_symbols]
+        if asset in assets:  # More assets per user than symbols; pick a free one.
+            asset = next((s for s in symbols if s not in assets), None)
+            if asset is None:
+                continue
+
+        entry_price = 100.0 + rng.random() * 1000
+        position = Position(
+            asset,
+            entry_price,
+            round(rng.uniform(0.1, 10), 4),
+            # A spread of thresholds so a share of the book breaches each tick.
+            rng.choice([0.1, 0.5, 1, 5, 10, 20]),
+            auto_hedge=rng.random() < auto_hedge_ratio,
+        )
+        price = entry_price
+        for minute in range(history_len):
+            price *= 1 + rng.gauss(0, 0.002)
+            position.record_price(price, start_ms + minute * 60_000)
+        assets[asset] = position
+    return positions
+
+
+def load_book(book: dict):
+    """
+    Replaces the contents of the process-wide position store with `book`.
+
+    Raises:
+        RuntimeError: If the store is not the in-memory one; the benchmarks
+                      must never clear a shared (SQLite) state database.
+    """
+    if type(position_store.positions) is not position_store.PositionStore:
+        raise RuntimeError(f"Benchmarks only run against the in-memory position store, "
+                           f"not {type(position_store.positions).__name__}")
+    position_store.positions.clear()
+    position_store.positions.load(book)
+
+
+@contextmanager
+def patched_exchange(exchange: FakeExchange, modules):
+    """
+    Temporarily points the exchange functions imported by `modules`
+    (e.g. `riskEngine.monitor`, `TeligramBot.handlers`) at `exchange`.
+    """
+    names = ("get_spot_price", "get_spot_prices", "get_mark_price", "product_id", "place_hedge_order",
+             "get_latest_btc_input")
+    saved = []
+    for module in modules:
+        for name in names:
+            if hasattr(module, name):
+                saved.append((module, name, getattr(module, name)))
+                setattr(module, name, getattr(exchange, name))
+    try:
+        yield exchange
+    finally:
+        for module, name, original in saved:
+            setattr(module, name, original)
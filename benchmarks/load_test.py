@@ -0,0 +1,271 @@
+"""
+Load test: many concurrent synthetic Telegram users against the real handlers.
+
+The application is built the way `run_bot` builds it (`setup_handlers` on an
+`Application`, updates processed one at a time unless --concurrent-updates is
+given). Only the edges are simulated:
+
+  * the Bot API server (`FakeTelegramRequest`, --telegram-latency per call),
+    so replies go through the real python-telegram-bot stack;
+  * the exchanges and the BTC candle feed (`FakeExchange`, --latency per
+    call, blocking like the real `requests` clients).
+
+Every virtual user sends a command, waits for the bot to finish handling it
+and sends the next one (a closed loop), picking commands by --mix weights.
+The risk monitor (`run_risk_monitor`) runs on the same event loop against the
+same fake exchange. A 10 ms probe timer measures event-loop lag: how late it
+fires shows how long something held the loop, e.g. a blocking call made
+outside `asyncio.to_thread`.
+
+Reported: per-command count / errors / p50 / p99 / max latency, commands per
+second, event-loop lag p50 / p99 / max, monitor ticks and Bot API calls.
+
+Usage:
+    python -m benchmarks.load_test --concurrency 200 --duration 20
+    python -m benchmarks.load_test --mix monitor_risk=1,predict=1 --latency 0.05
+    python -m benchmarks.load_test --sweep 10,50,200,1000 --output load.json  # find the knee
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+
+from telegram import Update
+from telegram.ext import ApplicationBuilder, TypeHandler
+
+from benchmarks.fakes import (FakeExchange, FakeTelegramRequest, StageClock, load_book, make_positions,
+                              patched_exchange)
+from riskEngine import monitor
+from TeligramBot import handlers, teligram_bot
+
+# Command name -> (bot command, argument builder(rng, assets)).
+COMMANDS = {
+    "monitor_risk": ("monitor_risk", lambda rng, assets: [rng.choice(assets), f"{rng.uniform(0.1, 5):.3f}",
+                                                           str(rng.choice([1, 5, 10, 20]))]),
+    "hedge_now": ("hedge_now", lambda rng, assets: [rng.choice(assets), f"{rng.uniform(0.01, 1):.3f}"]),
+    "update_threshold": ("update_threshold", lambda rng, assets: [rng.choice(assets),
+                                                                  str(rng.choice([1, 5, 10, 20]))]),
+    "full_analytics": ("View_full_analytics", lambda rng, assets: []),
+    "predict": ("predict_Bitcoin_price", lambda rng, assets: []),
+}
+DEFAULT_MIX = "monitor_risk=4,update_threshold=2,full_analytics=2,hedge_now=1,predict=1"
+LAG_PROBE_INTERVAL = 0.01  # Seconds between event-loop lag probes.
+
+
+def parse_mix(text: str) -> dict:
+    """Parses "name=weight,..." into {command name: weight}."""
+    mix = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in COMMANDS:
+            raise ValueError(f"Unknown command {name!r} in --mix; expected one of {', '.join(COMMANDS)}")
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("--mix needs at least one command with a positive weight")
+    return mix
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _summary(samples) -> dict:
+    return {"count": len(samples), "p50_s": _percentile(samples, 50), "p99_s": _percentile(samples, 99),
+            "max_s": max(samples) if samples else None}
+
+
+def _update(update_id: int, user_id: int, command: str, args, bot) -> Update:
+    text = " ".join([f"/{command}"] + list(args))
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(command) + 1}],
+        },
+    }, bot)
+
+
+async def _run(args, concurrency: int) -> dict:
+    clock = StageClock()
+    exchange = FakeExchange(clock, latency=args.latency)
+    telegram_api = FakeTelegramRequest(latency=args.telegram_latency)
+    builder = ApplicationBuilder().token("0:load-test").request(telegram_api).updater(None)
+    if args.concurrent_updates > 1:
+        builder = builder.concurrent_updates(args.concurrent_updates)
+    app = builder.build()
+    teligram_bot.setup_handlers(app)
+
+    # A handler in a later group runs once the command's own handler is done.
+    pending = {}  # update_id -> future resolved when the update was handled
+
+    async def handled(update, context):
+        future = pending.pop(update.update_id, None)
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    errors = {}
+
+    async def on_error(update, context):
+        command = update.message.text.split()[0][1:] if isinstance(update, Update) and update.message else "?"
+        errors[command] = errors.get(command, 0) + 1
+
+    app.add_handler(TypeHandler(Update, handled), group=1000)
+    app.add_error_handler(on_error)
+
+    book = make_positions(args.users * args.positions_per_user, args.symbols, args.positions_per_user)
+    load_book(book)
+    user_assets = {user_id: sorted(assets) for user_id, assets in book.items()}
+    user_ids = sorted(user_assets)
+
+    # Monitor ticks, timed around the real `check_user_risks`.
+    ticks = []
+    check_user_risks = teligram_bot.check_user_risks
+
+    async def timed_check(*a, **kw):
+        start = time.perf_counter()
+        try:
+            return await check_user_risks(*a, **kw)
+        finally:
+            ticks.append(time.perf_counter() - start)
+
+    latencies = {name: [] for name in args.mix}
+    lags = []
+    stop = asyncio.Event()
+    update_ids = iter(range(1, 10 ** 9))
+    names, weights = list(args.mix), list(args.mix.values())
+
+    async def virtual_user(seed: int):
+        rng = random.Random(seed)
+        while not stop.is_set():
+            name = rng.choices(names, weights)[0]
+            user_id = rng.choice(user_ids)
+            command, build_args = COMMANDS[name]
+            update = _update(next(update_ids), user_id, command, build_args(rng, user_assets[user_id]), app.bot)
+            future = pending[update.update_id] = asyncio.get_running_loop().create_future()
+            start = time.perf_counter()
+            await app.update_queue.put(update)
+            await future
+            latencies[name].append(time.perf_counter() - start)
+
+    async def lag_probe():
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(LAG_PROBE_INTERVAL)
+            lags.append(max(0.0, time.perf_counter() - start - LAG_PROBE_INTERVAL))
+
+    from ML_model import predict
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink), \
+            patched_exchange(exchange, (monitor, handlers, predict)):
+        teligram_bot.check_user_risks = timed_check
+        try:
+            async with app:
+                await app.start()
+                tasks = [asyncio.create_task(lag_probe())]
+                if not args.no_monitor:
+                    tasks.append(asyncio.create_task(teligram_bot.run_risk_monitor(app)))
+                users = [asyncio.create_task(virtual_user(args.seed + i)) for i in range(concurrency)]
+                await asyncio.sleep(args.duration)
+                stop.set()
+                for task in tasks:
+                    task.cancel()
+                # Let in-flight commands finish; they count towards latency, not throughput.
+                await asyncio.wait(users, timeout=max(5.0, args.duration))
+                for task in users:
+                    task.cancel()
+                await app.stop()
+        finally:
+            teligram_bot.check_user_risks = check_user_risks
+
+    completed = sum(len(samples) for samples in latencies.values())
+    return {
+        "concurrency": concurrency,
+        "duration_s": args.duration,
+        "commands_per_s": completed / args.duration,
+        "commands": {name: dict(_summary(samples), errors=errors.get(COMMANDS[name][0], 0))
+                     for name, samples in latencies.items()},
+        "all_commands": _summary([s for samples in latencies.values() for s in samples]),
+        "loop_lag": _summary(lags),
+        "monitor": {"ticks": len(ticks), "mean_tick_s": sum(ticks) / len(ticks) if ticks else None},
+        "telegram_calls": dict(telegram_api.calls),
+        "exchange_calls": dict(clock.calls),
+    }
+
+
+def _ms(value) -> str:
+    return "-" if value is None else f"{value * 1000:.1f}"
+
+
+def print_report(result: dict):
+    print(f"\nconcurrency {result['concurrency']}: {result['commands_per_s']:.1f} commands/s, "
+          f"{result['monitor']['ticks']} monitor ticks, Bot API calls {sum(result['telegram_calls'].values())}")
+    print(f"{'command':<18} {'count':>7} {'errors':>7} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    rows = list(result["commands"].items()) + [("all", dict(result["all_commands"], errors=""))]
+    for name, row in rows:
+        print(f"{name:<18} {row['count']:>7} {row['errors']:>7} {_ms(row['p50_s']):>9} "
+              f"{_ms(row['p99_s']):>9} {_ms(row['max_s']):>9}")
+    lag = result["loop_lag"]
+    print(f"event-loop lag: p50 {_ms(lag['p50_s'])} ms, p99 {_ms(lag['p99_s'])} ms, max {_ms(lag['max_s'])} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the Telegram handlers with synthetic users")
+    parser.add_argument("--concurrency", type=int, default=100, help="Virtual users sending commands at once")
+    parser.add_argument("--sweep", default=None,
+                        help="Comma separated concurrencies to run one after another (overrides --concurrency)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per run")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Command weights (default {DEFAULT_MIX})")
+    parser.add_argument("--users", type=int, default=2000, help="Distinct Telegram users in the book")
+    parser.add_argument("--positions-per-user", type=int, default=5)
+    parser.add_argument("--symbols", type=int, default=50, help="Distinct symbols in the book")
+    parser.add_argument("--latency", type=float, default=0.02, help="Exchange latency per call, in seconds")
+    parser.add_argument("--telegram-latency", type=float, default=0.05,
+                        help="Bot API latency per call, in seconds")
+    parser.add_argument("--concurrent-updates", type=int, default=1,
+                        help="Updates processed at once (1 = sequential, like run_bot)")
+    parser.add_argument("--no-monitor", action="store_true", help="Do not run the risk monitor alongside")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="Write the results as JSON")
+    args = parser.parse_args(argv)
+    args.mix = parse_mix(args.mix)
+
+    if "predict" in args.mix:
+        # Load the model up front so the first /predict does not pay for it.
+        from ML_model import predict
+        try:
+            predict.load_model()
+        except Exception as e:
+            print(f"[load] ML model unavailable ({e}); leaving /predict_Bitcoin_price out of the mix",
+                  file=sys.stderr)
+            del args.mix["predict"]
+
+    levels = [int(c) for c in args.sweep.split(",") if c.strip()] if args.sweep else [args.concurrency]
+    results = []
+    for concurrency in levels:
+        print(f"[load] concurrency={concurrency} duration={args.duration}s", file=sys.stderr)
+        results.append(asyncio.run(_run(args, concurrency)))
+        print_report(results[-1])
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"mix": args.mix, "latency": args.latency, "telegram_latency": args.telegram_latency,
+                       "concurrent_updates": args.concurrent_updates, "results": results}, f, indent=2)
+        print(f"[load] results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Command line entry point for the benchmark suite.
+
+Usage:
+    python -m benchmarks.run [--sizes 1000,10000,100000] [--symbols 10,100] [--output results.json]
+    python -m benchmarks.run compare old.json new.json
+
+Results are written as JSON so two runs (e.g. before and after a change) can
+be compared with the `compare` sub-command.
+"""
+
+import argparse
+import json
+import platform
+import sys
+from datetime import datetime
+
+from benchmarks.bench_metrics import bench_risk_metrics
+from benchmarks.bench_monitor import bench_full_analytics, bench_monitor_risk, bench_tick
+
+
+def _int_list(value: str):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def run_suite(args) -> dict:
+    """
+    Runs every benchmark and returns the combined, JSON-serialisable result.
+    """
+    results = {"tick": [], "handlers": {}, "risk_metric": None}
+
+    # Run sizes in ascending order: peak RSS is a process-wide high-water mark,
+    # so each case then reports the peak reached by the largest book so far.
+    for n_positions in sorted(args.sizes):
+        for n_symbols in args.symbols:
+            print(f"[bench] tick positions={n_positions} symbols={n_symbols}", file=sys.stderr)
+            results["tick"].append(bench_tick(n_positions, n_symbols, ticks=args.ticks, latency=args.latency))
+
+    print("[bench] handlers", file=sys.stderr)
+    results["handlers"]["full_analytics"] = bench_full_analytics(n_assets=20, history_len=200)
+    results["handlers"]["monitor_risk"] = bench_monitor_risk(n_commands=500)
+
+    print("[bench] risk_metric", file=sys.stderr)
+    results["risk_metric"] = bench_risk_metrics()
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "sizes": args.sizes,
+            "symbols": args.symbols,
+            "ticks": args.ticks,
+            "latency": args.latency,
+        },
+        "results": results,
+    }
+
+
+def _flatten(prefix: str, value, out: dict):
+    # Turns nested results into {"tick[1000x10].tick_mean_s": 0.01, ...} for diffing.
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}.{key}" if prefix else key, item, out)
+    elif isinstance(value, list):
+        for item in value:
+            label = f"{item.get('positions')}x{item.get('symbols')}" if isinstance(item, dict) else len(out)
+            _flatten(f"{prefix}[{label}]", item, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = value
+
+
+def compare(old_path: str, new_path: str):
+    """
+    Prints the relative change of every numeric metric between two result files.
+    """
+    with open(old_path) as f:
+        old = {}
+        _flatten("", json.load(f)["results"], old)
+    with open(new_path) as f:
+        new = {}
+        _flatten("", json.load(f)["results"], new)
+
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        change = (after - before) / before * 100 if before else float("nan")
+        print(f"{key:70s} {before:14.6g} -> {after:14.6g} ({change:+.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crypto risk bot benchmark suite")
+    sub = parser.add_subparsers(dest="command")
+
+    cmp_parser = sub.add_parser("compare", help="Compare two result files")
+    cmp_parser.add_argument("old")
+    cmp_parser.add_argument("new")
+
+    parser.add_argument("--sizes", type=_int_list, default=[1000, 10000, 100000],
+                        help="Comma separated book sizes (positions)")
+    parser.add_argument("--symbols", type=_int_list, default=[10, 100],
+                        help="Comma separated symbol counts")
+    parser.add_argument("--ticks", type=int, default=3, help="Timed ticks per configuration")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Artificial exchange latency per call, in seconds")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON results")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        compare(args.old, args.new)
+        return
+
+    report = run_suite(args)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[bench] results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Multi-venue price aggregation.
+
+A price read fans out to every configured venue concurrently (on a shared
+thread pool, since the venue clients are blocking `requests` calls), waits at
+most `deadline` seconds and combines whatever came back:
+
+  * "median": median of the healthy quotes, returned as soon as `quorum`
+    venues have answered (by default a majority, so one slow venue does not
+    hold every read up to the deadline) or the deadline passes;
+  * "first":  the first healthy quote, i.e. the fastest venue.
+
+A slow or failing venue therefore costs at most the deadline and no longer
+makes the monitor skip the position, as long as one venue is healthy.
+
+Configuration (environment):
+    PRICE_VENUES       comma separated venues, default "bybit,binance,delta"
+    PRICE_AGGREGATION  "median" (default) or "first"
+    PRICE_DEADLINE     seconds to wait for venues, default 1.5
+    PRICE_QUORUM       answers needed before returning a median, default a majority
+    HEDGE_VENUE        venue whose mark price is used for hedges, default "delta"
+    PRICE_CACHE_TTL    seconds a price is reused by concurrent callers, default 0.25
+"""
+
+import logging
+import os
+import statistics
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from exchanges.binance import BinanceAdapter
+from exchanges.bybit import BybitAdapter
+from exchanges.delta import DeltaAdapter
+from exchanges.singleflight import coalesced
+from observability.log import get_logger, log_event
+
+logger = get_logger("exchanges.aggregator")
+
+ADAPTERS = {
+    "bybit": BybitAdapter,
+    "binance": BinanceAdapter,
+    "delta": DeltaAdapter,
+}
+
+# One pool for every fan-out; sized so a handful of symbols can be in flight at once.
+_pool = ThreadPoolExecutor(max_workers=int(os.getenv("PRICE_FETCH_WORKERS", "32")),
+                           thread_name_prefix="price-fetch")
+
+
+class PriceAggregator:
+    """
+    Fetches a price from several venues in parallel and combines the answers.
+
+    Args:
+        adapters (list): ExchangeAdapter instances to query.
+        deadline (float): Maximum seconds to wait for venues.
+        mode (str): "median" or "first".
+        quorum (int, optional): For "median", return once this many venues
+                                answered. Defaults to a majority of the
+                                venues (2 of 3).
+    """
+
+    def __init__(self, adapters, deadline: float = 1.5, mode: str = "median", quorum: int = None):
+        if mode not in ("median", "first"):
+            raise ValueError(f"Unknown aggregation mode: {mode}")
+        self.adapters = list(adapters)
+        self.deadline = deadline
+        self.mode = mode
+        self.quorum = min(quorum or len(self.adapters) // 2 + 1, len(self.adapters))
+
+    def _fan_out(self, method: str, asset: str) -> dict:
+        """
+        Calls `adapter.<method>(asset)` on every venue and collects healthy
+        answers until the quorum or the deadline is reached.
+
+        Returns:
+            dict: {venue_name: price} for venues that answered in time.
+        """
+        futures = {_pool.submit(getattr(adapter, method), asset): adapter.name for adapter in self.adapters}
+        needed = 1 if self.mode == "first" else self.quorum
+        quotes = {}
+        pending = set(futures)
+        end = time.monotonic() + self.deadline
+
+        while pending and len(quotes) < needed:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                venue = futures[future]
+                try:
+                    price = future.result()
+                except Exception as e:
+                    log_event(logger, logging.WARNING, "venue_error", venue=venue, asset=asset, error=str(e))
+                    continue
+                if price is not None and price > 0:
+                    quotes[venue] = float(price)
+
+        if pending and logger.isEnabledFor(logging.DEBUG):
+            # Late venues keep running in the pool; their answers are dropped.
+            log_event(logger, logging.DEBUG, "venues_skipped", asset=asset,
+                      venues=",".join(futures[f] for f in pending))
+        return quotes
+
+    def quotes(self, asset: str) -> dict:
+        """Healthy spot quotes per venue for `asset`."""
+        return self._fan_out("spot_price", asset)
+
+    def price(self, asset: str):
+        """
+        Aggregated spot price of `asset`.
+
+        Returns:
+            float or None: The combined price, or None if no venue answered in time.
+        """
+        quotes = self.quotes(asset)
+        if not quotes:
+            return None
+        if self.mode == "first":
+            return next(iter(quotes.values()))
+        return statistics.median(quotes.values())
+
+    def prices(self, assets) -> dict:
+        """
+        Aggregated spot prices of several assets, with one batched request per
+        venue (`ExchangeAdapter.spot_prices`) instead of one per asset.
+
+        Returns:
+            dict: {asset: price} for the assets at least one venue quoted in time.
+        """
+        assets = list(dict.fromkeys(assets))
+        futures = {_pool.submit(adapter.spot_prices, assets): adapter.name for adapter in self.adapters}
+        needed = 1 if self.mode == "first" else self.quorum
+        quotes = {asset: [] for asset in assets}
+        pending = set(futures)
+        end = time.monotonic() + self.deadline
+
+        while pending and any(len(q) < needed for q in quotes.values()):
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    venue_prices = future.result()
+                except Exception as e:
+                    log_event(logger, logging.WARNING, "venue_error", venue=futures[future],
+                              assets=len(assets), error=str(e))
+                    continue
+                for asset, price in venue_prices.items():
+                    if asset in quotes and price is not None and price > 0:
+                        quotes[asset].append(float(price))
+
+        combine = (lambda q: q[0]) if self.mode == "first" else statistics.median
+        return {asset: combine(q) for asset, q in quotes.items() if q}
+
+
+def _from_env() -> PriceAggregator:
+    names = [n.strip().lower() for n in os.getenv("PRICE_VENUES", "bybit,binance,delta").split(",") if n.strip()]
+    unknown = [n for n in names if n not in ADAPTERS]
+    if unknown:
+        raise ValueError(f"Unknown price venues in PRICE_VENUES: {', '.join(unknown)}")
+    quorum = os.getenv("PRICE_QUORUM")
+    return PriceAggregator(
+        [ADAPTERS[name]() for name in names],
+        deadline=float(os.getenv("PRICE_DEADLINE", "1.5")),
+        mode=os.getenv("PRICE_AGGREGATION", "median").lower(),
+        quorum=int(quorum) if quorum else None,
+    )
+
+
+# Default aggregator shared by the monitor and the handlers.
+aggregator = _from_env()
+HEDGE_VENUE = os.getenv("HEDGE_VENUE", "delta").lower()
+# Bursts of commands (and the monitor) asking for the same symbol share one fan-out.
+PRICE_CACHE_TTL = float(os.getenv("PRICE_CACHE_TTL", "0.25"))
+
+
+@coalesced(ttl=PRICE_CACHE_TTL, name="spot_price")
+def get_spot_price(asset: str):
+    """
+    Drop-in replacement for `exchanges.bybit.get_spot_price` backed by every
+    configured venue.
+
+    Args:
+        asset (str): Base asset symbol (e.g. "BTC").
+
+    Returns:
+        float or None: Aggregated price, or None if no venue is healthy.
+    """
+    return aggregator.price(asset)
+
+
+def get_spot_prices(assets) -> dict:
+    """
+    Aggregated spot prices of several assets in one batched request per venue.
+
+    Args:
+        assets (iterable): Base asset symbols (e.g. ["BTC", "ETH"]).
+
+    Returns:
+        dict: {asset: price}; assets no venue quoted are missing.
+    """
+    return aggregator.prices(assets)
+
+
+@coalesced(ttl=PRICE_CACHE_TTL, name="mark_price")
+def get_mark_price(asset: str, venue: str = None):
+    """
+    Mark price of `asset`'s perpetual on the venue where hedges are placed.
+
+    Args:
+        asset (str): Base asset symbol (e.g. "BTC").
+        venue (str, optional): Venue name; defaults to HEDGE_VENUE.
+
+    Returns:
+        float or None: Mark price, or None if the venue could not be reached.
+    """
+    adapter = ADAPTERS[(venue or HEDGE_VENUE).lower()]()
+    future = _pool.submit(adapter.mark_price, asset)
+    try:
+        return float(future.result(timeout=aggregator.deadline))
+    except Exception as e:
+        log_event(logger, logging.WARNING, "mark_price_unavailable", venue=adapter.name, asset=asset, error=str(e))
+        return None
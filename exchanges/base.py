@@ -0,0 +1,102 @@
+"""
+Common interface for exchange price sources.
+
+Each venue (Bybit, Binance, Delta) implements `ExchangeAdapter` so the
+aggregator can query them interchangeably. Adapter methods raise on any
+failure; the aggregator decides what an unhealthy venue means for the price.
+"""
+
+from urllib.parse import urlparse
+
+import requests
+
+from exchanges import resilience
+from observability import metrics
+
+REQUEST_TIMEOUT = 5.0  # Seconds; no public market data call should take longer.
+
+
+def get_checked(url: str, params: dict = None, timeout: float = REQUEST_TIMEOUT) -> requests.Response:
+    """requests.get that raises on 4xx/5xx, so HTTP errors count as failures."""
+    response = requests.get(url, params=params, timeout=timeout)
+    response.raise_for_status()
+    return response
+
+
+def fetch_json(venue: str, endpoint: str, url: str, params: dict = None, timeout: float = None):
+    """
+    GETs `url` and returns the decoded JSON body, recording latency and errors.
+
+    The request goes through `exchanges.resilience`: per-endpoint timeout,
+    jittered retries, the host's circuit breaker and hedged requests.
+
+    Args:
+        venue (str): Venue name for the metrics labels (e.g. "binance").
+        endpoint (str): Endpoint name for the metrics labels (e.g. "ticker").
+        url (str): Full URL.
+        params (dict, optional): Query parameters.
+        timeout (float, optional): Overrides the per-endpoint timeout.
+
+    Returns:
+        dict or list: The parsed JSON response.
+
+    Raises:
+        requests.exceptions.RequestException: On network / HTTP errors.
+        resilience.CircuitOpenError: If the host is currently failing fast.
+        ValueError: If the body is not valid JSON.
+    """
+    try:
+        with metrics.EXCHANGE_LATENCY.time(venue=venue, endpoint=endpoint):
+            response = resilience.call(urlparse(url).netloc, endpoint, get_checked, url, params,
+                                       hedge=True, timeout=timeout)
+        return response.json()
+    except Exception:
+        metrics.EXCHANGE_ERRORS.inc(venue=venue, endpoint=endpoint)
+        raise
+
+
+class ExchangeAdapter:
+    """
+    Base class for a venue that can quote spot and perpetual mark prices.
+
+    Subclasses set `name` and implement `spot_price` and `mark_price`.
+    """
+
+    name = "base"
+
+    def spot_price(self, asset: str) -> float:
+        """
+        Returns the current spot price of `asset` (e.g. "BTC") in USD(T).
+
+        Raises:
+            Exception: If the venue did not return a usable price.
+        """
+        raise NotImplementedError
+
+    def mark_price(self, asset: str) -> float:
+        """
+        Returns the mark price of the venue's USD(T) perpetual on `asset`.
+
+        Raises:
+            Exception: If the venue did not return a usable price.
+        """
+        raise NotImplementedError
+
+    def spot_prices(self, assets) -> dict:
+        """
+        Spot prices of several assets, ideally in one request. Venues with an
+        all-tickers endpoint override this; the default asks one at a time.
+
+        Returns:
+            dict: {asset: price} for the assets the venue quoted; others are left out.
+        """
+        prices = {}
+        for asset in assets:
+            try:
+                prices[asset] = self.spot_price(asset)
+            except Exception:
+                continue
+        return prices
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name}>"
@@ -0,0 +1,30 @@
+"""
+Binance market data: spot prices and USDT-margined perpetual mark prices.
+"""
+
+from exchanges.base import ExchangeAdapter, fetch_json
+
+SPOT_URL = "https://api.binance.com/api/v3/ticker/price"  # Spot last price.
+MARK_URL = "https://fapi.binance.com/fapi/v1/premiumIndex"  # USDT-M futures mark price.
+
+
+class BinanceAdapter(ExchangeAdapter):
+    """
+    Binance spot and USDT-M perpetual prices for "<ASSET>USDT" pairs.
+    """
+
+    name = "binance"
+
+    def spot_price(self, asset: str) -> float:
+        data = fetch_json(self.name, "ticker_price", SPOT_URL, params={"symbol": asset.upper() + "USDT"})
+        return float(data["price"])
+
+    def spot_prices(self, assets) -> dict:
+        # Without a symbol the endpoint returns every spot pair in one response.
+        data = fetch_json(self.name, "ticker_price_all", SPOT_URL)
+        last = {t["symbol"]: t["price"] for t in data}
+        return {a: float(last[a.upper() + "USDT"]) for a in assets if a.upper() + "USDT" in last}
+
+    def mark_price(self, asset: str) -> float:
+        data = fetch_json(self.name, "premium_index", MARK_URL, params={"symbol": asset.upper() + "USDT"})
+        return float(data["markPrice"])
@@ -1,6 +1,15 @@
+import logging
 import requests  # Import the requests library for making HTTP requests.
 
+from exchanges import resilience
+from exchanges.base import ExchangeAdapter, fetch_json, get_checked
+from observability import metrics
+from observability.log import get_logger, log_event
+
+logger = get_logger("exchanges.bybit")
+
 BASE_URL = "https://api.bybit.com/v5/market/tickers"  # Define the base URL for the Bybit market tickers API endpoint.
+HOST = "api.bybit.com"  # Circuit breaker key for every Bybit call.
 
 
 def get_spot_price(symbol1: str) -> float:
@@ -20,13 +29,14 @@ def get_spot_price(symbol1: str) -> float:
     symbol = symbol1.upper() + "USDT"
 
     try:
-        # Make a GET request to the Bybit API.
+        # Make a GET request to the Bybit API through the resilience layer
+        # (timeout, retries, circuit breaker, hedged requests). It raises an
+        # HTTPError for bad responses (4xx or 5xx status codes).
         # 'category': "spot" specifies we want spot market data.
         # 'symbol': the constructed trading pair (e.g., "BTCUSDT").
-        response = requests.get(BASE_URL, params={"category": "spot", "symbol": symbol})
-
-        # Raise an HTTPError for bad responses (4xx or 5xx status codes).
-        response.raise_for_status()
+        with metrics.EXCHANGE_LATENCY.time(venue="bybit", endpoint="tickers"):
+            response = resilience.call(HOST, "tickers", get_checked, BASE_URL,
+                                       {"category": "spot", "symbol": symbol}, hedge=True)
 
         # Parse the JSON response from the API.
         data = response.json()
@@ -45,35 +55,77 @@ def get_spot_price(symbol1: str) -> float:
         # Extract the 'lastPrice' from the ticker data and convert it to a float.
         price = float(ticker_data["lastPrice"])
 
-        # Print a success message to the console with the fetched price.
-        print(f"[Bybit API] Fetched spot price for {symbol}: {price}")
+        # Log the fetched price (DEBUG only, this runs for every position on every tick).
+        if logger.isEnabledFor(logging.DEBUG):
+            log_event(logger, logging.DEBUG, "spot_price", symbol=symbol, price=price)
         return price  # Return the fetched price.
 
     except requests.exceptions.HTTPError as http_err:
         # Handle HTTP-specific errors (e.g., 404 Not Found, 500 Internal Server Error).
-        print(f"[Bybit API] HTTP error fetching price for {symbol}: {http_err}")
+        metrics.EXCHANGE_ERRORS.inc(venue="bybit", endpoint="tickers")
+        logger.warning(f"HTTP error fetching price for {symbol}: {http_err}")
         return None
     except requests.exceptions.ConnectionError as conn_err:
         # Handle network-related errors (e.g., no internet connection, DNS failure).
-        print(f"[Bybit API] Connection error fetching price for {symbol}: {conn_err}")
+        metrics.EXCHANGE_ERRORS.inc(venue="bybit", endpoint="tickers")
+        logger.warning(f"Connection error fetching price for {symbol}: {conn_err}")
         return None
     except requests.exceptions.Timeout as timeout_err:
         # Handle request timeout errors.
-        print(f"[Bybit API] Timeout error fetching price for {symbol}: {timeout_err}")
+        metrics.EXCHANGE_ERRORS.inc(venue="bybit", endpoint="tickers")
+        logger.warning(f"Timeout error fetching price for {symbol}: {timeout_err}")
         return None
     except requests.exceptions.RequestException as req_err:
         # Handle any other general requests-related errors.
-        print(f"[Bybit API] An error occurred with the request for {symbol}: {req_err}")
+        metrics.EXCHANGE_ERRORS.inc(venue="bybit", endpoint="tickers")
+        logger.warning(f"An error occurred with the request for {symbol}: {req_err}")
         return None
     except IndexError:
         # Handle case where 'list' might be empty or 'result' structure is unexpected.
-        print(f"[Bybit API] No ticker data found for {symbol}. Check symbol or API response structure.")
+        metrics.EXCHANGE_ERRORS.inc(venue="bybit", endpoint="tickers")
+        logger.warning(f"No ticker data found for {symbol}. Check symbol or API response structure.")
         return None
     except (TypeError, ValueError) as data_err:
         # Handle errors during data parsing (e.g., 'lastPrice' not a valid number).
-        print(f"[Bybit API] Data parsing error for {symbol}: {data_err}. Response might be malformed.")
+        metrics.EXCHANGE_ERRORS.inc(venue="bybit", endpoint="tickers")
+        logger.warning(f"Data parsing error for {symbol}: {data_err}. Response might be malformed.")
+        return None
+    except resilience.CircuitOpenError as circuit_err:
+        # Bybit has been failing; don't wait on it again until the breaker resets.
+        metrics.EXCHANGE_ERRORS.inc(venue="bybit", endpoint="tickers")
+        logger.warning(f"Skipping price for {symbol}: {circuit_err}")
         return None
     except Exception as e:
         # Catch any other unexpected errors.
-        print(f"[Bybit API] An unexpected error occurred fetching price for {symbol}: {e}")
-        return None
\ No newline at end of file
+        metrics.EXCHANGE_ERRORS.inc(venue="bybit", endpoint="tickers")
+        logger.warning(f"An unexpected error occurred fetching price for {symbol}: {e}")
+        return None
+
+
+class BybitAdapter(ExchangeAdapter):
+    """
+    Bybit spot prices and USDT perpetual mark prices.
+    """
+
+    name = "bybit"
+
+    def spot_price(self, asset: str) -> float:
+        price = get_spot_price(asset)
+        if price is None:
+            raise ValueError(f"Bybit returned no spot price for {asset}")
+        return price
+
+    def spot_prices(self, assets) -> dict:
+        # Without a symbol the endpoint returns every spot ticker in one response.
+        data = fetch_json("bybit", "tickers_all", BASE_URL, params={"category": "spot"})
+        if data["retCode"] != 0:
+            raise ValueError(f"Bybit API error: {data['retMsg']}")
+        last = {t["symbol"]: t["lastPrice"] for t in data["result"]["list"]}
+        return {a: float(last[a.upper() + "USDT"]) for a in assets if last.get(a.upper() + "USDT")}
+
+    def mark_price(self, asset: str) -> float:
+        symbol = asset.upper() + "USDT"
+        data = fetch_json("bybit", "tickers_linear", BASE_URL, params={"category": "linear", "symbol": symbol})
+        if data["retCode"] != 0:
+            raise ValueError(f"Bybit API error: {data['retMsg']}")
+        return float(data["result"]["list"][0]["markPrice"])
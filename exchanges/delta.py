@@ -0,0 +1,115 @@
+"""
+Delta Exchange market data: perpetual mark / index prices, option chains and
+product lookup.
+
+Orders are placed on Delta (see `riskEngine.hedge`), so its mark price is the
+reference for hedge limit prices. Its option chain feeds the implied
+volatility surfaces in `riskEngine.vol_surface`.
+"""
+
+import os
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+from exchanges import resilience
+from exchanges.base import ExchangeAdapter, fetch_json, get_checked
+from exchanges.singleflight import coalesced
+from observability import metrics
+
+# Same venue as the order endpoint in riskEngine.hedge when configured.
+BASE_URL = os.getenv("APP_BASE_URL") or "https://api.delta.exchange"
+# The product list rarely changes, so concurrent and repeated lookups share one download.
+PRODUCTS_CACHE_TTL = float(os.getenv("PRODUCTS_CACHE_TTL", "300"))
+OPTION_SETTLEMENT_HOUR = 12  # Delta options settle at 12:00 UTC on their expiry date.
+
+
+def option_expiry_ms(symbol: str) -> int:
+    """Expiry (epoch ms) of a Delta option symbol such as "C-BTC-60000-281226" (DDMMYY)."""
+    day = datetime.strptime(symbol.rsplit("-", 1)[1], "%d%m%y")
+    return int(day.replace(hour=OPTION_SETTLEMENT_HOUR, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+@coalesced(ttl=PRODUCTS_CACHE_TTL, name="products")
+def _products() -> dict:
+    """{symbol: product id} of every product listed on Delta Exchange."""
+    url = f"{BASE_URL}/v2/products" # API endpoint for products.
+    # Make an HTTP GET request (with timeout, retries and circuit breaker); raises for 4xx/5xx.
+    with metrics.EXCHANGE_LATENCY.time(venue="delta", endpoint="products"):
+        response = resilience.call(urlparse(url).netloc, "products", get_checked, url)
+    data = response.json() # Parse the JSON response.
+    return {product["symbol"]: product["id"] for product in data["result"]}
+
+
+def perp_symbol(asset: str) -> str:
+    """Delta's USD perpetual for an asset, e.g. "BTC" -> "BTCUSD"."""
+    return f"{asset.upper()}USD"
+
+
+def product_id(symbol_name):
+    """
+    Fetches the product ID for a given symbol from Delta Exchange API.
+    This ID is often required by trading APIs to identify specific trading pairs/products.
+
+    Args:
+        symbol_name (str): The trading symbol (e.g., "BTCUSDT", "ETHUSDQ").
+
+    Returns:
+        str or None: The product ID if found, otherwise None.
+    """
+    return _products().get(symbol_name) # None if no matching symbol is found.
+
+
+class DeltaAdapter(ExchangeAdapter):
+    """
+    Delta Exchange USD perpetual tickers ("<ASSET>USD"). The ticker's
+    `spot_price` is Delta's index price for the asset.
+    """
+
+    name = "delta"
+
+    def _ticker(self, asset: str) -> dict:
+        data = fetch_json(self.name, "ticker", f"{BASE_URL}/v2/tickers/{perp_symbol(asset)}")
+        if not data.get("success", True) or not data.get("result"):
+            raise ValueError(f"Delta returned no ticker for {asset}")
+        return data["result"]
+
+    def spot_price(self, asset: str) -> float:
+        return float(self._ticker(asset)["spot_price"])
+
+    def mark_price(self, asset: str) -> float:
+        return float(self._ticker(asset)["mark_price"])
+
+    def spot_prices(self, assets) -> dict:
+        data = fetch_json(self.name, "tickers_all", f"{BASE_URL}/v2/tickers",
+                          params={"contract_types": "perpetual_futures"})
+        index = {t["symbol"]: t.get("spot_price") for t in data.get("result") or []}
+        return {a: float(index[perp_symbol(a)]) for a in assets if index.get(perp_symbol(a))}
+
+    def option_chain(self, asset: str):
+        """
+        Every listed call and put on `asset` with its mark implied volatility,
+        in one request.
+
+        Returns:
+            tuple: (spot price, [{"type", "strike", "expiry" (epoch ms), "iv"}, ...]),
+                   legs without a usable IV left out.
+        """
+        data = fetch_json(self.name, "option_chain", f"{BASE_URL}/v2/tickers",
+                          params={"contract_types": "call_options,put_options",
+                                  "underlying_asset_symbols": asset.upper()})
+        spot, chain = None, []
+        for ticker in data.get("result") or []:
+            try:
+                iv = float((ticker.get("quotes") or {}).get("mark_iv") or 0)
+                leg = {"type": "call" if ticker["contract_type"] == "call_options" else "put",
+                       "strike": float(ticker["strike_price"]),
+                       "expiry": option_expiry_ms(ticker["symbol"]),
+                       "iv": iv / 100 if iv > 5 else iv}  # Accept percentages as well as fractions.
+            except (KeyError, TypeError, ValueError):
+                continue
+            if leg["iv"] > 0:
+                chain.append(leg)
+            spot = spot or float(ticker.get("spot_price") or 0) or None
+        if spot is None:
+            raise ValueError(f"Delta returned no option chain for {asset}")
+        return spot, chain
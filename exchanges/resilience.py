@@ -0,0 +1,273 @@
+"""
+Resilience layer for outbound exchange calls.
+
+Every call goes through `call(host, endpoint, fn, ...)`, which adds:
+
+  * a per-endpoint timeout, passed to `fn` as its `timeout` keyword;
+  * retries with full jitter (idempotent reads only);
+  * a circuit breaker per host: after FAILURE_THRESHOLD consecutive failures
+    the host is "open" and calls fail fast with `CircuitOpenError` for
+    RESET_TIMEOUT seconds, then one trial call is let through ("half-open");
+  * optional hedged requests: if the first attempt has not answered after the
+    endpoint's observed p95 latency, a second attempt is fired and whichever
+    finishes first wins.
+
+Orders are not idempotent, so order placement only gets the timeout and the
+breaker (see `riskEngine.hedge`), never retries or hedging.
+
+`stats()` reports retries, hedges, fast failures and circuit states, which are
+also exported through `observability.metrics`.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+from observability import metrics
+from observability.log import get_logger
+
+logger = get_logger("exchanges.resilience")
+
+FAILURE_THRESHOLD = 5  # Consecutive failures that open a circuit.
+RESET_TIMEOUT = 30.0  # Seconds a circuit stays open before a trial call.
+LATENCY_WINDOW = 200  # Latency samples kept per endpoint for the p95 estimate.
+MIN_HEDGE_SAMPLES = 20  # Don't hedge until the p95 estimate means something.
+
+# Per-endpoint timeouts in seconds; anything not listed uses DEFAULT_TIMEOUT.
+DEFAULT_TIMEOUT = 5.0
+TIMEOUTS = {
+    "tickers": 3.0,
+    "ticker": 3.0,
+    "ticker_price": 3.0,
+    "premium_index": 3.0,
+    "tickers_linear": 3.0,
+    "products": 10.0,
+    "orders": 10.0,
+}
+
+RETRIES = metrics.counter("riskbot_exchange_retries", "Retried exchange calls.", ("host", "endpoint"))
+HEDGED = metrics.counter("riskbot_exchange_hedged_requests", "Hedged second attempts fired.", ("host", "endpoint"))
+FAST_FAILS = metrics.counter("riskbot_exchange_circuit_rejections",
+                             "Calls rejected because the host circuit was open.", ("host",))
+OPEN_CIRCUITS = metrics.gauge("riskbot_exchange_open_circuits", "Hosts whose circuit is currently open.")
+
+# Pool for hedged attempts; the caller's own thread runs the first attempt otherwise.
+_hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedged-request")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a host whose circuit breaker is open."""
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Whether `error` says the host is struggling (worth a retry and counted by
+    the breaker) rather than that the request itself was wrong.
+    """
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500 or error.response.status_code == 429
+    return False
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures; open ->
+    half-open after `reset_timeout`; half-open -> closed on success, open on
+    failure.
+    """
+
+    def __init__(self, host: str, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True  # Exactly one trial call at a time.
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info(f"Circuit for {self.host} closed again")
+                OPEN_CIRCUITS.dec()
+            self.state = "closed"
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                if self.state == "closed":
+                    OPEN_CIRCUITS.inc()
+                    self.times_opened += 1
+                    logger.warning(f"Circuit for {self.host} opened after {self.failures} consecutive failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class _LatencyTracker:
+    """Rolling latency samples for one endpoint, used to pick the hedge delay."""
+
+    def __init__(self):
+        self.samples = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def p95(self):
+        with self._lock:
+            if len(self.samples) < MIN_HEDGE_SAMPLES:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+
+_breakers = {}
+_latencies = {}
+_registry_lock = threading.Lock()
+
+
+def breaker(host: str) -> CircuitBreaker:
+    with _registry_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host)
+        return _breakers[host]
+
+
+def _tracker(host: str, endpoint: str) -> _LatencyTracker:
+    with _registry_lock:
+        return _latencies.setdefault((host, endpoint), _LatencyTracker())
+
+
+def _backoff(attempt: int, base: float = 0.1, cap: float = 2.0) -> float:
+    # "Full jitter": uniform in [0, min(cap, base * 2^attempt)].
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _attempt(host: str, endpoint: str, fn, args, kwargs, timeout: float):
+    start = time.perf_counter()
+    result = fn(*args, timeout=timeout, **kwargs)
+    _tracker(host, endpoint).add(time.perf_counter() - start)
+    return result
+
+
+def _hedged_attempt(host: str, endpoint: str, fn, args, kwargs, timeout: float):
+    """
+    Runs one attempt; if it is slower than the endpoint's p95, fires a second
+    one and returns whichever finishes first successfully.
+    """
+    delay = _tracker(host, endpoint).p95()
+    if delay is None or delay >= timeout:
+        return _attempt(host, endpoint, fn, args, kwargs, timeout)
+
+    first = _hedge_pool.submit(_attempt, host, endpoint, fn, args, kwargs, timeout)
+    done, _ = wait([first], timeout=delay)
+    if done:
+        return first.result()
+
+    HEDGED.inc(host=host, endpoint=endpoint)
+    second = _hedge_pool.submit(_attempt, host, endpoint, fn, args, kwargs, timeout)
+    pending = {first, second}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                return future.result()
+            except Exception as e:
+                error = e
+    raise error
+
+
+def call(host: str, endpoint: str, fn, *args, retries: int = 2, hedge: bool = False,
+         timeout: float = None, **kwargs):
+    """
+    Calls `fn(*args, timeout=..., **kwargs)` with timeout, retries, circuit
+    breaking and optional request hedging.
+
+    Args:
+        host (str): Host / venue name, one circuit breaker each (e.g. "bybit").
+        endpoint (str): Endpoint name, used for timeouts, latency and stats.
+        fn (callable): The call to make; must accept a `timeout` keyword.
+        retries (int): Extra attempts after the first; use 0 for non-idempotent calls.
+        hedge (bool): Fire a second attempt after the endpoint's p95 latency.
+        timeout (float, optional): Overrides the per-endpoint timeout.
+
+    Returns:
+        Whatever `fn` returns.
+
+    Raises:
+        CircuitOpenError: If the host's circuit is open.
+        Exception: The last error from `fn` once retries are exhausted, or
+                   straight away for non-transient errors (e.g. HTTP 404).
+    """
+    circuit = breaker(host)
+    timeout = timeout if timeout is not None else TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT)
+
+    for attempt in range(retries + 1):
+        if not circuit.allow():
+            FAST_FAILS.inc(host=host)
+            raise CircuitOpenError(f"Circuit open for {host}; skipping {endpoint}")
+        try:
+            if hedge:
+                result = _hedged_attempt(host, endpoint, fn, args, kwargs, timeout)
+            else:
+                result = _attempt(host, endpoint, fn, args, kwargs, timeout)
+        except Exception as e:
+            if not is_transient(e):
+                circuit.record_success()  # The host answered; the request was the problem.
+                raise
+            circuit.record_failure()
+            if attempt == retries or circuit.state == "open":
+                raise  # Out of attempts, or the breaker just tripped: no point retrying.
+            RETRIES.inc(host=host, endpoint=endpoint)
+            logger.debug(f"Retrying {host}/{endpoint} after error: {e}")
+            time.sleep(_backoff(attempt))
+            continue
+        circuit.record_success()
+        return result
+
+
+def stats() -> dict:
+    """
+    Snapshot of retries, hedged requests, fast failures and circuit states.
+
+    Returns:
+        dict: {"circuits": {host: {...}}, "retries": {...}, "hedged": {...}, "rejected": {...}}
+    """
+    with _registry_lock:
+        circuits = {
+            host: {"state": b.state, "consecutive_failures": b.failures, "times_opened": b.times_opened}
+            for host, b in _breakers.items()
+        }
+    return {
+        "circuits": circuits,
+        "open_circuits": sum(1 for c in circuits.values() if c["state"] == "open"),
+        "retries": {"/".join(key): value for key, value in RETRIES.series().items()},
+        "hedged": {"/".join(key): value for key, value in HEDGED.series().items()},
+        "rejected": {key[0]: value for key, value in FAST_FAILS.series().items()},
+    }
@@ -0,0 +1,124 @@
+"""
+Request coalescing ("single-flight") with a short-TTL micro-cache.
+
+When many users send `/monitor_risk BTC` at the same moment, and the monitor
+is fetching BTC as well, every caller used to make its own upstream request.
+Wrapped in a `SingleFlight`, the first caller for a key makes the request and
+every concurrent caller for the same key waits for that one result. The
+result is then kept for `ttl` seconds, so a burst of commands costs a single
+upstream call and does not eat into the venue's rate limit.
+
+Exceptions are shared with the callers that were waiting but are never
+cached. Callers are threads: the exchange clients are blocking, so handlers
+call them through `asyncio.to_thread` and wait without blocking the event loop.
+
+Usage:
+    @coalesced(ttl=0.25, name="spot_price")
+    def get_spot_price(asset): ...
+"""
+
+import functools
+import threading
+import time
+
+from observability import metrics
+
+COALESCED = metrics.counter("riskbot_exchange_coalesced",
+                            "Exchange lookups answered without an upstream call.", ("name", "source"))
+
+MAX_CACHED = 4096  # Expired entries are swept once the cache grows past this.
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls per key and caches results for `ttl` seconds.
+
+    Args:
+        ttl (float): Seconds a result is reused; 0 only coalesces in-flight calls.
+        name (str): Label for the `riskbot_exchange_coalesced` metric.
+    """
+
+    def __init__(self, ttl: float = 0.0, name: str = ""):
+        self.ttl = ttl
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> _Call in flight
+        self._cache = {}  # key -> (expires_at, value)
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Returns `fn(*args, **kwargs)`, sharing one call between concurrent
+        callers with the same `key` and reusing a result younger than `ttl`.
+        """
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None and hit[0] > time.monotonic():
+                COALESCED.inc(name=self.name, source="cache")
+                return hit[1]
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            COALESCED.inc(name=self.name, source="inflight")
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if call.error is None and self.ttl > 0:
+                    if len(self._cache) >= MAX_CACHED:
+                        self._sweep()
+                    self._cache[key] = (time.monotonic() + self.ttl, call.value)
+            call.done.set()
+        return call.value
+
+    def _sweep(self):
+        # Caller holds the lock.
+        now = time.monotonic()
+        for key in [k for k, (expires, _) in self._cache.items() if expires <= now]:
+            del self._cache[key]
+
+    def forget(self, key=None):
+        """Drops the cached result for `key`, or every cached result."""
+        with self._lock:
+            if key is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(key, None)
+
+
+def coalesced(ttl: float = 0.0, name: str = None):
+    """
+    Decorator running a function through its own `SingleFlight`, keyed by its
+    arguments. The group is exposed as `wrapper.flight`.
+    """
+    def decorate(fn):
+        flight = SingleFlight(ttl, name or fn.__name__)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items()))) if kwargs else args
+            return flight.do(key, fn, *args, **kwargs)
+
+        wrapper.flight = flight
+        return wrapper
+    return decorate
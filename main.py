@@ -3,12 +3,26 @@
 Main entry point for the Telegram bot application.
 
 This script initializes and starts the asynchronous Telegram bot.
+
+Usage:
+    python main.py                   # commands + monitoring in one process
+    python main.py --role bot        # command handling only
+    python main.py --role monitor    # risk monitoring only (shard-leased)
+    python main.py --webhook         # receive updates via WEBHOOK_URL, not polling
+    python -m observability.startup  # profile the cold start (--budget SECONDS for CI)
+
+Split roles need STATE_BACKEND=sqlite (and the same STATE_DB file) so that all
+nodes see the same positions. The role can also be set with NODE_ROLE.
+
 It uses `nest_asyncio` to handle potential issues with nested event loops,
 which can occur in certain environments (e.g., Jupyter notebooks, some IDEs)
 where `asyncio.run()` might be called when an event loop is already running.
 """
 
+from observability import startup # First, so startup timing covers every other import.
+import argparse # Command line flags for the node role and webhook mode.
 import asyncio # Import the asyncio library for asynchronous programming.
+import os
 import nest_asyncio # Import nest_asyncio to allow nested use of asyncio.run().
 from TeligramBot.teligram_bot import run_bot # Import the main bot running function.
 
@@ -20,6 +34,13 @@ nest_asyncio.apply()
 # This block ensures that the run_bot() function is called only when the script is
 # executed directly (not when imported as a module).
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crypto risk management Telegram bot")
+    parser.add_argument("--role", choices=("all", "bot", "monitor"), default=os.getenv("NODE_ROLE", "all"),
+                        help="What this node runs (default: all)")
+    parser.add_argument("--webhook", action="store_true", default=None,
+                        help="Use a webhook at WEBHOOK_URL instead of long polling")
+    args = parser.parse_args()
+
     # Run the main asynchronous bot function.
     # asyncio.run() manages the event loop for the asynchronous operations.
-    asyncio.run(run_bot())
\ No newline at end of file
+    asyncio.run(run_bot(role=args.role, webhook=args.webhook))
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""
+Structured, level-gated logging for the bot.
+
+Events are written as a single `key=value` line, e.g.
+
+    2024-05-01T12:00:00 DEBUG riskbot.monitor event=position_evaluated asset=BTC drop_pct=1.2
+
+`log_event` checks the level before building anything, so a disabled DEBUG
+event on the hot path costs one cached `isEnabledFor` lookup. The level comes
+from the LOG_LEVEL environment variable (default INFO).
+"""
+
+import logging
+import os
+import sys
+
+ROOT_LOGGER = "riskbot"
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Renders `record.fields` as `key=value` pairs after the event name."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, "fields", None) or {}
+        parts = [
+            self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            record.levelname,
+            record.name,
+            f"event={record.getMessage()}",
+        ]
+        for key, value in fields.items():
+            if isinstance(value, float):
+                value = f"{value:.6g}"
+            elif isinstance(value, str) and (" " in value or not value):
+                value = '"' + value.replace('"', "'") + '"'
+            parts.append(f"{key}={value}")
+        line = " ".join(parts)
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def _configure_root() -> logging.Logger:
+    root = logging.getLogger(ROOT_LOGGER)
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(KeyValueFormatter())
+        root.addHandler(handler)
+        root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+        # Don't also go through the root logger configured by basicConfig().
+        root.propagate = False
+    return root
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Returns a logger under the `riskbot` namespace, e.g. `riskbot.monitor`.
+    """
+    _configure_root()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def log_event(logger: logging.Logger, level: int, event: str, **fields):
+    """
+    Logs a structured event if `level` is enabled for `logger`.
+
+    Args:
+        logger (logging.Logger): Logger from `get_logger`.
+        level (int): logging level, e.g. logging.DEBUG.
+        event (str): Short snake_case event name.
+        **fields: Key/value context written after the event name.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"fields": fields})
@@ -0,0 +1,276 @@
+"""
+Lightweight, dependency-free metrics in the Prometheus text format.
+
+Counters, gauges and histograms are registered on a module-level registry and
+served by a small HTTP server on `/metrics`. All metric types are thread-safe,
+since the exchange calls run in worker threads as well as on the event loop.
+
+Usage:
+    from observability import metrics
+    metrics.EXCHANGE_LATENCY.observe(0.12, venue="bybit", endpoint="tickers")
+    with metrics.TICK_DURATION.time():
+        ...
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from observability.log import get_logger, log_event
+
+logger = get_logger("metrics")
+
+# Default latency buckets in seconds, suited to HTTP round trips.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(labelnames, labels: dict) -> tuple:
+    # Labels are stored as a tuple of values in declaration order.
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=None) -> str:
+    pairs = list(zip(labelnames, key))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{name}="{str(value).replace(chr(34), chr(39))}"' for name, value in pairs)
+    return "{" + body + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def samples(self):
+        """Yields (suffix, label_string, value) tuples for the exposition format."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {value!r}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """A monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def series(self) -> dict:
+        """Current value of every label combination, keyed by label values."""
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield "_total", _format_labels(self.labelnames, key), float(value)
+
+
+class Gauge(_Metric):
+    """A value that can go up and down (e.g. in-flight requests)."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def set(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield "", _format_labels(self.labelnames, key), float(value)
+
+
+class Histogram(_Metric):
+    """
+    Cumulative histogram with fixed upper bounds, plus sum and count.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}  # label key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the wall-clock duration of the `with` block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(_label_key(self.labelnames, labels))
+        return series[-1] if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(bound)
+                yield "_bucket", _format_labels(self.labelnames, key, ("le", le)), float(cumulative)
+            yield "_sum", _format_labels(self.labelnames, key), float(series[-2])
+            yield "_count", _format_labels(self.labelnames, key), float(series[-1])
+
+
+class Registry:
+    """Holds every metric and renders them for scraping."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str):
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name, documentation, labelnames=()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# === Hot-path metrics ===
+TICK_DURATION = histogram(
+    "riskbot_monitor_tick_seconds", "Duration of one risk monitor tick.",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0))
+POSITIONS_EVALUATED = counter(
+    "riskbot_positions_evaluated", "Positions evaluated by the risk monitor.")
+POSITIONS_PER_SECOND = gauge(
+    "riskbot_positions_evaluated_per_second", "Evaluation throughput of the last monitor tick.")
+EXCHANGE_LATENCY = histogram(
+    "riskbot_exchange_request_seconds", "Latency of outbound exchange calls.", ("venue", "endpoint"))
+EXCHANGE_ERRORS = counter(
+    "riskbot_exchange_errors", "Failed outbound exchange calls.", ("venue", "endpoint"))
+TELEGRAM_SEND_LATENCY = histogram(
+    "riskbot_telegram_send_seconds", "Latency of Telegram send_message calls.")
+TELEGRAM_INFLIGHT_SENDS = gauge(
+    "riskbot_telegram_inflight_sends", "Telegram send_message calls currently in flight.")
+HEDGE_ROUND_TRIP = histogram(
+    "riskbot_hedge_order_seconds", "Round-trip time of hedge order placement.", ("outcome",))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would otherwise flood stderr.
+
+
+def start_metrics_server(port: int = None, host: str = "127.0.0.1"):
+    """
+    Serves `/metrics` from a daemon thread.
+
+    Args:
+        port (int, optional): Port to bind. Defaults to the METRICS_PORT
+                              environment variable, or 9108. 0 disables the server.
+        host (str): Interface to bind; local-only by default.
+
+    Returns:
+        ThreadingHTTPServer or None: The running server, or None when disabled
+                                     or the port is taken.
+    """
+    if port is None:
+        port = int(os.getenv("METRICS_PORT", "9108"))
+    if port == 0:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        # E.g. a second node on the same host; it runs on without /metrics.
+        log_event(logger, logging.ERROR, "metrics_server_failed", host=host, port=port, error=str(e))
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,260 @@
+"""
+Opt-in sampling profiler for the monitor loop and the command handlers.
+
+When a tick is slow, the tick histogram says so but not where the time went.
+A profiling session samples the stack of every thread in the process (the
+event loop running `run_risk_monitor` and the handlers, plus the worker
+threads doing exchange calls) every PROFILE_INTERVAL_MS for a fixed window,
+and times the named stages of the monitor's hot path:
+
+    tick        one `check_user_risks` pass
+    fetch       `get_spot_price`
+    store       recording the price in the position store
+    metrics     drawdown / VaR / volatility (NumPy)
+    product_id  the hedge venue's product lookup
+    hedge       mark price + `place_hedge_order`
+    options     batch greeks / delta-gamma alerts (`riskEngine.vol_surface`)
+    send        `bot.send_message` (see `TeligramBot.notify`)
+
+At the end of the window three files are written to PROFILE_DIR:
+
+    <label>-<time>.collapsed         "thread;frame;frame count" lines, for
+                                     flamegraph.pl / speedscope / inferno
+    <label>-<time>.speedscope.json   open at https://www.speedscope.app
+    <label>-<time>.stages.txt        per-stage count / total / mean / p95 / max
+
+A session starts from the environment (PROFILE_ON_START=<seconds> profiles
+the first seconds after startup) or from the admin-only `/profile [seconds]`
+command. When no session is running there is no sampling thread, and
+`stage()` returns a shared no-op context manager after one global lookup.
+
+Configuration (environment):
+    PROFILE_ON_START      seconds to profile from startup, default 0 (off)
+    PROFILE_SECONDS       default window of `/profile`, default 30
+    PROFILE_INTERVAL_MS   sampling interval, default 5
+    PROFILE_DIR           output directory, default "profiles"
+"""
+
+import collections
+import contextlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from observability.log import get_logger, log_event
+
+logger = get_logger("profiler")
+
+ON_START = float(os.getenv("PROFILE_ON_START", "0"))
+DEFAULT_SECONDS = float(os.getenv("PROFILE_SECONDS", "30"))
+INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+MAX_SECONDS = 600.0  # Longest window a session may run.
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_OFF = contextlib.nullcontext()
+_session = None  # The running Session, if any.
+_lock = threading.Lock()
+
+
+class _Stage:
+    __slots__ = ("stages", "name", "start")
+
+    def __init__(self, stages: dict, name: str):
+        self.stages = stages
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.stages.setdefault(self.name, []).append(time.perf_counter() - self.start)
+
+
+def stage(name: str):
+    """
+    Context manager timing one stage while a session is running; a no-op
+    otherwise. May wrap an `await`, in which case the stage's time includes
+    the wait.
+
+    Usage:
+        with profiler.stage("fetch"):
+            price = get_spot_price(asset)
+    """
+    session = _session
+    if session is None:
+        return _OFF
+    return _Stage(session.stages, name)
+
+
+def active():
+    """The running `Session`, or None."""
+    return _session
+
+
+def start(seconds: float = DEFAULT_SECONDS, label: str = "profile", interval: float = INTERVAL):
+    """
+    Starts a profiling session that stops by itself after `seconds`.
+
+    Returns:
+        Session: The new session.
+
+    Raises:
+        ValueError: If `seconds` is not in (0, MAX_SECONDS].
+        RuntimeError: If a session is already running.
+    """
+    global _session
+    if not 0 < seconds <= MAX_SECONDS:
+        raise ValueError(f"The profiling window must be between 0 and {MAX_SECONDS:g} seconds")
+    with _lock:
+        if _session is not None:
+            raise RuntimeError("A profiling session is already running")
+        _session = Session(seconds, label, interval)
+    _session._thread.start()
+    log_event(logger, logging.INFO, "profile_started", label=label, seconds=seconds, interval=interval)
+    return _session
+
+
+class Session:
+    """
+    One profiling window. Created by `start()`; results are available from
+    `wait()` once the window is over (or `stop()` cut it short).
+    """
+
+    def __init__(self, seconds: float, label: str, interval: float):
+        self.seconds = seconds
+        self.label = label
+        self.interval = interval
+        self.started = time.time()
+        self.stacks = collections.Counter()  # (thread name, (code, ...) root first) -> samples
+        self.stages = {}  # stage name -> [seconds, ...]
+        self.samples = 0
+        self.result = None
+        self._stop = threading.Event()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _run(self):
+        global _session
+        me = threading.get_ident()
+        deadline = time.monotonic() + self.seconds
+        try:
+            while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+                self._sample(me)
+        finally:
+            # Stop timing stages before the (slower) writing starts.
+            with _lock:
+                _session = None
+            try:
+                self.result = self._write()
+                log_event(logger, logging.INFO, "profile_written", label=self.label,
+                          samples=self.samples, files=",".join(self.result["files"]))
+            except Exception as e:
+                self.result = {"files": [], "summary": self.summary()}
+                log_event(logger, logging.ERROR, "profile_write_failed", label=self.label, error=str(e))
+            self._done.set()
+
+    def _sample(self, me: int):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[(names.get(ident, str(ident)), tuple(stack))] += 1
+        self.samples += 1
+
+    def stop(self) -> dict:
+        """Ends the window now and returns the result (see `wait`)."""
+        self._stop.set()
+        return self.wait()
+
+    def wait(self, timeout: float = None) -> dict:
+        """
+        Blocks until the window is over and the files are written.
+
+        Returns:
+            dict: "files" (paths written) and "summary" (the stage table),
+                  or None on timeout.
+        """
+        self._done.wait(timeout)
+        return self.result
+
+    def collapsed(self) -> str:
+        """The samples as collapsed stacks, one "thread;frame;...;frame count" per line."""
+        lines = []
+        for (thread, stack), count in sorted(self.stacks.items(), key=lambda item: -item[1]):
+            lines.append(";".join([thread] + [_frame_name(code) for code in stack]) + f" {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> dict:
+        """The samples in speedscope's file format, one sampled profile per thread."""
+        frames, index = [], {}
+        profiles = {}
+        for (thread, stack), count in self.stacks.items():
+            ids = []
+            for code in stack:
+                if code not in index:
+                    index[code] = len(frames)
+                    frames.append({"name": code.co_qualname, "file": _relative(code.co_filename),
+                                   "line": code.co_firstlineno})
+                ids.append(index[code])
+            profile = profiles.setdefault(thread, {"samples": [], "weights": []})
+            profile["samples"].append(ids)
+            profile["weights"].append(count * self.interval * 1000)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"{self.label} {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started))}",
+            "exporter": "riskbot profiler",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": thread,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(profile["weights"]),
+                "samples": profile["samples"],
+                "weights": profile["weights"],
+            } for thread, profile in sorted(profiles.items())],
+        }
+
+    def summary(self) -> str:
+        """The per-stage timing table, slowest total first."""
+        lines = [f"{self.label}: {self.samples} samples every {self.interval * 1000:g} ms "
+                 f"over {len({thread for thread, _ in self.stacks})} threads",
+                 f"{'stage':<12} {'count':>7} {'total s':>9} {'mean ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+        for name, durations in sorted(self.stages.items(), key=lambda item: -sum(item[1])):
+            ordered = sorted(durations)
+            p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+            lines.append(f"{name:<12} {len(ordered):>7} {sum(ordered):>9.3f} "
+                         f"{sum(ordered) / len(ordered) * 1000:>9.2f} {p95 * 1000:>9.2f} {ordered[-1] * 1000:>9.2f}")
+        if not self.stages:
+            lines.append("(no stages ran in this window)")
+        return "\n".join(lines)
+
+    def _write(self) -> dict:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, f"{self.label}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started))}")
+        summary = self.summary()
+        files = [base + ".collapsed", base + ".speedscope.json", base + ".stages.txt"]
+        with open(files[0], "w") as f:
+            f.write(self.collapsed())
+        with open(files[1], "w") as f:
+            json.dump(self.speedscope(), f)
+        with open(files[2], "w") as f:
+            f.write(summary + "\n")
+        return {"files": files, "summary": summary}
+
+
+def _relative(filename: str) -> str:
+    return os.path.relpath(filename, _ROOT) if filename.startswith(_ROOT) else filename
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_qualname} ({_relative(code.co_filename)}:{code.co_firstlineno})"
@@ -0,0 +1,126 @@
+"""
+Startup timing: how long a node takes from launch until it polls Telegram.
+
+`main.py` imports this module before anything else, and `run_bot` calls
+`mark("ready")` right before it starts polling (or serving the webhook, or
+monitoring). The time is exported as `riskbot_startup_seconds` and logged,
+as a warning when it exceeds STARTUP_BUDGET seconds (default 1.0).
+
+Run as a script it profiles a cold start in a fresh interpreter:
+
+    python -m observability.startup                 # slowest imports, time to ready
+    python -m observability.startup --budget 1.0    # exit 1 if over budget (for CI)
+
+The child process imports the bot with `-X importtime`, builds the Telegram
+application and registers the handlers (no network), which is everything
+`run_bot` does before the first poll. The heavy dependencies (scipy, pandas,
+scikit-learn, the ML model) are imported on first use, not at startup; the
+profile shows it if one of them sneaks back in.
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from observability import metrics
+from observability.log import get_logger, log_event
+
+logger = get_logger("startup")
+
+STARTED = time.perf_counter()  # As early as main.py can take it.
+BUDGET = float(os.getenv("STARTUP_BUDGET", "1.0"))  # Seconds until the first poll.
+
+STARTUP_SECONDS = metrics.gauge("riskbot_startup_seconds", "Seconds from launch to each startup stage.", ("stage",))
+
+# What a node does before polling, minus the network.
+_PROBE = """
+import time
+t = time.perf_counter()
+from TeligramBot.teligram_bot import setup_handlers
+from telegram.ext import ApplicationBuilder
+setup_handlers(ApplicationBuilder().token("0:startup-probe").build())
+print(time.perf_counter() - t)
+"""
+
+
+def mark(stage: str) -> float:
+    """Records and logs the seconds since launch at which `stage` was reached."""
+    elapsed = time.perf_counter() - STARTED
+    STARTUP_SECONDS.set(elapsed, stage=stage)
+    level = logging.WARNING if stage == "ready" and elapsed > BUDGET else logging.INFO
+    log_event(logger, level, "startup", stage=stage, seconds=elapsed, budget=BUDGET)
+    return elapsed
+
+
+def parse_importtime(stderr: str) -> list:
+    """
+    Parses `-X importtime` output.
+
+    Returns:
+        list: (cumulative_us, self_us, module) tuples, slowest first.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            continue  # The header line.
+        rows.append((cumulative_us, self_us, fields[2].strip()))
+    return sorted(rows, reverse=True)
+
+
+def profile(runs: int = 3, cwd: str = None) -> dict:
+    """
+    Cold-starts the bot `runs` times in fresh interpreters.
+
+    Returns:
+        dict: "ready_s" (one entry per run) and "imports" (the slowest run's
+              parsed import profile).
+    """
+    cwd = cwd or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ready, imports = [], []
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", _PROBE], cwd=cwd,
+                              capture_output=True, text=True, check=True)
+        ready.append(float(proc.stdout.strip().splitlines()[-1]))
+        if ready[-1] == max(ready):
+            imports = parse_importtime(proc.stderr)
+    return {"ready_s": ready, "imports": imports}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Profile the bot's cold start")
+    parser.add_argument("--runs", type=int, default=3, help="Cold starts to measure (default 3)")
+    parser.add_argument("--top", type=int, default=15, help="Slowest top-level imports to list")
+    parser.add_argument("--budget", type=float, nargs="?", const=BUDGET, default=None,
+                        help=f"Fail if the median time to ready exceeds this many seconds "
+                             f"(default STARTUP_BUDGET, {BUDGET})")
+    args = parser.parse_args(argv)
+
+    result = profile(args.runs)
+    median = statistics.median(result["ready_s"])
+
+    # Only first-party and top-level third-party modules; submodules are folded into them.
+    top_level = [row for row in result["imports"] if "." not in row[2] or row[2].split(".")[0] in
+                 ("TeligramBot", "riskEngine", "exchanges", "observability", "ML_model")]
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative_us, self_us, module in top_level[:args.top]:
+        print(f"{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {module}")
+    print(f"\ntime to ready: median {median:.3f}s over {args.runs} runs "
+          f"(min {min(result['ready_s']):.3f}s, max {max(result['ready_s']):.3f}s)")
+
+    if args.budget is not None and median > args.budget:
+        print(f"over the startup budget of {args.budget:.3f}s", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
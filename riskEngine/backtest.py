@@ -0,0 +1,265 @@
+"""
+Historical backtest of risk-threshold and auto-hedge policies.
+
+Replays stored price history through the same trigger as the live monitor
+(`calculate_drop_percent(entry, price) >= risk_threshold`, with the entry
+price fixed at the first price) and the same sizing as the hedging path
+(`calculate_perp_hedge_size` on `calculate_spot_delta`).
+
+Policy being simulated, per (asset, threshold, hedge ratio):
+  * a long spot position of `position_size` is opened at the first price;
+  * every new breach (the price crossing from below to at/above the
+    threshold) places a perp short of `hedge_ratio` x the recommended hedge
+    size, until the position is fully hedged;
+  * hedges are held to the end of the data.
+
+All thresholds of a chunk are evaluated at once as a (thresholds x time)
+NumPy array, and chunks of the grid are spread over a process pool.
+
+Usage:
+    python -m riskEngine.backtest prices.csv --thresholds 1:20:0.5 --hedge-ratios 0.1:1:0.1
+
+The price file can be CSV or Parquet, either "long" (timestamp, asset, price)
+or "wide" (timestamp column plus one price column per asset).
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from riskEngine.risk_metric import (
+    calculate_drop_percent,
+    calculate_perp_hedge_size,
+    calculate_spot_delta,
+    max_drawdown,
+)
+
+# Peak memory of `simulate` per (thresholds x time) element. Several (N, T)
+# arrays are alive at once: breach_count, hedged, hedge_pnl, equity and the two
+# temporaries of max_drawdown, plus the boolean breach masks. A 9 x 525,600
+# chunk measured about 52 bytes per element (245 MB).
+BYTES_PER_ELEMENT = 56
+# Memory one chunk may use; also what each worker process is budgeted.
+MAX_BLOCK_BYTES = 128 * 2 ** 20
+MAX_BLOCK_ELEMENTS = MAX_BLOCK_BYTES // BYTES_PER_ELEMENT
+
+# Price series per asset, set once per worker process by `_init_worker`.
+_PRICES = {}
+
+
+def load_price_history(path: str) -> dict:
+    """
+    Loads a price history file into one price array per asset.
+
+    Args:
+        path (str): CSV or Parquet file, long (timestamp, asset, price) or wide
+                    (timestamp + one column per asset).
+
+    Returns:
+        dict: {asset: np.ndarray of prices in time order}
+    """
+    if path.endswith((".parquet", ".pq")):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+    df.columns = [str(c).lower() if str(c).lower() in ("timestamp", "asset", "price") else c for c in df.columns]
+
+    if "timestamp" in df.columns:
+        df = df.sort_values("timestamp", kind="stable")
+    if {"asset", "price"} <= set(df.columns):
+        return {
+            str(asset).upper(): group["price"].to_numpy(dtype=float)
+            for asset, group in df.groupby("asset", sort=True)
+        }
+
+    value_columns = [c for c in df.columns if c != "timestamp"]
+    return {str(c).upper(): df[c].dropna().to_numpy(dtype=float) for c in value_columns}
+
+
+def simulate(prices: np.ndarray, thresholds: np.ndarray, hedge_ratios: np.ndarray,
+             position_size: float = 1.0) -> dict:
+    """
+    Simulates every (threshold, hedge ratio) pair on one price series.
+
+    Args:
+        prices (np.ndarray): Prices in time order (shape T).
+        thresholds (np.ndarray): Risk thresholds in percent (shape N).
+        hedge_ratios (np.ndarray): Fraction of the recommended hedge placed per
+                                   breach (shape M).
+        position_size (float): Spot position size.
+
+    Returns:
+        dict: "pnl", "max_drawdown", "hedge_count" and "breaches" arrays of
+              shape (N, M).
+    """
+    prices = np.asarray(prices, dtype=float)
+    thresholds = np.asarray(thresholds, dtype=float)[:, None]
+    entry = prices[0]
+
+    # Same trigger as the live monitor, for every threshold at once: (N, T).
+    breached = calculate_drop_percent(entry, prices)[None, :] >= thresholds
+    edges = breached.copy()
+    edges[:, 1:] &= ~breached[:, :-1]  # A new breach starts where the previous tick was fine.
+    breach_count = np.cumsum(edges, axis=1)
+
+    # Contracts to short for a full hedge; contract size 1 so it does not depend on price.
+    full_hedge = abs(calculate_perp_hedge_size(calculate_spot_delta(position_size, entry), entry))
+    price_moves = np.diff(prices)
+    spot_value = entry * position_size
+    spot_pnl = position_size * (prices - entry)
+
+    n_thresholds, n_ratios = thresholds.shape[0], len(hedge_ratios)
+    out = {
+        "pnl": np.empty((n_thresholds, n_ratios)),
+        "max_drawdown": np.empty((n_thresholds, n_ratios)),
+        "hedge_count": np.empty((n_thresholds, n_ratios), dtype=np.int64),
+        "breaches": np.repeat(breach_count[:, -1:], n_ratios, axis=1),
+    }
+
+    for j, ratio in enumerate(hedge_ratios):
+        # Hedged contracts held after each tick, capped at a full hedge.
+        hedged = np.minimum(breach_count * ratio, 1.0) * full_hedge
+        # Short perp P&L: -position held over the interval x price change.
+        hedge_pnl = np.zeros_like(hedged)
+        np.cumsum(-hedged[:, :-1] * price_moves, axis=1, out=hedge_pnl[:, 1:])
+        equity = spot_value + spot_pnl + hedge_pnl
+
+        out["pnl"][:, j] = equity[:, -1] - spot_value
+        out["max_drawdown"][:, j] = max_drawdown(equity, axis=1) * 100
+        # Breaches stop adding hedges once fully hedged.
+        out["hedge_count"][:, j] = np.minimum(breach_count[:, -1], int(np.ceil(1 / ratio - 1e-9)))
+    return out
+
+
+def _init_worker(prices: dict):
+    global _PRICES
+    _PRICES = prices
+
+
+def _run_chunk(task) -> pd.DataFrame:
+    asset, thresholds, hedge_ratios, position_size = task
+    result = simulate(_PRICES[asset], thresholds, hedge_ratios, position_size)
+    grid_t, grid_r = np.meshgrid(thresholds, hedge_ratios, indexing="ij")
+    return pd.DataFrame({
+        "asset": asset,
+        "threshold": grid_t.ravel(),
+        "hedge_ratio": grid_r.ravel(),
+        "pnl": result["pnl"].ravel(),
+        "max_drawdown_pct": result["max_drawdown"].ravel(),
+        "hedge_count": result["hedge_count"].ravel(),
+        "breaches": result["breaches"].ravel(),
+    })
+
+
+def _available_memory():
+    # Free physical memory in bytes, or None where sysconf cannot tell.
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def _default_workers(prices: dict, tasks: int) -> int:
+    """
+    Worker processes for `tasks` chunks: one per CPU, but no more than half of
+    the free memory can hold (each worker keeps a copy of `prices` plus one
+    chunk's arrays).
+    """
+    workers = min(os.cpu_count() or 1, tasks)
+    available = _available_memory()
+    if available is not None:
+        per_worker = MAX_BLOCK_BYTES + 8 * sum(len(series) for series in prices.values())
+        workers = min(workers, int(available // 2 // per_worker))
+    return max(1, workers)
+
+
+def run_grid(prices: dict, thresholds, hedge_ratios, position_size: float = 1.0, workers: int = None) -> pd.DataFrame:
+    """
+    Runs the backtest for every asset x threshold x hedge ratio combination.
+
+    Args:
+        prices (dict): {asset: price array}, e.g. from `load_price_history`.
+        thresholds (iterable): Risk thresholds in percent.
+        hedge_ratios (iterable): Hedge ratios (0 < ratio <= 1).
+        position_size (float): Spot position size.
+        workers (int, optional): Processes to use; 1 runs in-process. Defaults to
+                                 the CPU count, capped by what free memory can hold.
+
+    Returns:
+        pd.DataFrame: One row per grid point.
+    """
+    thresholds = np.asarray(list(thresholds), dtype=float)
+    hedge_ratios = np.asarray(list(hedge_ratios), dtype=float)
+    if np.any(thresholds <= 0):
+        raise ValueError("Risk thresholds must be above 0, as in the live monitor.")
+    if np.any((hedge_ratios <= 0) | (hedge_ratios > 1)):
+        raise ValueError("Hedge ratios must be in (0, 1].")
+
+    tasks = []
+    for asset, series in prices.items():
+        if len(series) < 2:
+            continue
+        chunk = max(1, MAX_BLOCK_ELEMENTS // len(series))
+        for start in range(0, len(thresholds), chunk):
+            tasks.append((asset, thresholds[start:start + chunk], hedge_ratios, position_size))
+
+    workers = workers or _default_workers(prices, len(tasks))
+    if workers == 1 or len(tasks) == 1:
+        _init_worker(prices)
+        frames = [_run_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(prices,)) as pool:
+            frames = list(pool.map(_run_chunk, tasks))
+
+    if not frames:
+        return pd.DataFrame(columns=["asset", "threshold", "hedge_ratio", "pnl",
+                                     "max_drawdown_pct", "hedge_count", "breaches"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def summarize(results: pd.DataFrame) -> pd.DataFrame:
+    """
+    Distribution of PnL, max drawdown and hedge count per asset.
+    """
+    return results.groupby("asset")[["pnl", "max_drawdown_pct", "hedge_count"]].describe(
+        percentiles=[0.05, 0.25, 0.5, 0.75, 0.95])
+
+
+def _parse_values(value: str) -> np.ndarray:
+    # "1:20:0.5" is an inclusive range, "1,5,10" a list.
+    if ":" in value:
+        start, stop, step = (float(v) for v in value.split(":"))
+        return np.round(np.arange(start, stop + step / 2, step), 10)
+    return np.array([float(v) for v in value.split(",") if v.strip()])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest risk thresholds and auto-hedge ratios")
+    parser.add_argument("prices", help="CSV or Parquet price history")
+    parser.add_argument("--thresholds", type=_parse_values, default=_parse_values("1:20:1"),
+                        help="Risk thresholds in %%, 'start:stop:step' or comma list")
+    parser.add_argument("--hedge-ratios", type=_parse_values, default=_parse_values("0.25,0.5,1"),
+                        help="Hedge ratios, 'start:stop:step' or comma list")
+    parser.add_argument("--assets", default=None, help="Comma separated subset of assets")
+    parser.add_argument("--position-size", type=float, default=1.0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=None, help="Write per-grid-point results to this CSV")
+    args = parser.parse_args(argv)
+
+    prices = load_price_history(args.prices)
+    if args.assets:
+        wanted = {a.strip().upper() for a in args.assets.split(",")}
+        prices = {k: v for k, v in prices.items() if k in wanted}
+
+    results = run_grid(prices, args.thresholds, args.hedge_ratios, args.position_size, args.workers)
+    if args.output:
+        results.to_csv(args.output, index=False)
+    with pd.option_context("display.width", 200, "display.max_columns", 50):
+        print(summarize(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,13 @@ import time # Import the time module for getting the current timestamp.
 import hashlib # Import hashlib for hashing algorithms (used in HMAC).
 import hmac # Import hmac for HMAC (Hash-based Message Authentication Code) generation.
 import dotenv as dotenv # Import dotenv to load environment variables from a .env file.
+from urllib.parse import urlparse
+
+from exchanges import resilience
+from observability import metrics
+from observability.log import get_logger
+
+logger = get_logger("hedge")
 
 dotenv.load_dotenv() # Load environment variables from the .env file.
 API_KEY = os.getenv("DELTA_API_KEY") # Retrieve the API Key from environment variables.
@@ -37,9 +44,10 @@ def create_signature(api_secret: str, req_time: str, method: str, endpoint: str,
     # The secret key and message must be encoded to bytes.
     return hmac.new(api_secret.encode(), message.encode(), hashlib.sha256).hexdigest()
 
-def place_hedge_order(product_id: int, size: float, price: float, order_type: str = "limit") -> dict:
+def place_hedge_order(product_id: int, size: float, price: float, order_type: str = "limit",
+                      side: str = "sell") -> dict:
     """
-    Places a hedge order (sell order) on the exchange.
+    Places a hedge order (a sell order by default) on the exchange.
 
     This function constructs and sends an authenticated POST request to the
     exchange's order placement endpoint.
@@ -50,6 +58,9 @@ def place_hedge_order(product_id: int, size: float, price: float, order_type: st
         price (float): The limit price at which to place the hedge order.
         order_type (str, optional): The type of order (e.g., "limit", "market").
                                      Defaults to "limit".
+        side (str, optional): "sell" to hedge a long position, "buy" to unwind
+                              an over-hedge (see `riskEngine.rebalancer`).
+                              Defaults to "sell".
 
     Returns:
         dict: A dictionary containing the API response data, or an error dictionary.
@@ -70,7 +81,7 @@ def place_hedge_order(product_id: int, size: float, price: float, order_type: st
         "product_id": product_id,
         "limit_price": str(price), # Convert price to string as required by some APIs.
         "size": str(size), # Convert size to string.
-        "side": "sell",  # A hedge typically involves selling to offset a long spot position.
+        "side": side,  # A hedge typically involves selling to offset a long spot position.
         "order_type": order_type,
         "time_in_force": "gtc" # Good-Till-Cancelled, a common time-in-force option.
     }
@@ -87,27 +98,42 @@ def place_hedge_order(product_id: int, size: float, price: float, order_type: st
         "Content-Type": "application/json"
     }
 
-    # Send the POST request to the API.
-    response = requests.post(url, headers=headers, data=payload)
+    # Send the POST request to the API, timing the full round trip.
+    # Orders are not idempotent: timeout and circuit breaker only, no retries or hedging.
+    start = time.perf_counter()
+    try:
+        with metrics.EXCHANGE_LATENCY.time(venue="delta", endpoint="orders"):
+            response = resilience.call(urlparse(url).netloc, "orders", requests.post, url,
+                                       headers=headers, data=payload, retries=0)
+    except (requests.exceptions.RequestException, resilience.CircuitOpenError) as e:
+        # Timeouts, connection failures and an open circuit all mean no order was confirmed.
+        logger.error(f"❌ Order request failed: {e}")
+        metrics.HEDGE_ROUND_TRIP.observe(time.perf_counter() - start, outcome="failed")
+        return {"error": "Order request failed", "details": str(e)}
+    round_trip = time.perf_counter() - start
 
     try:
         response_data = response.json() # Attempt to parse the JSON response.
     except requests.exceptions.JSONDecodeError as e:
         # Handle cases where the response is not valid JSON.
-        print("❌ Failed to parse response JSON:", e)
+        logger.error(f"❌ Failed to parse response JSON: {e}")
+        metrics.HEDGE_ROUND_TRIP.observe(round_trip, outcome="invalid_response")
         return {"error": "Invalid JSON response", "details": response.text}
     except Exception as e:
         # Catch any other unexpected errors during JSON parsing.
-        print("❌ An unexpected error occurred while parsing JSON:", e)
+        logger.error(f"❌ An unexpected error occurred while parsing JSON: {e}")
+        metrics.HEDGE_ROUND_TRIP.observe(round_trip, outcome="invalid_response")
         return {"error": "Unexpected JSON parsing error", "details": response.text}
 
 
     # Check the HTTP status code of the response.
     if response.status_code != 200:
-        # If the status code is not 200 (OK), print an error and return details.
-        print("❌ API Error:", response.status_code, response_data)
+        # If the status code is not 200 (OK), log an error and return details.
+        logger.error(f"❌ API Error: {response.status_code} {response_data}")
+        metrics.HEDGE_ROUND_TRIP.observe(round_trip, outcome="rejected")
         return {"error": "Order rejected", "status": response.status_code, "details": response_data}
 
     # Log success message if the order was placed successfully.
-    print("✅ Order placed successfully:", response_data)
+    logger.info(f"✅ Order placed successfully: {response_data}")
+    metrics.HEDGE_ROUND_TRIP.observe(round_trip, outcome="placed")
     return response_data # Return the full JSON response data.
\ No newline at end of file
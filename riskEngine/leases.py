@@ -0,0 +1,218 @@
+"""
+Shard leasing and leader election over the shared SQLite state.
+
+Users are hashed onto SHARDS shards, and a monitor node only evaluates the
+positions of shards it holds an unexpired lease on, so every position is
+monitored by exactly one node. Nodes heartbeat into the `nodes` table and
+each one claims its fair share (ceil(shards / live monitor nodes)) of free
+or expired shards. Surplus shards are released when a node joins, and the
+shards of a dead node are picked up by the others once its leases expire
+(LEASE_TTL seconds).
+
+The same table holds named leases, such as "poller": only one bot node may
+long-poll Telegram at a time, and standby nodes take over when the leader's
+lease expires.
+
+Lease changes run in `BEGIN IMMEDIATE` transactions, so two nodes can never
+both acquire the same lease. A tick can run for longer than LEASE_TTL, so the
+`owned` set may be stale by the time a position breaches: `confirm()`
+re-checks the shard's lease in the store (and extends it) right before an
+order is placed, and a node whose lease was taken over does not hedge.
+"""
+
+import logging
+import math
+import os
+import socket
+import threading
+import time
+import zlib
+
+from observability import metrics
+from observability.log import get_logger, log_event
+from riskEngine.sqlite_store import DEFAULT_PATH, connect
+
+logger = get_logger("leases")
+
+SHARDS = int(os.getenv("MONITOR_SHARDS", "64"))
+LEASE_TTL = float(os.getenv("LEASE_TTL", "15"))  # Seconds a lease lives without renewal.
+RENEW_EVERY = LEASE_TTL / 3
+
+OWNED_SHARDS = metrics.gauge("riskbot_owned_shards", "Monitor shards leased by this node.")
+
+
+def default_node_id() -> str:
+    return os.getenv("NODE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+
+def shard_of(user_id, shards: int = SHARDS) -> int:
+    """Stable shard of a user (the same in every process, unlike `hash()` of a str)."""
+    return zlib.crc32(str(user_id).encode()) % shards
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class LeaseManager:
+    """
+    Heartbeats this node and holds its share of monitor shards and any named
+    leases it acquires.
+
+    Args:
+        node_id (str, optional): Unique node name. Defaults to NODE_ID or host-pid.
+        role (str): Node role recorded in the heartbeat ("monitor", "bot", "all").
+        path (str): Shared state database.
+        shards (int): Number of monitor shards.
+        ttl (float): Lease lifetime in seconds.
+    """
+
+    def __init__(self, node_id: str = None, role: str = "monitor", path: str = DEFAULT_PATH,
+                 shards: int = SHARDS, ttl: float = LEASE_TTL):
+        self.node_id = node_id or default_node_id()
+        self.role = role
+        self.shards = shards
+        self.ttl_ms = int(ttl * 1000)
+        self._conn = connect(path)
+        self._lock = threading.RLock()  # One transaction at a time on `_conn` (confirm() runs in workers too).
+        self.owned = frozenset()  # Shards currently leased by this node.
+        self._last_renew = 0.0
+
+    def _transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        return self._conn
+
+    def heartbeat(self):
+        self._conn.execute(
+            "INSERT INTO nodes (node_id, role, heartbeat_ms) VALUES (?, ?, ?) "
+            "ON CONFLICT (node_id) DO UPDATE SET role = excluded.role, heartbeat_ms = excluded.heartbeat_ms",
+            (self.node_id, self.role, _now_ms()))
+
+    def live_monitors(self) -> int:
+        """Number of monitoring nodes with a recent heartbeat (at least this one)."""
+        (count,) = self._conn.execute(
+            "SELECT COUNT(*) FROM nodes WHERE role IN ('monitor', 'all') AND heartbeat_ms >= ?",
+            (_now_ms() - self.ttl_ms,)).fetchone()
+        return max(1, count)
+
+    def rebalance(self) -> frozenset:
+        """
+        Heartbeats, renews this node's shard leases, claims free / expired ones
+        up to its fair share and releases any surplus.
+
+        Returns:
+            frozenset: The shards this node now holds.
+        """
+        with self._lock:
+            return self._rebalance()
+
+    def _rebalance(self) -> frozenset:
+        self.heartbeat()
+        now = _now_ms()
+        fair_share = math.ceil(self.shards / self.live_monitors())
+        conn = self._transaction()
+        try:
+            rows = conn.execute("SELECT name, node_id, expires_ms FROM leases WHERE name LIKE 'shard:%'").fetchall()
+            holders = {int(name[6:]): (node, expires) for name, node, expires in rows}
+            mine = sorted(s for s, (node, expires) in holders.items() if node == self.node_id and expires > now)
+            free = [s for s in range(self.shards)
+                    if s not in holders or holders[s][1] <= now or holders[s][0] is None]
+
+            keep = mine[:fair_share]
+            for shard in mine[fair_share:]:  # A node joined: hand shards back.
+                conn.execute("UPDATE leases SET node_id = NULL, expires_ms = 0 WHERE name = ?", (f"shard:{shard}",))
+            claim = [s for s in free if s not in keep][:max(0, fair_share - len(keep))]
+            for shard in keep + claim:
+                conn.execute(
+                    "INSERT INTO leases (name, node_id, expires_ms) VALUES (?, ?, ?) "
+                    "ON CONFLICT (name) DO UPDATE SET node_id = excluded.node_id, expires_ms = excluded.expires_ms",
+                    (f"shard:{shard}", self.node_id, now + self.ttl_ms))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        owned = frozenset(keep + claim)
+        if owned != self.owned:
+            logger.info(f"Node {self.node_id} now holds {len(owned)}/{self.shards} shards")
+        self.owned = owned
+        self._last_renew = time.monotonic()
+        OWNED_SHARDS.set(len(owned))
+        return owned
+
+    def maybe_rebalance(self) -> frozenset:
+        """`rebalance()` if the leases are due for renewal, else the current shards."""
+        if time.monotonic() - self._last_renew >= RENEW_EVERY:
+            return self.rebalance()
+        return self.owned
+
+    def owns(self, user_id) -> bool:
+        """Whether this node should monitor `user_id`'s positions."""
+        return shard_of(user_id, self.shards) in self.owned
+
+    def confirm(self, user_id) -> bool:
+        """
+        Re-checks in the store that this node still holds the lease on
+        `user_id`'s shard and extends it by the TTL, so it cannot expire
+        during an order placed right after. Call before any action that must
+        not run on two nodes (placing a hedge order).
+
+        Returns:
+            bool: Whether the lease is still ours; if not, the shard is
+                  dropped from `owned`.
+        """
+        shard = shard_of(user_id, self.shards)
+        now = _now_ms()
+        with self._lock:
+            conn = self._transaction()
+            try:
+                held = conn.execute(
+                    "UPDATE leases SET expires_ms = ? WHERE name = ? AND node_id = ? AND expires_ms > ?",
+                    (now + self.ttl_ms, f"shard:{shard}", self.node_id, now)).rowcount == 1
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            if not held and shard in self.owned:
+                log_event(logger, logging.WARNING, "shard_lease_lost", node=self.node_id, shard=shard)
+                self.owned = self.owned - {shard}
+                OWNED_SHARDS.set(len(self.owned))
+        return held
+
+    def acquire(self, name: str) -> bool:
+        """
+        Takes or renews the named lease (e.g. "poller") if it is free, expired
+        or already ours.
+
+        Returns:
+            bool: Whether this node holds the lease now.
+        """
+        with self._lock:
+            return self._acquire(name)
+
+    def _acquire(self, name: str) -> bool:
+        now = _now_ms()
+        conn = self._transaction()
+        try:
+            row = conn.execute("SELECT node_id, expires_ms FROM leases WHERE name = ?", (name,)).fetchone()
+            if row is None or row[0] in (None, self.node_id) or row[1] <= now:
+                conn.execute(
+                    "INSERT INTO leases (name, node_id, expires_ms) VALUES (?, ?, ?) "
+                    "ON CONFLICT (name) DO UPDATE SET node_id = excluded.node_id, expires_ms = excluded.expires_ms",
+                    (name, self.node_id, now + self.ttl_ms))
+                held = True
+            else:
+                held = False
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return held
+
+    def release_all(self):
+        """Gives up every lease of this node (on clean shutdown) so others take over at once."""
+        with self._lock:
+            self._conn.execute("UPDATE leases SET node_id = NULL, expires_ms = 0 WHERE node_id = ?", (self.node_id,))
+            self._conn.execute("DELETE FROM nodes WHERE node_id = ?", (self.node_id,))
+            self.owned = frozenset()
+        OWNED_SHARDS.set(0)
@@ -1,9 +1,22 @@
 from riskEngine.hedge import place_hedge_order
 from telegram import Bot
-from exchanges.bybit import get_spot_price
+from exchanges.aggregator import get_spot_price, get_mark_price, get_spot_prices
 from datetime import datetime # Datetime module to get the date and time on which we get price of crypto
-from TeligramBot.handlers import user_positions, product_id
+from TeligramBot.handlers import product_id
+from riskEngine.position import Position
+from riskEngine.position_store import positions
+from TeligramBot.notify import send_alert
+from observability import metrics, profiler
+from observability.log import get_logger, log_event
+import asyncio
+import logging
+import time
 import numpy as np
+from riskEngine.risk_metric import calculate_drop_percent
+from riskEngine.streaming_stats import stats, position_exposures
+from riskEngine import vol_surface
+
+logger = get_logger("monitor")
 
 """
 IT IS USED TO CHECK THE  RISK MATRIX AND PRICE OF THE ASSET AT FIXED INTERVAL OF TIME AND AT EACH TIME
@@ -11,144 +24,349 @@ IT CHECK THE DROP PERCENTAGE AND IF THE DROP PERCENTAGE GET HIGHER THEN THE THRE
 WHICH USER SETS , IF THE USER HAVE SELECTED AUTO HEDGE FEATURE FOR THAT ASSET , USER
 GET ALERT AND AUTO_HEDGE GET START , IF NOT THEN THE USER GET AN ALERT ONLY
 """
-async def check_user_risks(bot: Bot): # IT HAVE PARAMETERS TO RESPONSE THE USER
-    # Iterate through each user in the user_positions dictionary.
-    for user_id, assets in user_positions.items():
-        # For each user, iterate through their  assets.
-        for asset, data in assets.items():
-            # Get the current spot price of the asset.
-            current_price = get_spot_price(asset)
-
-            # If the price cannot be fetched, print an error and skip to the next asset.
-            if current_price is None:
-                print(f"Could not fetch price for {asset}")
-                continue
+async def evaluate_position(bot: Bot, user_id, asset: str, position: Position, notify_safe: bool = True,
+                            may_hedge=None, price=None):
+    """
+    Fetches the price of one monitored position, records it and sends the
+    risk alert / auto-hedge / safe message that applies.
 
-            # Save current price to history for risk calculations.
-            # Use setdefault to initialize 'price_history' if it doesn't exist.
-            data.setdefault("price_history", []).append({
-                "time": datetime.utcnow().isoformat(), # Store time in ISO format for consistency.
-                "price": current_price,
-            })
-
-            # Retrieve risk-related inputs from the asset's data.
-            entry_price = data["entry_price"] # PRICE AT WHICH USER GIVE US TO MONITOR
-            threshold = float(data["risk_threshold"]) # MAX LOSS USER CAN TAKE
-            position_size = data["position_size"] # SIZE OF  ASSET HE HAS
-
-            # Validate the risk threshold: it must be greater than 0.
-            if threshold <= 0: # IF IT GOES LESS THAN 0 OR EQUAL TO 0 IT GET ALWAYS TRUE SO ELSE CONDITION NOT GET ON
-                await bot.send_message(
-                    chat_id=user_id,
-                    text=f"⚠️ Invalid risk threshold for {asset}: {threshold}%. Please set it above 0."
-                )
-                continue
+    Args:
+        bot (Bot): Bot used to message the user.
+        user_id (int): Owner of the position.
+        asset (str): Asset symbol (e.g. "BTC").
+        position (Position): The position entry from `positions` (re-read under
+                            the store's lock before it is changed).
+        notify_safe (bool): Whether to send the "No Risk Alert" message when
+                            the threshold is not breached.
+        may_hedge (callable, optional): Called with user_id right before an
+                                        auto-hedge order; False skips the order
+                                        (e.g. this node lost the user's shard).
+        price (float, optional): Spot price already fetched for this tick;
+                                 fetched here (in a worker thread) if None.
+
+    Returns:
+        dict or None: drop_percent, threshold, volatility (per sqrt(second),
+                      None until there is enough history), breached and
+                      price, or None if the position could not be evaluated.
+    """
+    # Get the current spot price of the asset unless the tick already did. Positions
+    # on the same asset within PRICE_CACHE_TTL reuse one upstream call (see
+    # `exchanges.singleflight`).
+    current_price = price
+    if current_price is None:
+        with profiler.stage("fetch"):
+            current_price = await asyncio.to_thread(get_spot_price, asset)
+
+    # If the price cannot be fetched, log it and skip this asset for now.
+    if current_price is None:
+        log_event(logger, logging.WARNING, "price_unavailable", user_id=user_id, asset=asset)
+        return None
+
+    # Save current price to history for risk calculations. Changes go to the
+    # object `edit()` yields, which a shared (SQLite) store writes back.
+    with profiler.stage("store"), positions.edit(user_id, asset) as current:
+        if current is None:  # Stopped while the price was being fetched.
+            return None
+        current.record_price(current_price)
+    position = current
+
+    # Retrieve risk-related inputs from the position. They were validated when
+    # the position was opened / its threshold changed, so no checks are needed here.
+    entry_price = position.entry_price # PRICE AT WHICH USER GIVE US TO MONITOR
+    threshold = position.risk_threshold # MAX LOSS USER CAN TAKE
+    position_size = position.position_size # SIZE OF  ASSET HE HAS
+
+    # Calculate the percentage drop from the entry price to the current price.
+    drop_percent = calculate_drop_percent(entry_price, current_price)
+    # Checked inline so that nothing is formatted when DEBUG is off.
+    if logger.isEnabledFor(logging.DEBUG):
+        log_event(logger, logging.DEBUG, "position_evaluated", user_id=user_id, asset=asset,
+                  entry=entry_price, current=current_price, threshold=threshold, drop_pct=drop_percent)
+
+    # === Risk Metrics Calculation ===
+
+    with profiler.stage("metrics"):
+        times, prices = position.prices.window(30) # Zero-copy views of the last 30 samples.
+
+        # Calculate Spot Delta and Notional Exposure.
+        delta = position_size * 1.0  # For spot positions, delta is typically 1.
+        notional = position_size * current_price # Total value of the position.
 
-            # Calculate the percentage drop from the entry price to the current price.
-            drop_percent = ((entry_price - current_price) / entry_price) * 100
-            print(f"[DEBUG] Entry: {entry_price}, Current: {current_price}, Threshold: {threshold}, Drop%: {drop_percent}")
-
-            # === Risk Metrics Calculation ===
-
-            prices = [p["price"] for p in data["price_history"]][-30:]
-
-            # Calculate Spot Delta and Notional Exposure.
-            delta = position_size * 1.0  # For spot positions, delta is typically 1.
-            notional = position_size * current_price # Total value of the position.
-
-            # Calculate Max Drawdown if there are at least two prices in history.
-            if len(prices) >= 2:
-                running_max = np.maximum.accumulate(prices) # Calculate cumulative maximums.
-                drawdowns = (np.array(prices) - running_max) / running_max # Calculate percentage drawdowns.
-                max_drawdown = np.min(drawdowns) * 100 # Find the maximum (most negative) drawdown.
-            else:
-                max_drawdown = None # Not enough data to calculate.
-
-            # Calculate 1-Day 95% VaR if there are at least 30 prices (for statistical significance).
-            if len(prices) >= 30:
-                returns = np.diff(np.log(prices)) # Calculate logarithmic returns.
-                std_dev = np.std(returns) # Calculate standard deviation of returns.
-                z_score = 1.65  # Z-score for 95% confidence level (one-tailed for losses).
-                var_1d_95 = notional * std_dev * z_score # Calculate VaR.
-            else:
-                var_1d_95 = None # Not enough data to calculate.
-
-            # === Risk Trigger ===
-            # Check if the drop percentage has exceeded the user's defined threshold.
-            if drop_percent >= threshold:
-                # If auto-hedge is enabled for this asset.
-                if user_positions[user_id][asset].get("auto_hedge") is True:
-                    # Log the auto-hedge trigger event.
-                    user_positions[user_id][asset].setdefault("auto_hedge_history", []).append({
+        # Calculate Max Drawdown if there are at least two prices in history.
+        if len(prices) >= 2:
+            running_max = np.maximum.accumulate(prices) # Calculate cumulative maximums.
+            drawdowns = (prices - running_max) / running_max # Calculate percentage drawdowns.
+            max_drawdown = np.min(drawdowns) * 100 # Find the maximum (most negative) drawdown.
+        else:
+            max_drawdown = None # Not enough data to calculate.
+
+        # Standard deviation of log returns over the window, shared by VaR and the scheduler.
+        std_dev = np.std(np.diff(np.log(prices))) if len(prices) >= 3 else None
+
+        # Calculate 1-Day 95% VaR if there are at least 30 prices (for statistical significance).
+        if len(prices) >= 30:
+            z_score = 1.65  # Z-score for 95% confidence level (one-tailed for losses).
+            var_1d_95 = notional * std_dev * z_score # Calculate VaR.
+        else:
+            var_1d_95 = None # Not enough data to calculate.
+
+        # Volatility per sqrt(second): samples may be irregularly spaced once the
+        # scheduler checks at-risk positions more often, so scale by the mean spacing.
+        volatility = None
+        if std_dev is not None:
+            span = (times[-1] - times[0]) / 1000 # Epoch milliseconds to seconds.
+            if span > 0:
+                volatility = float(std_dev) / np.sqrt(span / (len(prices) - 1))
+
+    result = {
+        "drop_percent": drop_percent,
+        "threshold": threshold,
+        "volatility": volatility,
+        "breached": drop_percent >= threshold,
+        "price": current_price,
+    }
+
+    # === Risk Trigger ===
+    # Check if the drop percentage has exceeded the user's defined threshold.
+    if drop_percent >= threshold:
+        # If auto-hedge is enabled for this asset.
+        if position.auto_hedge:
+            # Log the auto-hedge trigger event.
+            with positions.edit(user_id, asset) as current:
+                if current is not None:
+                    current.auto_hedge_history.append({
                         "time": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"), # Store UTC time.
                         "istrick": True, # Indicate that the auto-hedge was triggered.
                     })
 
-                    # Get the product ID required for placing a hedge order.
+            # Get the product ID required for placing a hedge order.
+            try:
+                with profiler.stage("product_id"):
                     get_product = product_id(asset)
-                    if get_product:
+            except Exception as e:
+                # A failing venue (or open circuit) must not take the whole tick down.
+                log_event(logger, logging.ERROR, "product_lookup_failed", user_id=user_id, asset=asset, error=str(e))
+                get_product = None
+            if get_product:
+                with profiler.stage("hedge"):
+                    # Price the hedge off the hedge venue's own mark price when available.
+                    hedge_price = get_mark_price(asset) or current_price
+                    # The lookups above can block; make sure the position is still ours to hedge.
+                    if may_hedge is not None and not may_hedge(user_id):
+                        order = None
+                    else:
                         # Place the hedge order using the external risk engine.
-                        result = place_hedge_order(get_product, data["size"], current_price)
-
-                        # Handle the result of the hedge order placement.
-                        if result.get("error"):
-                            print("Hedge failed:", result)
-                            await bot.send_message(chat_id=user_id, text=f"Auto-hedge failed:\n{result.get('details')}")
-                        elif result:
-                            # Log successful hedge order details.
-                            data.setdefault("hedge_logs", []).append({
+                        order = place_hedge_order(get_product, position_size, hedge_price)
+
+                # Handle the result of the hedge order placement.
+                if order is None:
+                    log_event(logger, logging.WARNING, "auto_hedge_skipped", user_id=user_id, asset=asset,
+                              reason="lease_lost")
+                elif order.get("error"):
+                    log_event(logger, logging.ERROR, "auto_hedge_failed", user_id=user_id, asset=asset,
+                              details=str(order.get("details")))
+                    await send_alert(bot, user_id, f"Auto-hedge failed:\n{order.get('details')}")
+                elif order:
+                    # Log successful hedge order details.
+                    with positions.edit(user_id, asset) as current:
+                        if current is not None:
+                            current.hedge_logs.append({
                                 "time": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
-                                "order_id": result["order_id"],
-                                "side": result["side"],
-                                "size": result["size"],
-                                "status": result["status"]
+                                "order_id": order["order_id"],
+                                "side": order["side"],
+                                "size": order["size"],
+                                "status": order["status"]
                             })
 
-                            # Send a detailed success message to the user.
-                            await bot.send_message(
-                                chat_id=user_id,
-                                text=(
-                                    f" Auto-Hedge Executed!\n\n"
-                                    f" Asset: {result['product_symbol']}\n"
-                                    f" Side: {result['side'].upper()}\n"
-                                    f" Size: {result['filled_size']}\n"
-                                    f" Order Type: {result['order_type'].capitalize()}\n"
-                                    f" Status: {result['state'].capitalize()}\n"
-                                    f" Time: {result['created_at'][:16].replace('T', ' ')} UTC\n"
-                                    f" Order ID: {result['id']}"
-                                )
-                            )
-                        else:
-                            # Handle unexpected outcomes from place_hedge_order.
-                            await bot.send_message(chat_id=user_id, text="Something went wrong in auto-hedging.\n")
-                            print(" Unknown error in auto-hedge")
-                else:
-                    # If auto-hedge is not enabled, send a risk alert message to the user.
-                    print("auto_hedge is false")
-                    print(user_positions[user_id][asset])
-
-                    risk_msg = (
-                        f"⚠ Risk Alert for {asset}!\n"
-                        f" Entry Price: ${entry_price:.2f}\n"
-                        f" Current Price: ${current_price:.2f}\n"
-                        f" Loss: {drop_percent:.2f}% exceeds your threshold of {threshold}%.\n\n"
-                        f" Risk Metrics:\n"
-                        f" Spot Delta: {delta:.4f} {asset}\n"
-                        f" Notional Exposure: ${notional:,.2f}\n"
+                    # Send a detailed success message to the user.
+                    await send_alert(
+                        bot,
+                        user_id,
+                        (
+                            f" Auto-Hedge Executed!\n\n"
+                            f" Asset: {order['product_symbol']}\n"
+                            f" Side: {order['side'].upper()}\n"
+                            f" Size: {order['filled_size']}\n"
+                            f" Order Type: {order['order_type'].capitalize()}\n"
+                            f" Status: {order['state'].capitalize()}\n"
+                            f" Time: {order['created_at'][:16].replace('T', ' ')} UTC\n"
+                            f" Order ID: {order['id']}"
+                        )
                     )
+                else:
+                    # Handle unexpected outcomes from place_hedge_order.
+                    await send_alert(bot, user_id, "Something went wrong in auto-hedging.\n")
+                    log_event(logger, logging.ERROR, "auto_hedge_unknown_error", user_id=user_id, asset=asset)
+        else:
+            # If auto-hedge is not enabled, send a risk alert message to the user.
+            log_event(logger, logging.INFO, "risk_alert", user_id=user_id, asset=asset,
+                      drop_pct=drop_percent, threshold=threshold)
+
+            risk_msg = (
+                f"⚠ Risk Alert for {asset}!\n"
+                f" Entry Price: ${entry_price:.2f}\n"
+                f" Current Price: ${current_price:.2f}\n"
+                f" Loss: {drop_percent:.2f}% exceeds your threshold of {threshold}%.\n\n"
+                f" Risk Metrics:\n"
+                f" Spot Delta: {delta:.4f} {asset}\n"
+                f" Notional Exposure: ${notional:,.2f}\n"
+            )
+
+            # Add Max Drawdown and VaR to the message if they were calculated.
+            if max_drawdown is not None:
+                risk_msg += f" Max Drawdown: {max_drawdown:.2f}%\n"
+            if var_1d_95 is not None:
+                risk_msg += f" 1-Day 95% VaR: ${var_1d_95:,.2f}\n"
+            # Longer-horizon figures from the streaming statistics, once they have warmed up.
+            snapshot = stats.snapshot()
+            daily_vol = snapshot.volatility(asset)
+            if daily_vol is not None:
+                risk_msg += f" 1-Day Volatility: {daily_vol * 100:.2f}%\n"
+            portfolio_var = snapshot.portfolio_var(position_exposures(positions.assets(user_id)))
+            if portfolio_var:
+                risk_msg += f" Portfolio 1-Day 95% VaR: ${portfolio_var:,.2f}\n"
+
+            await send_alert(bot, user_id, risk_msg) # Send the alert.
+
+    elif notify_safe:
+        # If the drop percentage is below the threshold, no risk alert is triggered.
+        await send_alert(
+            bot,
+            user_id,
+            f" No Risk Alert for {asset}.\nCurrent Drop: {drop_percent:.2f}% < Threshold: {threshold}%"
+        )
+
+    return result
+
+
+async def check_user_risks(bot: Bot, due=None, safe_notice=None, may_hedge=None): # IT HAVE PARAMETERS TO RESPONSE THE USER
+    """
+    Evaluates monitored positions.
+
+    Args:
+        bot (Bot): Bot used to message users.
+        due (iterable, optional): (user_id, asset) pairs to evaluate. Defaults
+                                  to every monitored position.
+        safe_notice (callable, optional): Called with (user_id, asset); returns
+                                          whether to send the "No Risk Alert"
+                                          message. Defaults to always.
+        may_hedge (callable, optional): Passed to `evaluate_position`.
+
+    Returns:
+        dict: {(user_id, asset): result of `evaluate_position`}
+    """
+    tick_start = time.perf_counter()
+    evaluated = 0
+    results = {}
+    with_options = []  # Positions with option legs, for the batch greeks pass.
+    if due is None:
+        # Iterate through each user and each of their assets, as of now.
+        due = [(user_id, asset) for user_id, asset, _ in positions.items()]
+    else:
+        due = list(due)
+
+    with profiler.stage("tick"):
+        # One batched request per venue for every symbol due this tick, off the
+        # event loop. Symbols missing from the answer are retried one by one.
+        with profiler.stage("fetch"):
+            prices = await asyncio.to_thread(get_spot_prices, sorted({asset for _, asset in due}))
+        for user_id, asset in due:
+            # The position may have been removed (/stop_monitor_risk) since it was scheduled.
+            position = positions.get(user_id, asset)
+            if position is None:
+                continue
+            notify_safe = safe_notice(user_id, asset) if safe_notice else True
+            result = await evaluate_position(bot, user_id, asset, position, notify_safe, may_hedge,
+                                             prices.get(asset))
+            results[(user_id, asset)] = result
+            if result is not None:
+                evaluated += 1
+                if position.options:
+                    with_options.append((user_id, asset, position, result["price"]))
+
+        if with_options:
+            with profiler.stage("options"):
+                await check_option_risks(bot, with_options)
+
+    # Record how long the whole pass took and how many positions it covered.
+    elapsed = time.perf_counter() - tick_start
+    metrics.TICK_DURATION.observe(elapsed)
+    metrics.POSITIONS_EVALUATED.inc(evaluated)
+    metrics.POSITIONS_PER_SECOND.set(evaluated / elapsed if elapsed > 0 else 0.0)
+
+    return results
+
+
+async def check_option_risks(bot: Bot, evaluated):
+    """
+    Values the option legs of the positions just evaluated in one batch
+    (`riskEngine.vol_surface.option_book`) and alerts users whose combined
+    delta or gamma went over the position's limit. Stale IV surfaces are
+    refreshed first, in a worker thread, one chain download per underlying.
+
+    A breach is alerted once: the greeks over their limit are recorded in the
+    position's `greek_alerts` until they are back within it, so the flags go
+    away with the position.
+
+    Args:
+        bot (Bot): Bot used to message users.
+        evaluated (list): (user_id, asset, position, price) of positions with option legs.
+
+    Returns:
+        dict: {(user_id, asset): exposure} as returned in `option_book()["positions"]`.
+    """
+    surfaces = vol_surface.surfaces
+    stale = surfaces.stale({asset for _, asset, _, _ in evaluated})
+    if stale:
+        await asyncio.to_thread(surfaces.refresh, stale)
+    book = vol_surface.option_book([(user_id, asset, position) for user_id, asset, position, _ in evaluated],
+                                   {asset: price for _, asset, _, price in evaluated})
+    alerted = {(user_id, asset): position.greek_alerts for user_id, asset, position, _ in evaluated}
+
+    for (user_id, asset), exposure in book["positions"].items():
+        delta_line = f"Net Delta (spot + hedges + options): ${exposure['delta_usd']:,.2f}"
+        gamma_line = f"Gamma (per 1% move): ${exposure['gamma_usd']:,.2f}"
+        checks = (
+            ("delta", exposure["delta_usd"], exposure["delta_limit"], delta_line, gamma_line),
+            ("gamma", exposure["gamma_usd"], exposure["gamma_limit"], gamma_line, delta_line),
+        )
+        breached = [kind for kind, value, limit, _, _ in checks if abs(value) > limit]
+        previous = alerted[(user_id, asset)]
+        if breached != previous:
+            with positions.edit(user_id, asset) as current:
+                if current is None:
+                    continue  # Stopped while the greeks were computed.
+                current.greek_alerts = breached
+
+        for kind, value, limit, line, other in checks:
+            if kind not in breached or kind in previous:
+                continue  # Within the limit, or already alerted for this breach.
+            log_event(logger, logging.INFO, "greek_alert", user_id=user_id, asset=asset, greek=kind,
+                      value=value, limit=limit)
+            await send_alert(
+                bot,
+                user_id,
+                f"⚠ Options {kind.capitalize()} Alert for {asset}!\n"
+                f" {line} exceeds your limit of ±${limit:,.2f}.\n\n"
+                f" Options Delta: {exposure['option_delta']:+.4f} {asset}\n"
+                f" {other}",
+            )
+    return book["positions"]
+
+
+async def sample_prices(symbols=None):
+    """
+    Feeds one sample of every monitored symbol's price into the streaming
+    statistics (`riskEngine.streaming_stats`), with one batched request per
+    venue (in a worker thread).
+
+    Args:
+        symbols (iterable, optional): Symbols to sample. Defaults to every
+                                      monitored asset.
 
-                    # Add Max Drawdown and VaR to the message if they were calculated.
-                    if max_drawdown is not None:
-                        risk_msg += f" Max Drawdown: {max_drawdown:.2f}%\n"
-                    if var_1d_95 is not None:
-                        risk_msg += f" 1-Day 95% VaR: ${var_1d_95:,.2f}\n"
-
-                    await bot.send_message(chat_id=user_id, text=risk_msg) # Send the alert.
-
-            else:
-                # If the drop percentage is below the threshold, no risk alert is triggered.
-                print(f"No risk detected for {asset}, sending safe message")
-                await bot.send_message(
-                    chat_id=user_id,
-                    text=f" No Risk Alert for {asset}.\nCurrent Drop: {drop_percent:.2f}% < Threshold: {threshold}%"
-                )
\ No newline at end of file
+    Returns:
+        StatsSnapshot: The snapshot published after the sample.
+    """
+    if symbols is None:
+        symbols = {asset for _, asset in positions.keys()}
+    return stats.update(await asyncio.to_thread(get_spot_prices, sorted(symbols)))
@@ -0,0 +1,424 @@
+"""
+Compact in-memory model of one monitored position.
+
+A position used to be a nested dict whose price history was a list of
+{"time": <ISO string>, "price": float} dicts, roughly 350 bytes per sample,
+with string-keyed lookups and float() conversions on every monitor tick.
+`Position` is a `__slots__` class whose config is validated once (when the
+position is opened or its threshold changes). Its prices live in a
+`PriceSeries`: two growable NumPy arrays of int64 epoch milliseconds and
+float64 prices, i.e. 16 bytes per sample. The monitor reads the arrays
+directly.
+
+Older prices are rolled up into 5-minute and hourly OHLC bars (`OHLCSeries`)
+by `riskEngine.retention`, so a long-lived position's memory stays bounded.
+
+Analytics, charts and anything else written against the old dict shape can
+keep using `position["entry_price"]`, `position.get("price_history")` and so
+on: the item access is a read-only, dict-compatible view, and `price_history`
+materializes {"time", "price"} dicts only for the samples actually indexed.
+"""
+
+from datetime import datetime, timezone
+
+import numpy as np
+
+INITIAL_CAPACITY = 32
+
+
+def now_ms() -> int:
+    """Current UTC time as epoch milliseconds."""
+    return int(datetime.now(timezone.utc).timestamp() * 1000)
+
+
+def ms_to_iso(ms: int) -> str:
+    """Epoch milliseconds to the naive-UTC ISO format used in messages and charts."""
+    return datetime.fromtimestamp(int(ms) / 1000, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def iso_to_ms(text: str) -> int:
+    """Naive-UTC ISO timestamp (as produced by `datetime.utcnow().isoformat()`) to epoch milliseconds."""
+    return int(datetime.fromisoformat(text).replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def validate_threshold(risk_threshold: float):
+    """
+    Checks a user-supplied risk threshold (a percentage drop from entry).
+
+    Raises:
+        ValueError: With a message suitable for the user.
+    """
+    if not np.isfinite(risk_threshold) or not 0 < risk_threshold <= 100:
+        raise ValueError("Risk threshold must be a percentage above 0 and at most 100.")
+
+
+def validate_config(position_size: float, risk_threshold: float):
+    """
+    Checks user-supplied position settings.
+
+    Raises:
+        ValueError: With a message suitable for the user.
+    """
+    if not np.isfinite(position_size) or position_size <= 0:
+        raise ValueError("Position size must be a positive number.")
+    validate_threshold(risk_threshold)
+
+
+def validate_option(option_type: str, strike: float, expiry_ms: int, size: float, now: int = None):
+    """
+    Checks a user-supplied option leg.
+
+    Raises:
+        ValueError: With a message suitable for the user.
+    """
+    if option_type not in ("call", "put"):
+        raise ValueError("Option type must be call or put.")
+    if not np.isfinite(strike) or strike <= 0:
+        raise ValueError("Strike must be a positive number.")
+    if expiry_ms <= (now_ms() if now is None else now):
+        raise ValueError("Expiry must be in the future.")
+    if not np.isfinite(size) or size == 0:
+        raise ValueError("Option size must be a non-zero number (negative for written options).")
+
+
+def validate_greek_limit(limit):
+    """
+    Checks a user-supplied delta / gamma limit (USD, None for the default).
+
+    Raises:
+        ValueError: With a message suitable for the user.
+    """
+    if limit is not None and (not np.isfinite(limit) or limit <= 0):
+        raise ValueError("Delta and gamma limits must be positive USD amounts.")
+
+
+class PriceSeries:
+    """
+    Append-only (time, price) samples in two NumPy arrays with amortized
+    doubling, so appends are O(1) and windows are zero-copy views.
+
+    The arrays and the sample count are one tuple, replaced in a single
+    assignment, and samples already counted are never rewritten: compaction
+    (in a worker thread) copies the kept samples into new arrays. A reader on
+    another thread therefore always sees a consistent series, and the views
+    it holds keep their data.
+    """
+
+    __slots__ = ("_state",)
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self._state = (np.empty(capacity, dtype=np.int64), np.empty(capacity, dtype=np.float64), 0)
+
+    def append(self, time_ms: int, price: float):
+        times, prices, size = self._state
+        if size == len(times):
+            capacity = max(INITIAL_CAPACITY, 2 * len(times))
+            times = np.resize(times, capacity)
+            prices = np.resize(prices, capacity)
+        times[size] = time_ms
+        prices[size] = price
+        self._state = (times, prices, size + 1)
+
+    @classmethod
+    def from_arrays(cls, times, prices):
+        """Builds a series owning copies of `times` (epoch ms) and `prices`."""
+        series = cls(max(INITIAL_CAPACITY, len(times)))
+        own_times, own_prices, _ = series._state
+        own_times[:len(times)] = times
+        own_prices[:len(prices)] = prices
+        series._state = (own_times, own_prices, len(times))
+        return series
+
+    def __len__(self):
+        return self._state[2]
+
+    def arrays(self):
+        """(times, prices) views of every sample, taken together."""
+        times, prices, size = self._state
+        return times[:size], prices[:size]
+
+    @property
+    def times(self) -> np.ndarray:
+        """Epoch milliseconds of every sample (a view; do not keep across appends)."""
+        times, _, size = self._state
+        return times[:size]
+
+    @property
+    def prices(self) -> np.ndarray:
+        """Price of every sample (a view; do not keep across appends)."""
+        _, prices, size = self._state
+        return prices[:size]
+
+    def window(self, n: int):
+        """(times, prices) views of the last `n` samples."""
+        times, prices, size = self._state
+        start = max(0, size - n)
+        return times[start:size], prices[start:size]
+
+    def drop_first(self, n: int):
+        """Forgets the `n` oldest samples (once they have been rolled up)."""
+        times, prices, size = self._state
+        n = min(n, size)
+        kept_times = np.empty(len(times), dtype=np.int64)
+        kept_prices = np.empty(len(prices), dtype=np.float64)
+        kept_times[:size - n] = times[n:size]
+        kept_prices[:size - n] = prices[n:size]
+        self._state = (kept_times, kept_prices, size - n)
+
+    def nbytes(self) -> int:
+        times, prices, _ = self._state
+        return times.nbytes + prices.nbytes
+
+
+class OHLCSeries:
+    """
+    Append-only OHLC bars (start time in epoch ms, open, high, low, close) in
+    one growable (capacity, 5) float64 array. Epoch milliseconds are exact in
+    a float64, and one array keeps the bars a single blob on disk.
+
+    Like `PriceSeries`, the array and the bar count are swapped in together
+    and counted bars are only ever changed in a new copy.
+    """
+
+    __slots__ = ("_state",)
+
+    FIELDS = ("time", "open", "high", "low", "close")
+
+    def __init__(self, capacity: int = 0):
+        self._state = (np.empty((capacity, 5), dtype=np.float64), 0)
+
+    def extend(self, bars: np.ndarray):
+        """Appends an (n, 5) array of bars newer than the last one."""
+        data, size = self._state
+        n = len(bars)
+        if size + n > len(data):
+            capacity = max(INITIAL_CAPACITY, 2 * len(data), size + n)
+            grown = np.empty((capacity, 5), dtype=np.float64)
+            grown[:size] = data[:size]
+            data = grown
+        data[size:size + n] = bars
+        self._state = (data, size + n)
+
+    def set_last(self, bar):
+        """Replaces the newest bar (a bucket that gained more prices)."""
+        data, size = self._state
+        data = data.copy()
+        data[size - 1] = bar
+        self._state = (data, size)
+
+    def drop_first(self, n: int):
+        """Forgets the `n` oldest bars."""
+        data, size = self._state
+        n = min(n, size)
+        kept = np.empty_like(data)
+        kept[:size - n] = data[n:size]
+        self._state = (kept, size - n)
+
+    @classmethod
+    def from_bytes(cls, blob: bytes):
+        bars = np.frombuffer(blob, dtype=np.float64).reshape(-1, 5)
+        series = cls(len(bars))
+        series.extend(bars)
+        return series
+
+    def tobytes(self) -> bytes:
+        return self.bars.tobytes()
+
+    def __len__(self):
+        return self._state[1]
+
+    @property
+    def bars(self) -> np.ndarray:
+        """(n, 5) view of every bar (do not keep across appends)."""
+        data, size = self._state
+        return data[:size]
+
+    def nbytes(self) -> int:
+        return self._state[0].nbytes
+
+
+class PriceHistoryView:
+    """
+    Read-only list-of-dicts face of a `PriceSeries`, matching the old
+    `price_history` list ({"time": ISO string, "price": float}).
+    """
+
+    __slots__ = ("_series",)
+
+    def __init__(self, series: PriceSeries):
+        self._series = series
+
+    def __len__(self):
+        return len(self._series)
+
+    @staticmethod
+    def _item(times, prices, index: int) -> dict:
+        return {"time": ms_to_iso(times[index]), "price": float(prices[index])}
+
+    def __getitem__(self, index):
+        times, prices = self._series.arrays()  # One snapshot for the whole lookup.
+        if isinstance(index, slice):
+            return [self._item(times, prices, i) for i in range(*index.indices(len(times)))]
+        if index < 0:
+            index += len(times)
+        if not 0 <= index < len(times):
+            raise IndexError("price history index out of range")
+        return self._item(times, prices, index)
+
+    def __iter__(self):
+        times, prices = self._series.arrays()
+        return (self._item(times, prices, i) for i in range(len(times)))
+
+
+class Position:
+    """
+    One user's monitored position in one asset.
+
+    Args:
+        asset (str): Asset symbol (e.g. "BTC").
+        entry_price (float): Price when monitoring started.
+        position_size (float): Size held, in units of the asset.
+        risk_threshold (float): Maximum tolerated drop from entry, in percent.
+        auto_hedge (bool): Whether breaches place a hedge order automatically.
+
+    Option legs on the same underlying live in `options` (see
+    `riskEngine.vol_surface`), with optional per-position USD limits on the
+    combined delta / gamma (None uses OPTION_DELTA_LIMIT_USD / OPTION_GAMMA_LIMIT_USD).
+    The greeks currently over their limit are kept in `greek_alerts`, so each
+    breach is alerted once.
+
+    Raises:
+        ValueError: If the size, threshold or entry price is not usable.
+    """
+
+    __slots__ = ("asset", "entry_price", "position_size", "risk_threshold", "auto_hedge",
+                 "prices", "bars_5m", "bars_1h", "hedge_logs", "risk_threshold_history", "auto_hedge_history",
+                 "options", "delta_limit", "gamma_limit", "greek_alerts")
+
+    # Keys served by the dict-compatible view, besides "price_history".
+    _FIELDS = ("entry_price", "position_size", "risk_threshold", "auto_hedge",
+               "hedge_logs", "risk_threshold_history", "auto_hedge_history",
+               "options", "delta_limit", "gamma_limit")
+
+    def __init__(self, asset: str, entry_price: float, position_size: float, risk_threshold: float,
+                 auto_hedge: bool = False):
+        validate_config(position_size, risk_threshold)
+        if not np.isfinite(entry_price) or entry_price <= 0:
+            raise ValueError("Entry price must be a positive number.")
+        self.asset = asset
+        self.entry_price = float(entry_price)
+        self.position_size = float(position_size)
+        self.risk_threshold = float(risk_threshold)
+        self.auto_hedge = bool(auto_hedge)
+        self.prices = PriceSeries()  # Raw samples of the last few hours.
+        self.bars_5m = OHLCSeries()  # Then 5-minute bars for days...
+        self.bars_1h = OHLCSeries()  # ...and hourly bars for months (see riskEngine.retention).
+        self.hedge_logs = []
+        self.risk_threshold_history = []
+        self.auto_hedge_history = []
+        self.options = []  # {"type", "strike", "expiry" (epoch ms), "size"} per option leg.
+        self.delta_limit = None
+        self.gamma_limit = None
+        self.greek_alerts = []  # "delta" / "gamma" while over their limit; already alerted.
+
+    @classmethod
+    def open(cls, asset: str, entry_price: float, position_size: float, risk_threshold: float, time_ms: int = None):
+        """Creates a position whose history starts with the entry price."""
+        position = cls(asset, entry_price, position_size, risk_threshold)
+        position.record_price(entry_price, time_ms)
+        return position
+
+    def record_price(self, price: float, time_ms: int = None):
+        self.prices.append(now_ms() if time_ms is None else time_ms, price)
+
+    def set_threshold(self, new_threshold: float):
+        """
+        Validates and applies a new risk threshold, logging the change.
+
+        Raises:
+            ValueError: If the threshold is not a usable percentage.
+        """
+        validate_threshold(new_threshold)
+        self.risk_threshold_history.append({
+            "time": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+            "old_threshold": self.risk_threshold,
+            "new_threshold": float(new_threshold),
+        })
+        self.risk_threshold = float(new_threshold)
+
+    def add_option(self, option_type: str, strike: float, expiry_ms: int, size: float) -> dict:
+        """
+        Validates and adds an option leg on this position's asset.
+
+        Args:
+            option_type (str): "call" or "put".
+            strike (float): Strike price in USD.
+            expiry_ms (int): Expiry as epoch milliseconds.
+            size (float): Units of the underlying; negative for written options.
+
+        Raises:
+            ValueError: If the leg is not usable.
+        """
+        validate_option(option_type, strike, expiry_ms, size)
+        option = {"type": option_type, "strike": float(strike), "expiry": int(expiry_ms), "size": float(size)}
+        self.options.append(option)
+        return option
+
+    def set_greek_limits(self, delta_limit: float = None, gamma_limit: float = None):
+        """
+        Validates and sets the USD delta / gamma limits (None keeps the default).
+
+        Raises:
+            ValueError: If a limit is not a positive amount.
+        """
+        validate_greek_limit(delta_limit)
+        validate_greek_limit(gamma_limit)
+        self.delta_limit = None if delta_limit is None else float(delta_limit)
+        self.gamma_limit = None if gamma_limit is None else float(gamma_limit)
+
+    # === Dict-compatible (read-only) view ===
+
+    def __getitem__(self, key: str):
+        if key == "price_history":
+            return PriceHistoryView(self.prices)
+        if key in self._FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return key == "price_history" or key in self._FIELDS
+
+    def keys(self):
+        return ("price_history",) + self._FIELDS
+
+    def as_dict(self) -> dict:
+        """The position in the old nested-dict shape, fully materialized."""
+        data = {key: self[key] for key in self._FIELDS}
+        data["price_history"] = list(PriceHistoryView(self.prices))
+        return data
+
+    @classmethod
+    def from_dict(cls, asset: str, data: dict):
+        """Builds a position from the old nested-dict shape (ISO timestamps)."""
+        position = cls(asset, data["entry_price"], data["position_size"], data["risk_threshold"],
+                       data.get("auto_hedge", False))
+        for point in data.get("price_history") or []:
+            position.record_price(point["price"], iso_to_ms(point["time"]))
+        position.hedge_logs = list(data.get("hedge_logs") or [])
+        position.risk_threshold_history = list(data.get("risk_threshold_history") or [])
+        position.auto_hedge_history = list(data.get("auto_hedge_history") or [])
+        position.options = list(data.get("options") or [])
+        position.delta_limit = data.get("delta_limit")
+        position.gamma_limit = data.get("gamma_limit")
+        return position
+
+    def __repr__(self):
+        return (f"<Position {self.asset} size={self.position_size} entry={self.entry_price} "
+                f"threshold={self.risk_threshold}% samples={len(self.prices)} "
+                f"bars={len(self.bars_5m)}/{len(self.bars_1h)}>")
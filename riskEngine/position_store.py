@@ -0,0 +1,201 @@
+"""
+Thread-safe store for the monitored positions.
+
+Replaces the old global `user_positions` dict. Two rules keep the monitor and
+the command handlers from tripping over each other:
+
+  * Copy-on-write membership: a user's {asset: position} mapping is never
+    changed in place. Adding or removing an asset builds a new mapping and
+    swaps it in, so `snapshot()` (what the monitor iterates) can never raise
+    "dictionary changed size during iteration", however many `await`s happen
+    while it is being walked.
+  * Lock striping: every change to a user's positions, including in-place
+    edits of a position (price history, hedge logs, thresholds), holds that
+    user's stripe lock. Users on different stripes never wait on each other,
+    so there is no global lock on the hot path.
+
+Critical sections are short and never span an `await`, so the locks are safe to
+take from the event loop as well as from worker threads.
+
+Make changes to the object yielded by `edit()` / `edit_all()`, not to one
+obtained earlier from `get()`: with STATE_BACKEND=sqlite (see
+`riskEngine.sqlite_store`) those are private copies and only the yielded one
+is written back.
+
+Usage:
+    from riskEngine.position_store import positions
+    positions.put(user_id, "BTC", Position.open("BTC", price, size, threshold))
+    with positions.edit(user_id, "BTC") as position:
+        if position is not None:
+            position.auto_hedge = True
+    for user_id, asset, position in positions.items():
+        ...
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from types import MappingProxyType
+
+DEFAULT_STRIPES = 64
+
+_EMPTY = MappingProxyType({})
+
+
+class PositionStore:
+    """
+    {user_id: {asset: position}} with copy-on-write snapshots and per-user
+    lock striping.
+
+    Args:
+        stripes (int): Number of locks user ids are spread over.
+    """
+
+    def __init__(self, stripes: int = DEFAULT_STRIPES):
+        self._stripes = [threading.RLock() for _ in range(stripes)]
+        self._users = {}  # user_id -> MappingProxyType({asset: position}); values are swapped, never edited.
+        self._index_lock = threading.Lock()  # Guards `_users` itself and the cached snapshot.
+        self._version = 0
+        self._snapshot = (0, MappingProxyType({}))
+
+    def _lock(self, user_id) -> threading.RLock:
+        return self._stripes[hash(user_id) % len(self._stripes)]
+
+    def _swap(self, user_id, assets: dict):
+        # Caller holds the user's stripe lock.
+        with self._index_lock:
+            if assets:
+                self._users[user_id] = MappingProxyType(assets)
+            else:
+                self._users.pop(user_id, None)
+            self._version += 1
+
+    # === Reads ===
+
+    def get(self, user_id, asset: str):
+        """
+        Returns the `Position` for (user_id, asset), or None. Code written
+        for the old nested dicts can still read it by key (`position["entry_price"]`).
+        """
+        return self._users.get(user_id, _EMPTY).get(asset)
+
+    def assets(self, user_id) -> MappingProxyType:
+        """Read-only {asset: position} view of one user's positions (empty if none)."""
+        return self._users.get(user_id, _EMPTY)
+
+    def has(self, user_id, asset: str = None) -> bool:
+        """Whether the user monitors `asset`, or anything at all when `asset` is None."""
+        assets = self._users.get(user_id, _EMPTY)
+        return bool(assets) if asset is None else asset in assets
+
+    def snapshot(self) -> MappingProxyType:
+        """
+        Read-only {user_id: {asset: position}} as of now.
+
+        Later additions and removals do not show up in it. The cached copy is
+        reused until the next change, so calling this every tick is cheap.
+        """
+        with self._index_lock:
+            version, snapshot = self._snapshot
+            if version != self._version:
+                snapshot = MappingProxyType(dict(self._users))
+                self._snapshot = (self._version, snapshot)
+            return snapshot
+
+    def keys(self) -> list:
+        """Every monitored (user_id, asset) pair, as of now."""
+        return [(user_id, asset) for user_id, assets in self.snapshot().items() for asset in assets]
+
+    def items(self):
+        """Yields (user_id, asset, position) for every position in a snapshot."""
+        for user_id, assets in self.snapshot().items():
+            for asset, position in assets.items():
+                yield user_id, asset, position
+
+    def __len__(self):
+        return sum(len(assets) for assets in self.snapshot().values())
+
+    # === Writes ===
+
+    def put(self, user_id, asset: str, position):
+        """Adds or replaces the `Position` for (user_id, asset)."""
+        with self._lock(user_id):
+            assets = dict(self._users.get(user_id, _EMPTY))
+            assets[asset] = position
+            self._swap(user_id, assets)
+
+    def put_many(self, user_id, assets: dict):
+        """
+        Adds or replaces several of one user's positions ({asset: Position})
+        at once: readers see either none or all of them.
+        """
+        with self._lock(user_id):
+            merged = dict(self._users.get(user_id, _EMPTY))
+            merged.update(assets)
+            self._swap(user_id, merged)
+
+    def remove(self, user_id, asset: str = None) -> bool:
+        """
+        Stops tracking `asset` for the user, or every asset when `asset` is None.
+
+        Returns:
+            bool: Whether anything was removed.
+        """
+        with self._lock(user_id):
+            assets = self._users.get(user_id, _EMPTY)
+            if asset is None:
+                if not assets:
+                    return False
+                self._swap(user_id, {})
+                return True
+            if asset not in assets:
+                return False
+            remaining = dict(assets)
+            del remaining[asset]
+            self._swap(user_id, remaining)
+            return True
+
+    @contextmanager
+    def edit(self, user_id, asset: str):
+        """
+        Holds the user's lock while the caller edits one position in place.
+
+        Yields:
+            Position or None: The position, or None if it is not monitored.
+        """
+        with self._lock(user_id):
+            yield self.get(user_id, asset)
+
+    @contextmanager
+    def edit_all(self, user_id):
+        """Holds the user's lock and yields the user's {asset: position} view."""
+        with self._lock(user_id):
+            yield self.assets(user_id)
+
+    def clear(self):
+        """Drops every position (used by the benchmarks to load a synthetic book)."""
+        for user_id in list(self.snapshot()):
+            self.remove(user_id)
+
+    def load(self, book: dict):
+        """Adds every position of a {user_id: {asset: position}} dict."""
+        for user_id, assets in book.items():
+            self.put_many(user_id, assets)
+
+
+def _from_env():
+    """
+    Builds the store selected by STATE_BACKEND: "memory" (default, one
+    process) or "sqlite" (shared by every node using the STATE_DB file).
+    """
+    backend = os.getenv("STATE_BACKEND", "memory").lower()
+    if backend == "memory":
+        return PositionStore()
+    if backend == "sqlite":
+        from riskEngine.sqlite_store import SQLitePositionStore
+        return SQLitePositionStore()
+    raise ValueError(f"Unknown STATE_BACKEND: {backend}")
+
+
+# Process-wide store shared by the command handlers and the risk monitor.
+positions = _from_env()
@@ -0,0 +1,275 @@
+"""
+Delta-neutral rebalancing for every user's book in one vectorized pass.
+
+Net delta is measured in units of each asset and combines three sources:
+
+  * spot: the monitored `position_size` (long);
+  * perp hedges already placed: every `hedge_logs` entry, negative for sells
+    and positive for buys, ignoring cancelled / rejected orders;
+  * options: `contracts * delta` from Black-Scholes, for option exposure
+    rows passed in by the caller.
+
+All exposure rows of all users are flattened into parallel arrays and reduced
+with `np.bincount`, so the cost is a few array passes whatever the number of
+users. A user is rebalanced when the USD value of their net delta is outside
+`±band_usd`. The proposal is the smallest set of perp orders that brings it
+back to zero: it trades the assets contributing most to the excess first,
+each up to its own net delta, and rounds sizes to LOT_SIZE. Perps only ever
+hedge their own asset.
+"""
+
+import logging
+import os
+from datetime import datetime
+
+import numpy as np
+
+from exchanges.delta import perp_symbol
+from riskEngine.risk_metric import batch_greeks
+from observability.log import get_logger, log_event
+
+logger = get_logger("rebalancer")
+
+BAND_USD = float(os.getenv("REBALANCE_BAND_USD", "1000"))  # Tolerated |net delta| per user, in USD.
+LOT_SIZE = float(os.getenv("REBALANCE_LOT_SIZE", "0.001"))  # Smallest perp order size, in asset units.
+RISK_FREE_RATE = 0.0
+CLOSED_STATUSES = {"cancelled", "canceled", "rejected"}
+
+
+def signed_hedge_size(log: dict) -> float:
+    """Asset units a hedge log entry adds to the net delta (sells are negative)."""
+    if str(log.get("status", "")).lower() in CLOSED_STATUSES:
+        return 0.0
+    try:
+        size = float(log.get("size", 0))
+    except (TypeError, ValueError):
+        return 0.0
+    return size if str(log.get("side", "")).lower() == "buy" else -size
+
+
+def option_deltas(spot, strike, expiry_years, iv, is_call, rate: float = RISK_FREE_RATE) -> np.ndarray:
+    """
+    Black-Scholes delta of many options at once.
+
+    Args:
+        spot, strike, expiry_years, iv (array-like): One entry per option.
+        is_call (array-like of bool): True for calls, False for puts.
+
+    Returns:
+        np.ndarray: Delta per option (per unit of underlying).
+    """
+    return batch_greeks(spot, strike, expiry_years, iv, is_call, rate)["delta"]
+
+
+def exposure_rows(items, options=(), prices: dict = None):
+    """
+    Flattens positions (and option exposures) into parallel arrays.
+
+    Args:
+        items (iterable): (user_id, asset, position) triples, e.g. `positions.items()`.
+        options (iterable): Dicts with user_id, asset, contracts, strike,
+                            expiry_years, iv and type ("call" / "put").
+        prices (dict): {asset: price}, needed to value options.
+
+    Returns:
+        tuple: (user_ids, assets, units) arrays, one entry per exposure row.
+    """
+    users, assets, units = [], [], []
+    for user_id, asset, position in items:
+        users.append(user_id)
+        assets.append(asset)
+        units.append(position.position_size)
+        hedged = sum(signed_hedge_size(log) for log in position.hedge_logs)
+        if hedged:
+            users.append(user_id)
+            assets.append(asset)
+            units.append(hedged)
+
+    options = [o for o in options if (prices or {}).get(o["asset"])]
+    if options:
+        deltas = option_deltas(
+            [prices[o["asset"]] for o in options],
+            [o["strike"] for o in options],
+            [o["expiry_years"] for o in options],
+            [o["iv"] for o in options],
+            [o["type"] == "call" for o in options],
+        )
+        for option, delta in zip(options, deltas):
+            users.append(option["user_id"])
+            assets.append(option["asset"])
+            units.append(option["contracts"] * delta)
+
+    return np.asarray(users, dtype=object), np.asarray(assets, dtype=object), np.asarray(units, dtype=float)
+
+
+def net_deltas(users, assets, units, prices: dict) -> dict:
+    """
+    Sums exposure rows per (user, asset) and values them.
+
+    Returns:
+        dict: Parallel arrays "user", "asset", "units", "price" and "usd", one
+              entry per (user, asset) pair; pairs without a price have usd NaN.
+    """
+    if len(units) == 0:
+        empty = np.array([], dtype=object)
+        return {"user": empty, "asset": empty, "units": np.array([]), "price": np.array([]), "usd": np.array([])}
+    user_keys, user_codes = np.unique(users.astype(str), return_inverse=True)
+    asset_keys, asset_codes = np.unique(assets.astype(str), return_inverse=True)
+    pair_codes, pair_index = np.unique(user_codes * len(asset_keys) + asset_codes, return_inverse=True)
+    net_units = np.bincount(pair_index, weights=units)
+
+    # Map pair codes back to the original (non-stringified) ids.
+    first_row = np.zeros(len(pair_codes), dtype=int)
+    first_row[pair_index[::-1]] = np.arange(len(units))[::-1]
+    asset_price = np.array([prices.get(a) or np.nan for a in asset_keys], dtype=float)
+    pair_price = asset_price[pair_codes % len(asset_keys)]
+    return {
+        "user": users[first_row],
+        "asset": assets[first_row],
+        "units": net_units,
+        "price": pair_price,
+        "usd": net_units * pair_price,
+    }
+
+
+def propose_orders(net: dict, band_usd: float = BAND_USD, lot_size: float = LOT_SIZE) -> dict:
+    """
+    Minimum perp orders bringing each user's net USD delta back to zero,
+    for users outside `±band_usd`.
+
+    Returns:
+        dict: {user_id: {"net_usd": float, "orders": [{"asset", "side", "size", "price", "notional"}]}}
+              for every user with a valued position.
+    """
+    valued = np.isfinite(net["usd"])
+    users = net["user"][valued]
+    if len(users) == 0:
+        return {}
+    usd, price, assets = net["usd"][valued], net["price"][valued], net["asset"][valued]
+    user_keys, user_index = np.unique(users.astype(str), return_inverse=True)
+    total = np.bincount(user_index, weights=usd)
+    excess = np.abs(total) > band_usd
+
+    # Candidates: pairs of users outside the band that push in the direction of the excess.
+    user_total = total[user_index]
+    candidate = excess[user_index] & (np.sign(usd) == np.sign(user_total)) & (usd != 0)
+    contribution = np.where(candidate, np.abs(usd), 0.0)
+
+    # Largest contributor first within each user; cumulative sums per user group.
+    order = np.lexsort((-contribution, user_index))
+    sorted_users = user_index[order]
+    sorted_contribution = contribution[order]
+    cumulative = np.cumsum(sorted_contribution)
+    group_start = np.searchsorted(sorted_users, sorted_users, side="left")
+    before = cumulative - sorted_contribution - np.where(group_start > 0, cumulative[group_start - 1], 0.0)
+    take_usd = np.clip(np.abs(total[sorted_users]) - before, 0.0, sorted_contribution)
+    sizes = np.round(take_usd / price[order] / lot_size) * lot_size
+
+    proposals = {}
+    first_id = {}
+    for i, user_id in enumerate(users):
+        first_id.setdefault(user_index[i], user_id)
+    for code, user_id in first_id.items():
+        proposals[user_id] = {"net_usd": float(total[code]), "orders": []}
+    for row, size in zip(order, sizes):
+        if size < lot_size or not candidate[row]:
+            continue
+        proposals[first_id[user_index[row]]]["orders"].append({
+            "asset": assets[row],
+            "side": "sell" if total[user_index[row]] > 0 else "buy",
+            "size": round(float(size), 8),
+            "price": float(price[row]),
+            "notional": float(size * price[row]),
+        })
+    return proposals
+
+
+def rebalance(items, prices: dict, band_usd: float = BAND_USD, options=(), lot_size: float = LOT_SIZE) -> dict:
+    """
+    Net deltas and proposed orders for every user in `items` in one pass.
+
+    Args:
+        items (iterable): (user_id, asset, position) triples.
+        prices (dict): {asset: perp mark price}.
+        band_usd (float): Tolerated |net delta| per user, in USD.
+        options (iterable): Option exposure rows (see `exposure_rows`).
+
+    Returns:
+        dict: {user_id: {"net_usd", "orders", "assets": {asset: net units},
+              "unpriced": [asset, ...]}}. Assets without a price are left out
+              of net_usd and listed in "unpriced", so the proposal is partial.
+    """
+    net = net_deltas(*exposure_rows(items, options, prices), prices)
+    proposals = propose_orders(net, band_usd, lot_size)
+    for proposal in proposals.values():
+        proposal["unpriced"] = []
+    unpriced = set()
+    for user_id, asset, units, usd in zip(net["user"], net["asset"], net["units"], net["usd"]):
+        if user_id not in proposals:
+            continue
+        if np.isfinite(usd):
+            proposals[user_id].setdefault("assets", {})[asset] = float(units)
+        elif units:
+            proposals[user_id]["unpriced"].append(asset)
+            unpriced.add(asset)
+    if unpriced:
+        log_event(logger, logging.WARNING, "rebalance_unpriced", assets=",".join(sorted(unpriced)))
+    return proposals
+
+
+def execute(user_id, orders: list, positions, product_id, place_hedge_order, may_place=None) -> list:
+    """
+    Places proposed orders and records them in the positions' hedge logs.
+
+    The exchange functions are passed in so callers (handlers, the batch job)
+    use the same ones they already import. Orders go to each asset's USD
+    perpetual (`exchanges.delta.perp_symbol`). `may_place`, if given, is
+    called with user_id before each order; False skips the remaining orders
+    (a monitor node that lost the user's shard lease).
+
+    Returns:
+        list: (order, response) pairs; responses with an "error" key failed.
+    """
+    results = []
+    for order in orders:
+        symbol = perp_symbol(order["asset"])
+        product = product_id(symbol)
+        if not product:
+            results.append((order, {"error": "Unknown product", "details": symbol}))
+            continue
+        if may_place is not None and not may_place(user_id):
+            results.append((order, {"error": "Skipped", "details": "this node no longer owns the user"}))
+            continue
+        response = place_hedge_order(product, order["size"], order["price"], side=order["side"])
+        results.append((order, response))
+        if response.get("error"):
+            log_event(logger, logging.ERROR, "rebalance_order_failed", user_id=user_id, asset=order["asset"],
+                      details=str(response.get("details")))
+            continue
+        with positions.edit(user_id, order["asset"]) as position:
+            if position is not None:
+                position.hedge_logs.append({
+                    "time": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+                    "order_id": response.get("id", "N/A"),
+                    "side": order["side"].upper(),
+                    "size": order["size"],
+                    "status": response.get("state", "UNKNOWN"),
+                })
+    return results
+
+
+def format_proposal(proposal: dict, band_usd: float = BAND_USD) -> str:
+    """Human-readable summary of one user's net delta and proposed orders."""
+    lines = [f" Net delta: ${proposal['net_usd']:,.2f} (band ±${band_usd:,.0f})"]
+    for asset, units in sorted(proposal.get("assets", {}).items()):
+        lines.append(f" - {asset}: {units:+.6g}")
+    if proposal.get("unpriced"):
+        lines.append(f" Not included, no price: {', '.join(sorted(proposal['unpriced']))}. "
+                     f"The net delta above is partial.")
+    if proposal["orders"]:
+        lines.append("\n Proposed perp orders:")
+        lines.extend(f" - {o['side'].upper()} {o['size']:g} {o['asset']} @ ${o['price']:,.2f} (${o['notional']:,.2f})"
+                     for o in proposal["orders"])
+    else:
+        lines.append("\n Within band: no orders needed.")
+    return "\n".join(lines)
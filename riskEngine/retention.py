@@ -0,0 +1,159 @@
+"""
+Retention tiers for position price history.
+
+Every monitor check appends a raw sample, so a position monitored for months
+would keep growing. History is instead kept in three tiers:
+
+  * raw samples for the last RAW_RETENTION (and never fewer than
+    RAW_MIN_POINTS, so the monitor's drawdown / VaR window stays full);
+  * 5-minute OHLC bars for BARS_5M_RETENTION;
+  * hourly OHLC bars for BARS_1H_RETENTION, after which they are dropped.
+
+`compact()` rolls up only what has aged out since the last call: samples
+older than the (bucket-aligned) cutoff become bars of the next tier and are
+then dropped from the finer one. Only complete buckets are rolled up, and a
+bar's high / low keep the extremes of everything it replaced, so drawdowns
+over old data stay exact at the bar's resolution. The monitor runs it in the
+background every COMPACT_INTERVAL seconds.
+
+`history()` reads a time range across the tiers at the coarsest resolution
+that still gives about `max_points` points, e.g. hourly bars for a chart of
+the last three months and raw samples for the last hour.
+
+Configuration (environment):
+    PRICE_RAW_HOURS        raw sample retention, default 12
+    PRICE_RAW_MIN_POINTS   raw samples always kept, default 64
+    PRICE_5M_DAYS          5-minute bar retention, default 7
+    PRICE_1H_DAYS          hourly bar retention, default 180
+    COMPACT_INTERVAL       seconds between background compactions, default 300
+"""
+
+import os
+
+import numpy as np
+
+from riskEngine.position import Position, now_ms
+
+MINUTE_MS = 60_000
+HOUR_MS = 60 * MINUTE_MS
+DAY_MS = 24 * HOUR_MS
+BAR_5M = 5 * MINUTE_MS
+BAR_1H = HOUR_MS
+
+RAW_RETENTION = int(float(os.getenv("PRICE_RAW_HOURS", "12")) * HOUR_MS)
+RAW_MIN_POINTS = int(os.getenv("PRICE_RAW_MIN_POINTS", "64"))
+BARS_5M_RETENTION = int(float(os.getenv("PRICE_5M_DAYS", "7")) * DAY_MS)
+BARS_1H_RETENTION = int(float(os.getenv("PRICE_1H_DAYS", "180")) * DAY_MS)
+COMPACT_INTERVAL = float(os.getenv("COMPACT_INTERVAL", "300"))
+
+
+def rollup(times, opens, highs, lows, closes, width_ms: int) -> np.ndarray:
+    """
+    Aggregates time-sorted points or bars into OHLC bars `width_ms` wide.
+
+    Returns:
+        np.ndarray: (n, 5) bars of (bucket start ms, open, high, low, close).
+    """
+    if len(times) == 0:
+        return np.empty((0, 5))
+    buckets = (np.asarray(times, dtype=np.int64) // width_ms) * width_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+    return np.column_stack((
+        buckets[starts].astype(np.float64),
+        np.asarray(opens, dtype=np.float64)[starts],
+        np.maximum.reduceat(np.asarray(highs, dtype=np.float64), starts),
+        np.minimum.reduceat(np.asarray(lows, dtype=np.float64), starts),
+        np.asarray(closes, dtype=np.float64)[ends],
+    ))
+
+
+def _merge_into(series, bars: np.ndarray):
+    # A new bar in the same bucket as the series' last bar extends it instead.
+    if len(bars) and len(series) and series.bars[-1, 0] == bars[0, 0]:
+        last = series.bars[-1].copy()  # Readers may hold the current bars; don't write into them.
+        last[2] = max(last[2], bars[0, 2])
+        last[3] = min(last[3], bars[0, 3])
+        last[4] = bars[0, 4]
+        series.set_last(last)
+        bars = bars[1:]
+    if len(bars):
+        series.extend(bars)
+
+
+def compact(position: Position, now: int = None) -> int:
+    """
+    Rolls up the samples and bars of `position` that aged out of their tier.
+    Must be called on the object yielded by `positions.edit()`.
+
+    Returns:
+        int: How many raw samples and bars were rolled up or dropped.
+    """
+    now = now_ms() if now is None else now
+    moved = 0
+
+    # Raw samples -> 5-minute bars (complete buckets only, keeping RAW_MIN_POINTS).
+    cutoff = (now - RAW_RETENTION) // BAR_5M * BAR_5M
+    times = position.prices.times
+    n = min(int(np.searchsorted(times, cutoff, side="left")), max(0, len(times) - RAW_MIN_POINTS))
+    if n:
+        # Don't split a bucket: stop at the first sample of the bucket the n-th sample is in.
+        n = int(np.searchsorted(times, times[n] // BAR_5M * BAR_5M, side="left")) if n < len(times) else n
+    if n:
+        prices = position.prices.prices[:n]
+        _merge_into(position.bars_5m, rollup(times[:n], prices, prices, prices, prices, BAR_5M))
+        position.prices.drop_first(n)
+        moved += n
+
+    # 5-minute bars -> hourly bars.
+    cutoff = (now - BARS_5M_RETENTION) // BAR_1H * BAR_1H
+    bars = position.bars_5m.bars
+    n = int(np.searchsorted(bars[:, 0], cutoff, side="left"))
+    if n:
+        old = bars[:n]
+        _merge_into(position.bars_1h, rollup(old[:, 0], old[:, 1], old[:, 2], old[:, 3], old[:, 4], BAR_1H))
+        position.bars_5m.drop_first(n)
+        moved += n
+
+    # Hourly bars past their retention are dropped.
+    bars = position.bars_1h.bars
+    n = int(np.searchsorted(bars[:, 0], now - BARS_1H_RETENTION, side="left"))
+    if n:
+        position.bars_1h.drop_first(n)
+        moved += n
+    return moved
+
+
+def history(position: Position, start_ms: int = None, end_ms: int = None, max_points: int = 500) -> dict:
+    """
+    Prices of `position` between `start_ms` and `end_ms` (default: all of
+    it) at the coarsest of raw / 5-minute / hourly resolution that still
+    gives about `max_points` points. Parts only held at a coarser tier come
+    back at that tier's resolution.
+
+    Returns:
+        dict: "resolution_ms" (0 for raw) and (n,) arrays "time" (epoch ms of
+              the sample / bar start), "open", "high", "low", "close".
+    """
+    raw_t, raw_p = position.prices.arrays()
+    segments = [position.bars_1h.bars, position.bars_5m.bars,
+                np.column_stack((raw_t.astype(np.float64), raw_p, raw_p, raw_p, raw_p))]
+    start = -np.inf if start_ms is None else start_ms
+    end = np.inf if end_ms is None else end_ms
+    data = np.concatenate([s[(s[:, 0] >= start) & (s[:, 0] <= end)] for s in segments])
+
+    resolution = 0
+    if len(data) > max_points:
+        span = data[-1, 0] - data[0, 0]
+        wanted = span / max(1, max_points)
+        resolution = BAR_1H if wanted >= BAR_1H else BAR_5M if wanted >= BAR_5M else 0
+    if resolution:
+        data = rollup(data[:, 0], data[:, 1], data[:, 2], data[:, 3], data[:, 4], resolution)
+    return {
+        "resolution_ms": resolution,
+        "time": data[:, 0].astype(np.int64),
+        "open": data[:, 1],
+        "high": data[:, 2],
+        "low": data[:, 3],
+        "close": data[:, 4],
+    }
@@ -1,8 +1,9 @@
 import numpy as np
-import pandas as pd
-from scipy.stats import norm
 import logging
 
+# scipy (norm) and pandas are imported inside the functions that use them: the
+# bot imports this module at startup and they cost several hundred ms to load.
+
 logging.basicConfig(level=logging.INFO)
 
 
@@ -11,6 +12,11 @@ def calculate_spot_delta(position_size: float, spot_price: float) -> float:
     return position_size * spot_price  # delta = quantity × price
 
 
+# === DROP FROM ENTRY (RISK TRIGGER) ===
+def calculate_drop_percent(entry_price, current_price):
+    return (entry_price - current_price) / entry_price * 100  # % loss vs entry; works on arrays too
+
+
 # === PERPETUAL HEDGE SIZE CALCULATION ===
 def calculate_perp_hedge_size(spot_delta: float, perp_price: float, contract_size: float = 1) -> float:
     return -spot_delta / (perp_price * contract_size)  # contracts to short (negative for sell)
@@ -18,6 +24,7 @@ def calculate_perp_hedge_size(spot_delta: float, perp_price: float, contract_siz
 
 # === BLACK-SCHOLES GREEKS ===
 def calculate_option_greeks(S, K, T, r, sigma, option_type='call'):
+    from scipy.stats import norm
     try:
         d1 = (np.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * np.sqrt(T))
         d2 = d1 - sigma * np.sqrt(T)
@@ -43,20 +50,44 @@ def calculate_option_greeks(S, K, T, r, sigma, option_type='call'):
         return {'delta': 0, 'gamma': 0, 'theta': 0, 'vega': 0}
 
 
+def batch_greeks(S, K, T, sigma, is_call, r=0.0):
+    """
+    Black-Scholes greeks of many options (calls and puts mixed) in one pass.
+
+    Args:
+        S, K, T, sigma (array-like): Spot, strike, years to expiry and implied volatility
+                                     (one entry per option, or scalars shared by all).
+        is_call (array-like of bool): True for calls, False for puts.
+
+    Returns:
+        dict: "delta", "gamma", "theta", "vega" arrays (per unit of underlying).
+    """
+    S, K, T, sigma, is_call = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (S, K, T, sigma)),
+                                                  np.asarray(is_call, dtype=bool))
+    greeks = {name: np.zeros(len(S)) for name in ("delta", "gamma", "theta", "vega")}
+    for mask, option_type in ((is_call, "call"), (~is_call, "put")):
+        if mask.any():
+            for name, values in calculate_option_greeks(S[mask], K[mask], T[mask], r, sigma[mask],
+                                                        option_type).items():
+                greeks[name][mask] = values
+    return greeks
+
+
 # === VALUE AT RISK (VAR) ===
 def calculate_var(portfolio_returns, confidence_level=0.95):
     return -np.percentile(portfolio_returns, (1 - confidence_level) * 100)
 
 
 # === MAX DRAWDOWN ===
-def max_drawdown(equity_curve):
-    peak = np.maximum.accumulate(equity_curve)
+def max_drawdown(equity_curve, axis=-1):
+    peak = np.maximum.accumulate(equity_curve, axis=axis)
     drawdown = (equity_curve - peak) / peak
-    return np.min(drawdown)
+    return np.min(drawdown, axis=axis)  # one value per curve when given a 2-D batch
 
 
 # === CORRELATION MATRIX ===
 def correlation_matrix(price_data_dict):
+    import pandas as pd
     df = pd.DataFrame(price_data_dict)
     return df.pct_change().corr()
 
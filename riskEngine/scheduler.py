@@ -0,0 +1,162 @@
+"""
+Adaptive scheduling for the risk monitor.
+
+Instead of checking every position every 60 seconds, each position gets its
+own next-check time based on how far it is from its trigger price and how
+fast the price has recently been moving:
+
+    distance  = (risk_threshold - drop_percent) / 100      (fraction of price)
+    interval  = (distance / (SIGMAS * volatility)) ** 2     (seconds)
+
+i.e. roughly the time a `SIGMAS`-sigma move would need to cover the distance,
+clamped between MIN_INTERVAL and MAX_INTERVAL. Positions sitting close to
+their threshold are checked every few seconds, distant ones rarely. Due times
+are kept in a heap so each loop only touches positions that are actually due.
+"""
+
+import heapq
+import itertools
+import math
+import os
+import time
+
+BASE_INTERVAL = float(os.getenv("MONITOR_BASE_INTERVAL", "60"))  # Previous fixed cadence.
+MIN_INTERVAL = float(os.getenv("MONITOR_MIN_INTERVAL", "5"))  # Fastest re-check for at-risk positions.
+MAX_INTERVAL = float(os.getenv("MONITOR_MAX_INTERVAL", "600"))  # Slowest re-check for distant positions.
+SIGMAS = 3.0  # How many standard deviations of move we want to stay ahead of.
+
+
+def next_interval(drop_percent: float, threshold: float, volatility,
+                  min_interval: float = MIN_INTERVAL, max_interval: float = MAX_INTERVAL,
+                  base_interval: float = BASE_INTERVAL, sigmas: float = SIGMAS) -> float:
+    """
+    Computes how many seconds to wait before checking a position again.
+
+    Args:
+        drop_percent (float): Current drop from the entry price, in percent.
+        threshold (float): The position's risk threshold, in percent.
+        volatility (float or None): Realized volatility of log returns per
+                                    sqrt(second), or None if unknown.
+
+    Returns:
+        float: Seconds until the next check.
+    """
+    if drop_percent >= threshold:
+        # Already breached: keep the regular cadence so alerts and auto-hedges
+        # are not repeated every few seconds.
+        return base_interval
+    if not volatility or not math.isfinite(volatility):
+        return min(base_interval, max_interval)
+
+    distance = (threshold - drop_percent) / 100
+    interval = (distance / (sigmas * volatility)) ** 2
+    return max(min_interval, min(max_interval, interval))
+
+
+class MonitorScheduler:
+    """
+    Heap of (due_time, key) entries, where key is a (user_id, asset) pair.
+
+    Entries are never removed from the heap in place; instead `_due` holds the
+    authoritative due time of every scheduled key and stale heap entries are
+    skipped when popped.
+
+    Args:
+        clock (callable): Monotonic time source, injectable for tests/benchmarks.
+    """
+
+    def __init__(self, clock=time.monotonic, base_interval: float = BASE_INTERVAL,
+                 min_interval: float = MIN_INTERVAL, max_interval: float = MAX_INTERVAL):
+        self.clock = clock
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._heap = []
+        self._due = {}  # key -> due time
+        self._last_notice = {}  # key -> time of the last "No Risk Alert" message
+        self._seq = itertools.count()  # Tie-breaker so keys are never compared.
+
+    def __len__(self):
+        return len(self._due)
+
+    def _push(self, key, due: float):
+        self._due[key] = due
+        heapq.heappush(self._heap, (due, next(self._seq), key))
+
+    def sync(self, positions: dict):
+        """
+        Schedules positions that appeared since the last call and forgets
+        those that were removed.
+
+        Args:
+            positions (dict): {user_id: {asset: data}}, e.g. `positions.snapshot()`.
+        """
+        self.sync_keys((user_id, asset) for user_id, assets in positions.items() for asset in assets)
+
+    def sync_keys(self, keys):
+        """
+        Like `sync`, from an iterable of (user_id, asset) keys, e.g. the keys
+        of the shards this node holds the lease for.
+        """
+        now = self.clock()
+        current = set(keys)
+        for key in current - self._due.keys():
+            self._push(key, now)  # New positions are checked straight away.
+            self._last_notice[key] = now  # /monitor_risk already confirmed the price.
+        for key in self._due.keys() - current:
+            del self._due[key]
+            self._last_notice.pop(key, None)
+
+    def pop_due(self) -> list:
+        """
+        Returns every key whose due time has passed, removing it from the schedule
+        until it is rescheduled.
+        """
+        now = self.clock()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            when, _, key = heapq.heappop(self._heap)
+            if self._due.get(key) == when:  # Skip stale entries.
+                due.append(key)
+        return due
+
+    def reschedule(self, key, result):
+        """
+        Schedules the next check for `key` from the result of `evaluate_position`.
+
+        Args:
+            key (tuple): (user_id, asset).
+            result (dict or None): Result of the last evaluation; None means the
+                                   position could not be evaluated (e.g. no price).
+        """
+        if key not in self._due:
+            return  # Removed while it was being evaluated.
+        if result is None:
+            interval = self.min_interval  # Retry soon rather than going blind.
+        else:
+            interval = next_interval(result["drop_percent"], result["threshold"], result["volatility"],
+                                     self.min_interval, self.max_interval, self.base_interval)
+        self._push(key, self.clock() + interval)
+
+    def should_notify_safe(self, user_id, asset) -> bool:
+        """
+        Rate-limits the "No Risk Alert" message to once per base interval, however
+        often the position itself is being checked.
+        """
+        key = (user_id, asset)
+        now = self.clock()
+        if now - self._last_notice.get(key, -math.inf) >= self.base_interval:
+            self._last_notice[key] = now
+            return True
+        return False
+
+    def seconds_until_next(self, poll: float = 1.0) -> float:
+        """
+        Seconds to sleep before the next due position, capped at `poll` so new
+        positions are picked up quickly.
+        """
+        while self._heap and self._due.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)  # Drop stale entries at the top.
+        if not self._heap:
+            return poll
+        return max(0.0, min(poll, self._heap[0][0] - self.clock()))
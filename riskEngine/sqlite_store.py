@@ -0,0 +1,331 @@
+"""
+SQLite-backed position store shared by several bot / monitor processes.
+
+Drop-in replacement for `riskEngine.position_store.PositionStore` (selected
+with STATE_BACKEND=sqlite), so the handlers and the monitor do not care which
+one they get. Every process on the host opens the same STATE_DB file:
+
+  * `positions`: one row per (user_id, asset) with the config columns, the
+    raw price series as two packed int64 / float64 blobs and the 5-minute /
+    hourly OHLC bars (see `riskEngine.retention`) as one float64 blob each,
+    and the option legs as JSON;
+  * `hedge_logs`: append-only, keyed by the position row id so the audit trail
+    survives /stop_monitor_risk and a re-opened position starts empty.
+
+The database runs in WAL mode: reads never block, and each `edit()` is one
+short `BEGIN IMMEDIATE` transaction, so concurrent read-modify-writes from
+different processes serialize instead of losing updates. Positions handed out
+by `get()` are private copies; changes only persist when they are made to the
+object yielded by `edit()` / `edit_all()`.
+
+Leases (which node monitors which users) live in the same file, see
+`riskEngine.leases`.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from types import MappingProxyType
+
+import numpy as np
+
+from riskEngine.position import OHLCSeries, Position, PriceSeries
+
+DEFAULT_PATH = os.getenv("STATE_DB", "riskbot.db")
+BUSY_TIMEOUT_MS = 5000  # How long a writer waits for another process's transaction.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    asset TEXT NOT NULL,
+    entry_price REAL NOT NULL,
+    position_size REAL NOT NULL,
+    risk_threshold REAL NOT NULL,
+    auto_hedge INTEGER NOT NULL DEFAULT 0,
+    times BLOB NOT NULL,
+    prices BLOB NOT NULL,
+    bars_5m BLOB NOT NULL DEFAULT x'',
+    bars_1h BLOB NOT NULL DEFAULT x'',
+    risk_threshold_history TEXT NOT NULL DEFAULT '[]',
+    auto_hedge_history TEXT NOT NULL DEFAULT '[]',
+    options TEXT NOT NULL DEFAULT '[]',
+    delta_limit REAL,
+    gamma_limit REAL,
+    greek_alerts TEXT NOT NULL DEFAULT '[]',
+    UNIQUE (user_id, asset)
+);
+CREATE TABLE IF NOT EXISTS hedge_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    position_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    asset TEXT NOT NULL,
+    time TEXT NOT NULL,
+    entry TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS hedge_logs_position ON hedge_logs (position_id, id);
+CREATE TABLE IF NOT EXISTS nodes (
+    node_id TEXT PRIMARY KEY,
+    role TEXT NOT NULL,
+    heartbeat_ms INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    node_id TEXT,
+    expires_ms INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+_COLUMNS = ("id, user_id, asset, entry_price, position_size, risk_threshold, auto_hedge, "
+            "times, prices, bars_5m, bars_1h, risk_threshold_history, auto_hedge_history, "
+            "options, delta_limit, gamma_limit, greek_alerts")
+
+# Columns added after the first release, created on databases that predate them.
+_MIGRATIONS = {
+    "bars_5m": "ALTER TABLE positions ADD COLUMN bars_5m BLOB NOT NULL DEFAULT x''",
+    "bars_1h": "ALTER TABLE positions ADD COLUMN bars_1h BLOB NOT NULL DEFAULT x''",
+    "options": "ALTER TABLE positions ADD COLUMN options TEXT NOT NULL DEFAULT '[]'",
+    "delta_limit": "ALTER TABLE positions ADD COLUMN delta_limit REAL",
+    "gamma_limit": "ALTER TABLE positions ADD COLUMN gamma_limit REAL",
+    "greek_alerts": "ALTER TABLE positions ADD COLUMN greek_alerts TEXT NOT NULL DEFAULT '[]'",
+}
+
+
+def connect(path: str = DEFAULT_PATH) -> sqlite3.Connection:
+    """
+    Opens `path` in autocommit mode with WAL and the schema in place.
+    Transactions are begun explicitly (see `SQLitePositionStore._transaction`).
+    """
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL; durable up to the last checkpoint.
+    conn.executescript(SCHEMA)
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(positions)")}
+    for column, statement in _MIGRATIONS.items():
+        if column not in existing:
+            try:
+                conn.execute(statement)
+            except sqlite3.OperationalError:
+                pass  # Another process added it first.
+    return conn
+
+
+class _Loaded:
+    """What a position looked like when it was read, to write back only the changes."""
+
+    __slots__ = ("row_id", "hedge_count")
+
+    def __init__(self, row_id: int, hedge_count: int):
+        self.row_id = row_id
+        self.hedge_count = hedge_count
+
+
+class SQLitePositionStore:
+    """
+    `PositionStore` API over a SQLite file shared between processes.
+
+    Args:
+        path (str): Database file. Defaults to the STATE_DB environment
+                    variable, or "riskbot.db".
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self._local = threading.local()  # One connection per thread.
+        self._conn()  # Create the schema up front.
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.path)
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        # Nested edits (e.g. edit() called from inside edit_all()) join the outer transaction.
+        conn = self._conn()
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+        finally:
+            self._local.depth = 0
+
+    # === Row <-> Position ===
+
+    def _hydrate(self, conn, row) -> tuple:
+        (row_id, _, asset, entry_price, position_size, risk_threshold, auto_hedge,
+         times, prices, bars_5m, bars_1h, threshold_history, auto_hedge_history,
+         options, delta_limit, gamma_limit, greek_alerts) = row
+        position = Position(asset, entry_price, position_size, risk_threshold, bool(auto_hedge))
+        position.prices = PriceSeries.from_arrays(np.frombuffer(times, dtype=np.int64),
+                                                  np.frombuffer(prices, dtype=np.float64))
+        position.bars_5m = OHLCSeries.from_bytes(bars_5m)
+        position.bars_1h = OHLCSeries.from_bytes(bars_1h)
+        position.risk_threshold_history = json.loads(threshold_history)
+        position.auto_hedge_history = json.loads(auto_hedge_history)
+        position.options = json.loads(options)
+        position.delta_limit, position.gamma_limit = delta_limit, gamma_limit
+        position.greek_alerts = json.loads(greek_alerts)
+        position.hedge_logs = [json.loads(entry) for (entry,) in conn.execute(
+            "SELECT entry FROM hedge_logs WHERE position_id = ? ORDER BY id", (row_id,))]
+        return position, _Loaded(row_id, len(position.hedge_logs))
+
+    def _load(self, conn, user_id, asset: str):
+        row = conn.execute(f"SELECT {_COLUMNS} FROM positions WHERE user_id = ? AND asset = ?",
+                           (user_id, asset)).fetchone()
+        return self._hydrate(conn, row) if row else (None, None)
+
+    def _save(self, conn, user_id, position: Position, loaded: _Loaded):
+        conn.execute(
+            "UPDATE positions SET entry_price = ?, position_size = ?, risk_threshold = ?, auto_hedge = ?, "
+            "times = ?, prices = ?, bars_5m = ?, bars_1h = ?, risk_threshold_history = ?, auto_hedge_history = ?, "
+            "options = ?, delta_limit = ?, gamma_limit = ?, greek_alerts = ? WHERE id = ?",
+            (position.entry_price, position.position_size, position.risk_threshold, int(position.auto_hedge),
+             position.prices.times.tobytes(), position.prices.prices.tobytes(),
+             position.bars_5m.tobytes(), position.bars_1h.tobytes(),
+             json.dumps(position.risk_threshold_history), json.dumps(position.auto_hedge_history),
+             json.dumps(position.options), position.delta_limit, position.gamma_limit,
+             json.dumps(position.greek_alerts), loaded.row_id))
+        new_logs = position.hedge_logs[loaded.hedge_count:]
+        conn.executemany(
+            "INSERT INTO hedge_logs (position_id, user_id, asset, time, entry) VALUES (?, ?, ?, ?, ?)",
+            [(loaded.row_id, user_id, position.asset, str(log.get("time", "")), json.dumps(log)) for log in new_logs])
+
+    def _insert(self, conn, user_id, asset: str, position: Position):
+        conn.execute("DELETE FROM positions WHERE user_id = ? AND asset = ?", (user_id, asset))
+        cursor = conn.execute(
+            "INSERT INTO positions (user_id, asset, entry_price, position_size, risk_threshold, auto_hedge, "
+            "times, prices, bars_5m, bars_1h, risk_threshold_history, auto_hedge_history) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (user_id, asset, position.entry_price, position.position_size, position.risk_threshold,
+             int(position.auto_hedge), position.prices.times.tobytes(), position.prices.prices.tobytes(),
+             position.bars_5m.tobytes(), position.bars_1h.tobytes(),
+             json.dumps(position.risk_threshold_history), json.dumps(position.auto_hedge_history)))
+        self._save(conn, user_id, position, _Loaded(cursor.lastrowid, 0))
+
+    # === Reads ===
+
+    def get(self, user_id, asset: str):
+        """Returns a private copy of the position for (user_id, asset), or None."""
+        return self._load(self._conn(), user_id, asset)[0]
+
+    def assets(self, user_id) -> MappingProxyType:
+        """Read-only {asset: position} copies of one user's positions (empty if none)."""
+        conn = self._conn()
+        rows = conn.execute(f"SELECT {_COLUMNS} FROM positions WHERE user_id = ? ORDER BY id", (user_id,)).fetchall()
+        return MappingProxyType({row[2]: self._hydrate(conn, row)[0] for row in rows})
+
+    def has(self, user_id, asset: str = None) -> bool:
+        """Whether the user monitors `asset`, or anything at all when `asset` is None."""
+        if asset is None:
+            query, args = "SELECT 1 FROM positions WHERE user_id = ? LIMIT 1", (user_id,)
+        else:
+            query, args = "SELECT 1 FROM positions WHERE user_id = ? AND asset = ?", (user_id, asset)
+        return self._conn().execute(query, args).fetchone() is not None
+
+    def keys(self) -> list:
+        """Every monitored (user_id, asset) pair, as of now."""
+        return self._conn().execute("SELECT user_id, asset FROM positions ORDER BY id").fetchall()
+
+    def snapshot(self) -> MappingProxyType:
+        """
+        Read-only {user_id: {asset: position}} copy of the whole book.
+        Loads everything; prefer `keys()` when only the membership is needed.
+        """
+        conn = self._conn()
+        book = {}
+        for row in conn.execute(f"SELECT {_COLUMNS} FROM positions ORDER BY id").fetchall():
+            book.setdefault(row[1], {})[row[2]] = self._hydrate(conn, row)[0]
+        return MappingProxyType({user_id: MappingProxyType(assets) for user_id, assets in book.items()})
+
+    def items(self):
+        """Yields (user_id, asset, position) for every position."""
+        conn = self._conn()
+        for row in conn.execute(f"SELECT {_COLUMNS} FROM positions ORDER BY id").fetchall():
+            yield row[1], row[2], self._hydrate(conn, row)[0]
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+
+    # === Writes ===
+
+    def put(self, user_id, asset: str, position: Position):
+        """Adds or replaces the position for (user_id, asset)."""
+        with self._transaction() as conn:
+            self._insert(conn, user_id, asset, position)
+
+    def put_many(self, user_id, assets: dict):
+        """Adds or replaces several of one user's positions in one transaction."""
+        with self._transaction() as conn:
+            for asset, position in assets.items():
+                self._insert(conn, user_id, asset, position)
+
+    def remove(self, user_id, asset: str = None) -> bool:
+        """
+        Stops tracking `asset` for the user, or every asset when `asset` is None.
+        Hedge logs are kept.
+
+        Returns:
+            bool: Whether anything was removed.
+        """
+        with self._transaction() as conn:
+            if asset is None:
+                cursor = conn.execute("DELETE FROM positions WHERE user_id = ?", (user_id,))
+            else:
+                cursor = conn.execute("DELETE FROM positions WHERE user_id = ? AND asset = ?", (user_id, asset))
+            return cursor.rowcount > 0
+
+    @contextmanager
+    def edit(self, user_id, asset: str):
+        """
+        Reads the position inside a write transaction and saves the caller's
+        in-place changes when the block exits.
+
+        Yields:
+            Position or None: The position, or None if it is not monitored.
+        """
+        with self._transaction() as conn:
+            position, loaded = self._load(conn, user_id, asset)
+            yield position
+            if position is not None:
+                self._save(conn, user_id, position, loaded)
+
+    @contextmanager
+    def edit_all(self, user_id):
+        """Like `edit`, for every position of the user at once."""
+        with self._transaction() as conn:
+            rows = conn.execute(f"SELECT {_COLUMNS} FROM positions WHERE user_id = ? ORDER BY id",
+                                (user_id,)).fetchall()
+            loaded = {row[2]: self._hydrate(conn, row) for row in rows}
+            yield MappingProxyType({asset: position for asset, (position, _) in loaded.items()})
+            for position, state in loaded.values():
+                self._save(conn, user_id, position, state)
+
+    def clear(self):
+        """Drops every position and hedge log (used by the benchmarks)."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM positions")
+            conn.execute("DELETE FROM hedge_logs")
+
+    def load(self, book: dict):
+        """Adds every position of a {user_id: {asset: position}} dict, in one transaction."""
+        with self._transaction() as conn:
+            for user_id, assets in book.items():
+                for asset, position in assets.items():
+                    self._insert(conn, user_id, asset, position)
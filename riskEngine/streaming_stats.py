@@ -0,0 +1,254 @@
+"""
+Streaming volatility / correlation statistics for every monitored symbol.
+
+`risk_metric.correlation_matrix` rebuilds a DataFrame and rescans the whole
+price history on every call (O(T·N²)). Here every symbol's log return is fed
+in once per sampling interval and exponentially weighted means, variances and
+covariances are updated in place for all pairs at once:
+
+    d    = r - mean
+    mean = mean + a * d
+    cov  = (1 - a) * (cov + a * outer(d, d))
+
+with `a = 1 - 0.5 ** (interval / half_life)`, i.e. O(N²) per sample and no
+history kept at all. Several half-lives (e.g. one hour for alerts, one day for
+VaR) are tracked side by side as one (H, N, N) array.
+
+Returns are taken at a fixed cadence (STATS_SAMPLE_INTERVAL seconds), so they
+are comparable across symbols. A symbol missing from a sample keeps its last
+price; when it reappears its return covers the whole gap and is scaled back to
+one interval. Pairs only update when both symbols were sampled.
+
+After each update an immutable `StatsSnapshot` is swapped in; readers
+(alerts, analytics, VaR) call `stats.snapshot()` and never see a half-updated
+matrix.
+
+Configuration (environment):
+    STATS_SAMPLE_INTERVAL  seconds between samples, default 60
+    STATS_HALF_LIVES       comma separated half-lives in seconds, default "3600,86400"
+    STATS_MIN_SAMPLES      samples a pair needs before it is reported, default 10
+"""
+
+import math
+import os
+import threading
+import time
+from statistics import NormalDist
+
+import numpy as np
+
+from observability import metrics
+from riskEngine.rebalancer import signed_hedge_size
+
+SAMPLE_INTERVAL = float(os.getenv("STATS_SAMPLE_INTERVAL", "60"))
+HALF_LIVES = tuple(float(h) for h in os.getenv("STATS_HALF_LIVES", "3600,86400").split(",") if h.strip())
+MIN_SAMPLES = int(os.getenv("STATS_MIN_SAMPLES", "10"))
+DAY = 86400.0
+
+TRACKED_SYMBOLS = metrics.gauge("riskbot_stats_symbols", "Symbols tracked by the streaming statistics.")
+UPDATE_DURATION = metrics.histogram("riskbot_stats_update_seconds", "Time to fold one sample into the statistics.")
+
+
+class StatsSnapshot:
+    """
+    Read-only view of the statistics after one sample.
+
+    Variances and covariances are per sampling interval; the helpers scale
+    them to any `horizon` (seconds) assuming independent returns.
+    """
+
+    __slots__ = ("symbols", "index", "half_lives", "interval", "time", "mean", "cov", "count")
+
+    def __init__(self, symbols, half_lives, interval, sample_time, mean, cov, count):
+        self.symbols = tuple(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.half_lives = tuple(half_lives)
+        self.interval = interval
+        self.time = sample_time  # Epoch seconds of the last sample (None before the first).
+        self.mean = mean  # (H, N) mean log return per interval.
+        self.cov = cov  # (H, N, N) covariance of log returns per interval.
+        self.count = count  # (N, N) samples seen by each pair.
+
+    def _h(self, half_life) -> int:
+        if half_life is None:
+            return 0
+        return int(np.argmin([abs(h - half_life) for h in self.half_lives]))
+
+    def covariance(self, symbols=None, half_life: float = None, horizon: float = None) -> np.ndarray:
+        """
+        Covariance matrix of `symbols` (default: all), scaled to `horizon`
+        seconds (default: one interval). Pairs with too few samples are NaN.
+        """
+        idx = self._indices(symbols)
+        cov = self.cov[self._h(half_life)][np.ix_(idx, idx)]
+        cov = np.where(self.count[np.ix_(idx, idx)] >= MIN_SAMPLES, cov, np.nan)
+        return cov * ((horizon or self.interval) / self.interval)
+
+    def correlation(self, symbols=None, half_life: float = None) -> np.ndarray:
+        """Correlation matrix of `symbols` (default: all); NaN where not ready."""
+        cov = self.covariance(symbols, half_life)
+        std = np.sqrt(np.diag(cov))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = cov / np.outer(std, std)
+        np.fill_diagonal(corr, np.where(np.isfinite(std) & (std > 0), 1.0, np.nan))
+        return np.clip(corr, -1.0, 1.0)
+
+    def volatility(self, symbol: str, half_life: float = None, horizon: float = DAY):
+        """
+        Standard deviation of `symbol`'s log return over `horizon` seconds
+        (default one day), or None if unknown / not ready.
+        """
+        i = self.index.get(symbol)
+        if i is None or self.count[i, i] < MIN_SAMPLES:
+            return None
+        return math.sqrt(max(self.cov[self._h(half_life), i, i], 0.0) * horizon / self.interval)
+
+    def portfolio_var(self, exposures: dict, confidence: float = 0.95, horizon: float = DAY,
+                      half_life: float = None):
+        """
+        Parametric (variance-covariance) Value at Risk of a portfolio.
+
+        Args:
+            exposures (dict): {symbol: USD exposure}, negative for shorts.
+            confidence (float): One-tailed confidence level.
+            horizon (float): Holding period in seconds.
+
+        Returns:
+            float or None: VaR in USD, or None if any symbol is not ready.
+        """
+        symbols = [s for s, usd in exposures.items() if usd]
+        if not symbols:
+            return 0.0
+        if any(s not in self.index for s in symbols):
+            return None
+        cov = self.covariance(symbols, half_life, horizon)
+        if not np.isfinite(cov).all():
+            return None
+        weights = np.array([exposures[s] for s in symbols], dtype=float)
+        variance = float(weights @ cov @ weights)
+        return NormalDist().inv_cdf(confidence) * math.sqrt(max(variance, 0.0))
+
+    def _indices(self, symbols) -> list:
+        if symbols is None:
+            return list(range(len(self.symbols)))
+        return [self.index[s] for s in symbols]
+
+
+class StreamingStats:
+    """
+    Exponentially weighted mean / covariance of log returns, updated in O(N²)
+    per sample.
+
+    Args:
+        half_lives (tuple): Half-lives in seconds, tracked side by side.
+        interval (float): Seconds between samples.
+    """
+
+    def __init__(self, half_lives=HALF_LIVES, interval: float = SAMPLE_INTERVAL):
+        if not half_lives or min(half_lives) <= 0 or interval <= 0:
+            raise ValueError("Half-lives and the sampling interval must be positive")
+        self.half_lives = tuple(half_lives)
+        self.interval = interval
+        self._alpha = 1.0 - 0.5 ** (interval / np.asarray(self.half_lives, dtype=float))
+        self._lock = threading.Lock()
+        self._symbols = []
+        self._index = {}
+        self._last_price = np.empty(0)
+        self._last_time = np.empty(0)
+        self._mean = np.zeros((len(self.half_lives), 0))
+        self._cov = np.zeros((len(self.half_lives), 0, 0))
+        self._count = np.zeros((0, 0), dtype=np.int64)
+        self._snapshot = self._publish(None)
+
+    def _add_symbols(self, new):
+        # Rare (a symbol is monitored for the first time): grow every array by len(new).
+        n, k = len(self._symbols), len(new)
+        for symbol in new:
+            self._index[symbol] = len(self._symbols)
+            self._symbols.append(symbol)
+        self._last_price = np.concatenate([self._last_price, np.full(k, np.nan)])
+        self._last_time = np.concatenate([self._last_time, np.full(k, np.nan)])
+        self._mean = np.pad(self._mean, ((0, 0), (0, k)))
+        self._cov = np.pad(self._cov, ((0, 0), (0, k), (0, k)))
+        self._count = np.pad(self._count, ((0, k), (0, k)))
+        TRACKED_SYMBOLS.set(n + k)
+
+    def _publish(self, sample_time) -> StatsSnapshot:
+        snapshot = StatsSnapshot(self._symbols, self.half_lives, self.interval, sample_time,
+                                 self._mean.copy(), self._cov.copy(), self._count.copy())
+        self._snapshot = snapshot
+        return snapshot
+
+    def update(self, prices: dict, now: float = None) -> StatsSnapshot:
+        """
+        Folds one sample of prices into the statistics.
+
+        Args:
+            prices (dict): {symbol: price}; symbols without a price are skipped.
+            now (float, optional): Epoch seconds of the sample.
+
+        Returns:
+            StatsSnapshot: The newly published snapshot.
+        """
+        now = time.time() if now is None else now
+        prices = {s: p for s, p in prices.items() if p is not None and p > 0}
+        start = time.perf_counter()
+        with self._lock:
+            new = [s for s in prices if s not in self._index]
+            if new:
+                self._add_symbols(new)
+
+            idx = np.fromiter((self._index[s] for s in prices), dtype=np.int64, count=len(prices))
+            price = np.fromiter(prices.values(), dtype=float, count=len(prices))
+            previous = self._last_price[idx]
+            elapsed = now - self._last_time[idx]
+            self._last_price[idx] = price
+            self._last_time[idx] = now
+
+            # Symbols with a previous price contribute a return, scaled back to one interval.
+            has_return = np.isfinite(previous) & (elapsed > 0)
+            idx = idx[has_return]
+            if len(idx):
+                steps = np.maximum(elapsed[has_return] / self.interval, 1.0)
+                returns = np.log(price[has_return] / previous[has_return]) / np.sqrt(steps)
+                self._fold(idx, returns)
+            snapshot = self._publish(now)
+        UPDATE_DURATION.observe(time.perf_counter() - start)
+        return snapshot
+
+    def _fold(self, idx: np.ndarray, returns: np.ndarray):
+        # Only the sampled rows / columns change; everything else is left as is.
+        alpha = self._alpha[:, None]
+        d = returns[None, :] - self._mean[:, idx]  # (H, K)
+        self._mean[:, idx] += alpha * d
+        block = np.ix_(range(len(self.half_lives)), idx, idx)
+        a = alpha[:, :, None]
+        self._cov[block] = (1.0 - a) * (self._cov[block] + a * d[:, :, None] * d[:, None, :])
+        self._count[np.ix_(idx, idx)] += 1
+
+    def snapshot(self) -> StatsSnapshot:
+        """The statistics as of the last sample (never changes after it is returned)."""
+        return self._snapshot
+
+
+def position_exposures(assets) -> dict:
+    """
+    {asset: USD exposure} of one user's {asset: position} mapping, net of
+    the perp hedges placed on it and valued at the last recorded price (the
+    entry price before the first one).
+    """
+    exposures = {}
+    for asset, position in assets.items():
+        prices = position.prices.prices
+        price = prices[-1] if len(prices) else position.entry_price
+        units = position.position_size + sum(signed_hedge_size(log) for log in position.hedge_logs)
+        exposures[asset] = exposures.get(asset, 0.0) + units * float(price)
+    return exposures
+
+
+def _from_env() -> StreamingStats:
+    return StreamingStats(HALF_LIVES, SAMPLE_INTERVAL)
+
+
+# Process-wide statistics fed by the monitor's sampler and read by alerts / analytics.
+stats = _from_env()
@@ -0,0 +1,308 @@
+"""
+Implied volatility surfaces and batch greeks for monitored option legs.
+
+Option legs (`Position.options`, added with /monitor_option) are valued off
+an implied volatility surface per underlying instead of one volatility per
+position. A surface is built from the whole option chain, fetched in one
+request (`DeltaAdapter.option_chain`) at most every IV_REFRESH_INTERVAL
+seconds per underlying however many legs reference it:
+
+  * each expiry is a slice of (log-moneyness ln(K / S), IV) points, taking
+    the out-of-the-money leg at each strike, interpolated linearly in
+    moneyness with flat extrapolation past the listed strikes;
+  * between expiries, total variance (IV² · T) is interpolated linearly in
+    time; before the first / after the last expiry the nearest slice's IV is
+    used as is.
+
+Refreshes are incremental: the expiries in the new chain replace their old
+slices, and slices the venue did not return this time are kept until they
+expire. A failed refresh keeps the previous surface for up to
+IV_MAX_STALENESS seconds; legs whose underlying has no usable surface fall
+back to the streaming 1-year volatility (`riskEngine.streaming_stats`).
+
+`option_book()` then prices every leg of every position in one vectorized
+pass (`risk_metric.batch_greeks`) and sums, per position, the USD delta of
+spot + perp hedges + options and the USD gamma (change in USD delta for a 1%
+move). The monitor compares both against the position's limits in the same
+pass, and the rebalancer takes the legs as its option exposure rows.
+
+Configuration (environment):
+    IV_REFRESH_INTERVAL     seconds between chain downloads per underlying, default 300
+    IV_MAX_STALENESS        seconds a surface is used after its last refresh, default 3600
+    OPTION_DELTA_LIMIT_USD  default |net delta| limit per position, default 25000
+    OPTION_GAMMA_LIMIT_USD  default |gamma per 1% move| limit per position, default 5000
+"""
+
+import logging
+import os
+import threading
+
+import numpy as np
+
+from exchanges.delta import DeltaAdapter
+from exchanges.singleflight import SingleFlight
+from observability import metrics
+from observability.log import get_logger, log_event
+from riskEngine.position import now_ms
+from riskEngine.rebalancer import signed_hedge_size
+from riskEngine.risk_metric import batch_greeks
+from riskEngine.streaming_stats import stats
+
+logger = get_logger("vol_surface")
+
+REFRESH_INTERVAL = float(os.getenv("IV_REFRESH_INTERVAL", "300"))
+MAX_STALENESS = float(os.getenv("IV_MAX_STALENESS", "3600"))
+DELTA_LIMIT_USD = float(os.getenv("OPTION_DELTA_LIMIT_USD", "25000"))
+GAMMA_LIMIT_USD = float(os.getenv("OPTION_GAMMA_LIMIT_USD", "5000"))
+YEAR_MS = 365 * 24 * 3600 * 1000
+
+SURFACE_REFRESHES = metrics.counter("riskbot_iv_surface_refreshes", "Option chain downloads per outcome.",
+                                    ("outcome",))
+
+
+class VolSurface:
+    """
+    Implied volatility by strike and expiry for one underlying.
+
+    Args:
+        slices (dict): {expiry epoch ms: (sorted log-moneyness array, IV array)}.
+        spot (float): Underlying price the moneyness was measured against.
+        refreshed (int): Epoch ms of the chain download.
+    """
+
+    __slots__ = ("slices", "spot", "refreshed", "_expiries", "_k", "_iv")
+
+    def __init__(self, slices: dict, spot: float, refreshed: int):
+        self.slices = slices
+        self.spot = spot
+        self.refreshed = refreshed
+        self._expiries = np.array(sorted(slices), dtype=np.int64)
+        self._k = [slices[e][0] for e in self._expiries]
+        self._iv = [slices[e][1] for e in self._expiries]
+
+    @classmethod
+    def from_chain(cls, spot: float, chain, now: int = None):
+        """
+        Builds a surface from (spot, chain) as returned by `DeltaAdapter.option_chain`,
+        using the out-of-the-money leg at each strike (either one if only one is listed).
+        """
+        now = now_ms() if now is None else now
+        points = {}  # (expiry, strike) -> (is OTM, [iv, ...])
+        for leg in chain:
+            if leg["expiry"] <= now or not leg["iv"] > 0:
+                continue
+            otm = (leg["strike"] >= spot) == (leg["type"] == "call")
+            key = (leg["expiry"], leg["strike"])
+            best = points.get(key)
+            if best is None or otm > best[0]:
+                points[key] = (otm, [leg["iv"]])
+            elif otm == best[0]:
+                best[1].append(leg["iv"])
+
+        by_expiry = {}
+        for (expiry, strike), (_, ivs) in points.items():
+            by_expiry.setdefault(expiry, []).append((np.log(strike / spot), sum(ivs) / len(ivs)))
+        slices = {}
+        for expiry, pairs in by_expiry.items():
+            pairs.sort()
+            slices[expiry] = (np.array([k for k, _ in pairs]), np.array([iv for _, iv in pairs]))
+        return cls(slices, spot, now)
+
+    def merged(self, newer, now: int = None):
+        """This surface with `newer`'s slices laid over it and expired slices dropped."""
+        now = now_ms() if now is None else now
+        slices = {e: s for e, s in self.slices.items() if e > now}
+        slices.update(newer.slices)
+        return VolSurface(slices, newer.spot, newer.refreshed)
+
+    def iv(self, strikes, expiries, spot: float, now: int = None) -> np.ndarray:
+        """
+        Interpolated implied volatility of many (strike, expiry epoch ms) points
+        at underlying price `spot`; NaN for expired points or an empty surface.
+        """
+        now = now_ms() if now is None else now
+        strikes = np.asarray(strikes, dtype=float)
+        t = (np.asarray(expiries, dtype=np.int64) - now) / YEAR_MS
+        live = self._expiries > now
+        out = np.full(len(strikes), np.nan)
+        if not live.any():
+            return out
+        slice_t = (self._expiries[live] - now) / YEAR_MS
+        k = np.log(strikes / spot)
+        slice_iv = np.vstack([np.interp(k, self._k[i], self._iv[i]) for i in np.flatnonzero(live)])  # (J, Q)
+
+        cols = np.arange(len(strikes))
+        hi = np.clip(np.searchsorted(slice_t, t), 0, len(slice_t) - 1)
+        lo = np.clip(hi - 1, 0, len(slice_t) - 1)
+        inside = (t > slice_t[0]) & (t < slice_t[-1])
+        # Inside the listed expiries: linear in total variance between the two neighbouring slices.
+        w_lo = slice_iv[lo, cols] ** 2 * slice_t[lo]
+        w_hi = slice_iv[hi, cols] ** 2 * slice_t[hi]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            weight = np.where(hi > lo, (t - slice_t[lo]) / (slice_t[hi] - slice_t[lo]), 0.0)
+            interpolated = np.sqrt(np.maximum(w_lo + weight * (w_hi - w_lo), 0.0) / t)
+        # Outside them: the nearest slice's IV.
+        nearest = np.where(t <= slice_t[0], 0, len(slice_t) - 1)
+        out = np.where(inside, interpolated, slice_iv[nearest, cols])
+        out[t <= 0] = np.nan
+        return out
+
+
+class SurfaceCache:
+    """
+    The latest surface per underlying, refreshed incrementally.
+
+    Args:
+        fetch_chain (callable): asset -> (spot, chain), e.g. `DeltaAdapter().option_chain`.
+        refresh_interval (float): Seconds between refresh attempts per underlying.
+        max_staleness (float): Seconds after its last refresh a surface is still used.
+    """
+
+    def __init__(self, fetch_chain, refresh_interval: float = REFRESH_INTERVAL,
+                 max_staleness: float = MAX_STALENESS):
+        self._fetch = fetch_chain
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self._lock = threading.Lock()
+        self._surfaces = {}
+        self._attempted = {}  # asset -> epoch ms of the last refresh attempt
+        self._flight = SingleFlight(name="iv_surface")  # The monitor and a handler may refresh at once.
+
+    def stale(self, assets, now: int = None) -> list:
+        """The assets among `assets` due for a refresh attempt."""
+        now = now_ms() if now is None else now
+        due = self.refresh_interval * 1000
+        return [a for a in dict.fromkeys(assets) if now - self._attempted.get(a, -due) >= due]
+
+    def refresh(self, assets, now: int = None) -> int:
+        """
+        Downloads the chain of every asset in `assets` that is due (blocking;
+        call from a worker thread). Failures keep the previous surface.
+
+        Returns:
+            int: How many surfaces were refreshed.
+        """
+        now = now_ms() if now is None else now
+        refreshed = 0
+        for asset in self.stale(assets, now):
+            self._attempted[asset] = now
+            try:
+                self._flight.do(asset, self._refresh, asset, now)
+            except Exception as e:
+                SURFACE_REFRESHES.inc(outcome="error")
+                log_event(logger, logging.WARNING, "iv_surface_refresh_failed", asset=asset, error=str(e))
+                continue
+            SURFACE_REFRESHES.inc(outcome="ok")
+            refreshed += 1
+        return refreshed
+
+    def _refresh(self, asset: str, now: int):
+        spot, chain = self._fetch(asset)
+        surface = VolSurface.from_chain(spot, chain, now)
+        with self._lock:
+            old = self._surfaces.get(asset)
+            self._surfaces[asset] = surface if old is None else old.merged(surface, now)
+
+    def get(self, asset: str, now: int = None):
+        """The surface of `asset`, or None if there is none recent enough."""
+        now = now_ms() if now is None else now
+        surface = self._surfaces.get(asset)
+        if surface is None or now - surface.refreshed > self.max_staleness * 1000:
+            return None
+        return surface
+
+
+def option_book(items, spots: dict, now: int = None, cache: SurfaceCache = None) -> dict:
+    """
+    Greeks of every option leg of `items` and the combined exposure of each
+    position, in one vectorized pass. Does not download anything (see
+    `SurfaceCache.refresh`); expired legs and legs with no volatility are skipped.
+
+    Args:
+        items (iterable): (user_id, asset, position) triples.
+        spots (dict): {asset: underlying price}.
+
+    Returns:
+        dict: "legs" (rows for `rebalancer.rebalance(options=...)`, plus each
+              leg's delta and gamma) and "positions" ({(user_id, asset):
+              {"delta_usd", "gamma_usd", "option_delta", "delta_limit", "gamma_limit"}}).
+    """
+    now = now_ms() if now is None else now
+    cache = cache or surfaces
+    keys, legs, pair, limits, base_units = [], [], [], [], []
+    for user_id, asset, position in items:
+        if not position.options or not spots.get(asset):
+            continue
+        keys.append((user_id, asset))
+        base_units.append(position.position_size + sum(signed_hedge_size(log) for log in position.hedge_logs))
+        limits.append((position.delta_limit or DELTA_LIMIT_USD, position.gamma_limit or GAMMA_LIMIT_USD))
+        for option in position.options:
+            if option["expiry"] > now:
+                legs.append({"user_id": user_id, "asset": asset, "contracts": option["size"],
+                             "strike": option["strike"], "expiry": option["expiry"], "type": option["type"]})
+                pair.append(len(keys) - 1)
+    if not keys:
+        return {"legs": [], "positions": {}}
+
+    pair = np.asarray(pair, dtype=np.int64)
+    spot = np.array([spots[leg["asset"]] for leg in legs], dtype=float)
+    strike = np.array([leg["strike"] for leg in legs], dtype=float)
+    expiry = np.array([leg["expiry"] for leg in legs], dtype=np.int64)
+    size = np.array([leg["contracts"] for leg in legs], dtype=float)
+    iv = np.full(len(legs), np.nan)
+
+    # One interpolation per underlying, falling back to the streaming volatility.
+    asset_of = np.array([leg["asset"] for leg in legs], dtype=object)
+    snapshot = stats.snapshot()
+    for asset in set(asset_of):
+        mask = asset_of == asset
+        surface = cache.get(asset, now)
+        if surface is not None:
+            iv[mask] = surface.iv(strike[mask], expiry[mask], spots[asset], now)
+        fallback = snapshot.volatility(asset, horizon=YEAR_MS / 1000)
+        if fallback:
+            iv[mask & np.isnan(iv)] = fallback
+
+    priced = np.isfinite(iv) & (iv > 0)
+    t = (expiry - now) / YEAR_MS
+    greeks = batch_greeks(spot[priced], strike[priced], t[priced], iv[priced],
+                          [leg["type"] == "call" for leg, ok in zip(legs, priced) if ok])
+    delta_units = size[priced] * greeks["delta"]
+    gamma_usd = 0.01 * size[priced] * greeks["gamma"] * spot[priced] ** 2
+
+    option_delta = np.bincount(pair[priced], weights=delta_units, minlength=len(keys))
+    option_gamma = np.bincount(pair[priced], weights=gamma_usd, minlength=len(keys))
+    key_spot = np.array([spots[asset] for _, asset in keys], dtype=float)
+    delta_usd = (np.asarray(base_units) + option_delta) * key_spot
+
+    rows = []
+    for j, i in enumerate(np.flatnonzero(priced)):
+        row = legs[i]
+        row.update(expiry_years=float(t[i]), iv=float(iv[i]),
+                   delta=float(greeks["delta"][j]), gamma=float(greeks["gamma"][j]))
+        rows.append(row)
+    return {
+        "legs": rows,
+        "positions": {key: {"delta_usd": float(delta_usd[i]), "gamma_usd": float(option_gamma[i]),
+                            "option_delta": float(option_delta[i]),
+                            "delta_limit": limits[i][0], "gamma_limit": limits[i][1]}
+                      for i, key in enumerate(keys)},
+    }
+
+
+def option_legs(items, spots: dict, now: int = None) -> list:
+    """
+    Refreshes the surfaces `items` need (blocking) and returns their priced
+    option legs, for `rebalancer.rebalance(options=...)`.
+    """
+    items = [item for item in items if item[2].options]
+    surfaces.refresh({asset for _, asset, _ in items}, now)
+    return option_book(items, spots, now)["legs"]
+
+
+def _from_env() -> SurfaceCache:
+    return SurfaceCache(DeltaAdapter().option_chain, REFRESH_INTERVAL, MAX_STALENESS)
+
+
+# Process-wide surfaces shared by the monitor, the rebalancer and the handlers.
+surfaces = _from_env()
@@ -0,0 +1,78 @@
+"""
+Shard leases between two monitor nodes sharing one state database.
+"""
+
+import time
+
+import pytest
+
+from riskEngine.leases import LeaseManager, shard_of
+
+SHARDS = 8
+TTL = 0.3  # Seconds; short so expiry can be waited for.
+
+
+@pytest.fixture
+def nodes(tmp_path):
+    path = str(tmp_path / "state.db")
+    return (LeaseManager("a", path=path, shards=SHARDS, ttl=TTL),
+            LeaseManager("b", path=path, shards=SHARDS, ttl=TTL))
+
+
+def _user_in(shards):
+    return next(user for user in range(1000) if shard_of(user, SHARDS) in shards)
+
+
+def test_shards_split_between_live_nodes(nodes):
+    a, b = nodes
+    assert a.rebalance() == frozenset(range(SHARDS))
+    assert b.rebalance() == frozenset()  # Nothing free yet; a hands back its surplus next.
+    assert len(a.rebalance()) == SHARDS // 2
+    assert b.rebalance() == frozenset(range(SHARDS)) - a.owned
+
+
+def test_dead_node_shards_are_taken_over(nodes):
+    a, b = nodes
+    a.rebalance()
+    b.rebalance()
+    a.rebalance()
+    b.rebalance()
+    time.sleep(TTL * 1.5)  # a stops renewing.
+    assert b.rebalance() == frozenset(range(SHARDS))
+
+
+def test_confirm_fails_once_the_shard_changed_hands(nodes):
+    a, b = nodes
+    a.rebalance()
+    user = _user_in(a.owned)
+    assert a.confirm(user)
+
+    # a's tick runs past its lease; b takes over meanwhile.
+    time.sleep(TTL * 1.5)
+    b.rebalance()
+    assert a.owns(user)  # The cached view is stale...
+    assert not a.confirm(user)  # ...but the store says otherwise.
+    assert not a.owns(user)
+    assert b.confirm(user)
+
+
+def test_confirm_extends_the_lease(nodes):
+    a, b = nodes
+    a.rebalance()
+    user = _user_in(a.owned)
+    time.sleep(TTL * 0.6)
+    assert a.confirm(user)
+    time.sleep(TTL * 0.6)  # Past the original expiry, within the extended one.
+    b.rebalance()
+    assert shard_of(user, SHARDS) not in b.owned
+    assert a.confirm(user)
+
+
+def test_named_lease_has_one_holder(nodes):
+    a, b = nodes
+    assert a.acquire("poller")
+    assert not b.acquire("poller")
+    assert a.acquire("poller")  # Renewal.
+    time.sleep(TTL * 1.5)
+    assert b.acquire("poller")
+    assert not a.acquire("poller")
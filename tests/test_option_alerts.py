@@ -0,0 +1,80 @@
+"""
+Options greek alerts: one alert per breach, with the flags kept on the position.
+"""
+
+import asyncio
+
+import pytest
+
+from riskEngine import monitor, vol_surface
+from riskEngine.position import Position
+from riskEngine.position_store import PositionStore
+
+LIMIT = 1000.0
+
+
+class FakeSurfaces:
+    def stale(self, assets):
+        return []
+
+
+@pytest.fixture
+def book(monkeypatch):
+    exposures = {}
+    store = PositionStore()
+    sent = []
+
+    async def send_alert(bot, user_id, text):
+        sent.append((user_id, text.split("!")[0]))
+
+    monkeypatch.setattr(monitor, "positions", store)
+    monkeypatch.setattr(monitor, "send_alert", send_alert)
+    monkeypatch.setattr(vol_surface, "surfaces", FakeSurfaces())
+    monkeypatch.setattr(vol_surface, "option_book",
+                        lambda items, spots: {"positions": {(u, a): exposures[(u, a)] for u, a, _ in items}})
+    return store, exposures, sent
+
+
+def _exposure(delta_usd, gamma_usd=0.0):
+    return {"delta_usd": delta_usd, "gamma_usd": gamma_usd, "delta_limit": LIMIT, "gamma_limit": LIMIT,
+            "option_delta": 0.1}
+
+
+def _tick(store):
+    evaluated = [(user_id, asset, position, 100.0) for user_id, asset, position in store.items()]
+    asyncio.run(monitor.check_option_risks(None, evaluated))
+
+
+def test_a_breach_is_alerted_once_until_it_clears(book):
+    store, exposures, sent = book
+    store.put(1, "BTC", Position.open("BTC", 100.0, 1.0, 5))
+
+    exposures[(1, "BTC")] = _exposure(5000.0)
+    _tick(store)
+    _tick(store)
+    assert sent == [(1, "⚠ Options Delta Alert for BTC")]
+    assert store.get(1, "BTC").greek_alerts == ["delta"]
+
+    exposures[(1, "BTC")] = _exposure(5000.0, gamma_usd=-2000.0)
+    _tick(store)
+    assert sent[1:] == [(1, "⚠ Options Gamma Alert for BTC")]
+
+    exposures[(1, "BTC")] = _exposure(10.0)
+    _tick(store)
+    assert store.get(1, "BTC").greek_alerts == []
+
+    exposures[(1, "BTC")] = _exposure(5000.0)
+    _tick(store)
+    assert len(sent) == 3
+
+
+def test_flags_go_away_with_the_position(book):
+    store, exposures, sent = book
+    store.put(1, "BTC", Position.open("BTC", 100.0, 1.0, 5))
+    exposures[(1, "BTC")] = _exposure(5000.0)
+    _tick(store)
+
+    store.remove(1, "BTC")
+    store.put(1, "BTC", Position.open("BTC", 100.0, 1.0, 5))  # A new position alerts afresh.
+    _tick(store)
+    assert len(sent) == 2
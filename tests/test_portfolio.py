@@ -0,0 +1,53 @@
+"""
+/monitor_portfolio: parsing and the per-asset summary.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from riskEngine.position_store import PositionStore
+from TeligramBot import handlers
+
+
+class FakeMessage:
+    def __init__(self, text):
+        self.text = text
+        self.document = None
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = PositionStore()
+    monkeypatch.setattr(handlers, "positions", store)
+    return store
+
+
+def _send(text):
+    message = FakeMessage(text)
+    update = SimpleNamespace(effective_user=SimpleNamespace(id=1), message=message)
+    asyncio.run(handlers.monitor_portfolio(update, SimpleNamespace(args=[])))
+    return message.replies[-1]
+
+
+def test_parse_portfolio_reports_bad_rows():
+    rows, errors = handlers.parse_portfolio("asset,size,threshold\nBTC 0.5 10\neth;4;15\nSOL 1\nBTC 1 5\nXRP 1 -3")
+    assert rows == {"BTC": (0.5, 10.0), "ETH": (4.0, 15.0)}
+    assert [e.split(":")[0] for e in errors] == ["line 4", "line 5", "line 6 (XRP)"]
+
+
+def test_unusable_prices_skip_only_that_asset(store, monkeypatch):
+    monkeypatch.setattr(handlers, "get_spot_prices",
+                        lambda assets: {"BTC": 60000.0, "ETH": float("nan"), "XRP": 0.0})
+    reply = _send("/monitor_portfolio\nBTC 0.5 10\nETH 4 15\nXRP 100 20\nSOL 3 10")
+
+    assert store.keys() == [(1, "BTC")]
+    assert "Monitoring started for 1 of 4 assets." in reply
+    assert "ETH: Entry price must be a positive number." in reply
+    assert "XRP: Entry price must be a positive number." in reply
+    assert "SOL: no price available" in reply
@@ -0,0 +1,83 @@
+"""
+Position stores: nested and concurrent edit(), on both backends.
+"""
+
+import threading
+
+import pytest
+
+from riskEngine.position import Position
+from riskEngine.position_store import PositionStore
+from riskEngine.sqlite_store import SQLitePositionStore
+
+THREADS = 8
+EDITS = 25
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return PositionStore(stripes=4)
+    return SQLitePositionStore(str(tmp_path / "state.db"))
+
+
+def _open(asset, price=100.0):
+    return Position.open(asset, price, 1.0, 5, time_ms=0)
+
+
+def test_nested_edits_of_one_user_keep_both_changes(store):
+    store.put_many(1, {"BTC": _open("BTC"), "ETH": _open("ETH")})
+    with store.edit(1, "BTC") as btc:
+        with store.edit(1, "ETH") as eth:  # Same user: the lock / transaction is re-entered.
+            eth.auto_hedge = True
+        btc.record_price(101.0, time_ms=1)
+    assert store.get(1, "ETH").auto_hedge
+    assert list(store.get(1, "BTC").prices.prices) == [100.0, 101.0]
+
+
+def test_edit_of_a_missing_position_yields_none(store):
+    with store.edit(1, "BTC") as position:
+        assert position is None
+    assert not store.has(1)
+
+
+def test_concurrent_edits_lose_no_updates(store):
+    store.put(1, "BTC", _open("BTC"))
+    store.put(2, "BTC", _open("BTC"))
+
+    def worker(n):
+        for i in range(EDITS):
+            with store.edit(1 + n % 2, "BTC") as position:
+                position.hedge_logs.append({"time": str(i), "worker": n})
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(store.get(1, "BTC").hedge_logs) == THREADS // 2 * EDITS
+    assert len(store.get(2, "BTC").hedge_logs) == THREADS // 2 * EDITS
+
+
+def test_snapshot_survives_concurrent_membership_changes():
+    store = PositionStore(stripes=4)
+    store.load({user: {"BTC": _open("BTC")} for user in range(50)})
+    stop = threading.Event()
+
+    def churn():
+        n = 0
+        while not stop.is_set():
+            store.put(1000 + n % 10, "ETH", _open("ETH"))
+            store.remove(1000 + (n + 5) % 10)
+            n += 1
+
+    thread = threading.Thread(target=churn)
+    thread.start()
+    try:
+        for _ in range(200):
+            seen = list(store.items())  # Must not raise "changed size during iteration".
+            assert sum(1 for user, asset, _ in seen if asset == "BTC") == 50
+    finally:
+        stop.set()
+        thread.join()
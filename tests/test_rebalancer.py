@@ -0,0 +1,61 @@
+"""
+Rebalancer: net deltas, proposals and order placement.
+"""
+
+from riskEngine import rebalancer
+from riskEngine.position import Position
+from riskEngine.position_store import PositionStore
+
+
+def _store():
+    store = PositionStore()
+    store.put(1, "BTC", Position("BTC", 60000.0, 1.0, 5))
+    return store
+
+
+def test_rebalance_proposes_a_sell_for_a_long_book():
+    store = _store()
+    proposals = rebalancer.rebalance(store.items(), {"BTC": 60000.0}, band_usd=1000)
+    assert proposals[1]["net_usd"] == 60000.0
+    assert [(o["asset"], o["side"], o["size"]) for o in proposals[1]["orders"]] == [("BTC", "sell", 1.0)]
+
+
+def test_unpriced_assets_are_listed_as_left_out():
+    store = _store()
+    store.put(1, "ETH", Position("ETH", 3000.0, 10.0, 5))
+    proposal = rebalancer.rebalance(store.items(), {"BTC": 60000.0}, band_usd=1000)[1]
+    assert proposal["net_usd"] == 60000.0
+    assert proposal["assets"] == {"BTC": 1.0}
+    assert proposal["unpriced"] == ["ETH"]
+    assert "Not included, no price: ETH" in rebalancer.format_proposal(proposal, 1000)
+
+
+def test_execute_places_orders_on_the_perp_and_logs_them():
+    store = _store()
+    orders = rebalancer.rebalance(store.items(), {"BTC": 60000.0}, band_usd=1000)[1]["orders"]
+    looked_up, placed = [], []
+
+    def product_id(symbol):
+        looked_up.append(symbol)
+        return {"BTCUSD": 27}.get(symbol)
+
+    def place_hedge_order(product, size, price, side="sell"):
+        placed.append((product, size, price, side))
+        return {"id": "o-1", "state": "open"}
+
+    results = rebalancer.execute(1, orders, store, product_id, place_hedge_order)
+
+    assert looked_up == ["BTCUSD"]
+    assert placed == [(27, 1.0, 60000.0, "sell")]
+    assert not results[0][1].get("error")
+    log = store.get(1, "BTC").hedge_logs[-1]
+    assert (log["order_id"], log["side"], log["size"]) == ("o-1", "SELL", 1.0)
+    # The placed hedge now offsets the spot position.
+    assert rebalancer.rebalance(store.items(), {"BTC": 60000.0}, band_usd=1000)[1]["orders"] == []
+
+
+def test_execute_reports_unknown_products():
+    store = _store()
+    orders = rebalancer.rebalance(store.items(), {"BTC": 60000.0}, band_usd=1000)[1]["orders"]
+    results = rebalancer.execute(1, orders, store, lambda symbol: None, None)
+    assert results[0][1] == {"error": "Unknown product", "details": "BTCUSD"}
@@ -0,0 +1,116 @@
+"""
+Circuit breaker transitions and how `call` retries around them.
+"""
+
+import threading
+import time
+
+import pytest
+import requests
+
+from exchanges import resilience
+from exchanges.resilience import CircuitBreaker, CircuitOpenError
+
+RESET = 0.1  # Seconds; short so the open -> half-open wait is quick.
+
+
+def _tripped(failures=3):
+    circuit = CircuitBreaker("test", failure_threshold=failures, reset_timeout=RESET)
+    for _ in range(failures):
+        assert circuit.allow()
+        circuit.record_failure()
+    return circuit
+
+
+def test_consecutive_failures_open_the_circuit():
+    circuit = CircuitBreaker("test", failure_threshold=3, reset_timeout=RESET)
+    circuit.record_failure()
+    circuit.record_failure()
+    circuit.record_success()  # A success in between starts the count again.
+    circuit.record_failure()
+    assert circuit.state == "closed"
+
+    circuit = _tripped()
+    assert circuit.state == "open"
+    assert not circuit.allow()
+
+
+def test_half_open_allows_exactly_one_trial():
+    circuit = _tripped()
+    time.sleep(RESET * 1.5)
+    assert circuit.allow()
+    assert circuit.state == "half_open"
+    assert not circuit.allow()  # The trial is still in flight.
+
+
+def test_successful_trial_closes_the_circuit():
+    circuit = _tripped()
+    time.sleep(RESET * 1.5)
+    assert circuit.allow()
+    circuit.record_success()
+    assert circuit.state == "closed"
+    assert circuit.failures == 0
+    assert circuit.allow()
+
+
+def test_failed_trial_reopens_for_another_timeout():
+    circuit = _tripped()
+    time.sleep(RESET * 1.5)
+    assert circuit.allow()
+    circuit.record_failure()
+    assert circuit.state == "open"
+    assert circuit.times_opened == 1  # Re-opening from half-open is the same outage.
+    assert not circuit.allow()
+    time.sleep(RESET * 1.5)
+    assert circuit.allow()
+
+
+def test_concurrent_callers_get_one_trial():
+    circuit = _tripped()
+    time.sleep(RESET * 1.5)
+    allowed = []
+    threads = [threading.Thread(target=lambda: allowed.append(circuit.allow())) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert allowed.count(True) == 1
+
+
+def _flaky(errors):
+    calls = []
+
+    def fn(timeout):
+        calls.append(timeout)
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+    return fn, calls
+
+
+def test_call_retries_transient_errors():
+    fn, calls = _flaky([requests.exceptions.ConnectionError("reset")])
+    assert resilience.call("test-retry", "tickers", fn, retries=2) == "ok"
+    assert len(calls) == 2
+    assert resilience.breaker("test-retry").state == "closed"
+
+
+def test_call_does_not_retry_request_errors():
+    response = requests.Response()
+    response.status_code = 404
+    fn, calls = _flaky([requests.exceptions.HTTPError(response=response)])
+    with pytest.raises(requests.exceptions.HTTPError):
+        resilience.call("test-404", "tickers", fn, retries=2)
+    assert len(calls) == 1
+    assert resilience.breaker("test-404").failures == 0
+
+
+def test_open_circuit_fails_fast():
+    host = "test-open"
+    circuit = resilience.breaker(host)
+    for _ in range(circuit.failure_threshold):
+        circuit.record_failure()
+    fn, calls = _flaky([])
+    with pytest.raises(CircuitOpenError):
+        resilience.call(host, "tickers", fn)
+    assert calls == []
@@ -0,0 +1,76 @@
+"""
+Retention tiers: where compact() draws the line between raw, 5-minute and hourly.
+"""
+
+import numpy as np
+import pytest
+
+from riskEngine import retention
+from riskEngine.position import Position
+from riskEngine.retention import BAR_1H, BAR_5M, DAY_MS, HOUR_MS, MINUTE_MS
+
+
+@pytest.fixture(autouse=True)
+def tiers(monkeypatch):
+    monkeypatch.setattr(retention, "RAW_RETENTION", HOUR_MS)
+    monkeypatch.setattr(retention, "RAW_MIN_POINTS", 0)
+    monkeypatch.setattr(retention, "BARS_5M_RETENTION", DAY_MS)
+    monkeypatch.setattr(retention, "BARS_1H_RETENTION", 2 * DAY_MS)
+
+
+def _position(minutes: int):
+    """One sample a minute from t=0, oscillating so every bar has a distinct high and low."""
+    times = np.arange(minutes + 1) * MINUTE_MS
+    prices = 100 + 10 * np.sin(np.arange(minutes + 1) / 7)
+    position = Position("BTC", prices[0], 1.0, 5)
+    for t, p in zip(times, prices):
+        position.record_price(p, int(t))
+    return position, times, prices
+
+
+def test_raw_samples_before_the_cutoff_become_5m_bars():
+    position, times, prices = _position(180)
+    moved = retention.compact(position, now=2 * HOUR_MS + 2 * MINUTE_MS)  # Cutoff: 1h, bucket aligned.
+
+    assert moved == 60
+    assert position.prices.times[0] == HOUR_MS  # The sample at the cutoff stays raw.
+    bars = position.bars_5m.bars
+    assert len(bars) == 12
+    np.testing.assert_array_equal(bars[:, 0], np.arange(12) * BAR_5M)
+    first = prices[:5]
+    np.testing.assert_allclose(bars[0, 1:], [first[0], first.max(), first.min(), first[-1]])
+
+
+def test_raw_min_points_never_splits_a_bucket(monkeypatch):
+    monkeypatch.setattr(retention, "RAW_MIN_POINTS", 58)
+    position, _, _ = _position(120)
+    retention.compact(position, now=3 * HOUR_MS)  # Cutoff 2h, but only 63 samples may go.
+
+    # The 63rd sample is in the 60-minute bucket, so that whole bucket stays raw.
+    assert position.prices.times[0] == HOUR_MS
+    assert len(position.prices) == 61
+    assert position.bars_5m.bars[-1, 0] == HOUR_MS - BAR_5M
+
+
+def test_compacting_again_moves_nothing():
+    position, _, _ = _position(180)
+    now = 2 * HOUR_MS + 2 * MINUTE_MS
+    retention.compact(position, now=now)
+    assert retention.compact(position, now=now) == 0
+    assert retention.compact(position, now=now + 2 * MINUTE_MS) == 0  # Still inside the same bucket.
+
+
+def test_every_tier_boundary_in_one_pass():
+    position, _, prices = _position(3 * 24 * 60)
+    now = 3 * DAY_MS
+    retention.compact(position, now=now)
+
+    assert position.prices.times[0] == now - HOUR_MS
+    assert position.bars_5m.bars[0, 0] == 2 * DAY_MS
+    assert position.bars_5m.bars[-1, 0] == now - HOUR_MS - BAR_5M
+    hourly = position.bars_1h.bars
+    np.testing.assert_array_equal(hourly[:, 0], DAY_MS + np.arange(24) * BAR_1H)  # Day 0 dropped.
+
+    # An hourly bar keeps the extremes of the raw samples it replaced.
+    hour = prices[24 * 60:25 * 60]
+    np.testing.assert_allclose(hourly[0, 1:], [hour[0], hour.max(), hour.min(), hour[-1]])
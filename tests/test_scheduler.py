@@ -0,0 +1,50 @@
+"""
+Adaptive monitor scheduling: interval clamps and the due-time heap.
+"""
+
+import pytest
+
+from riskEngine.scheduler import MonitorScheduler, next_interval
+
+LIMITS = dict(min_interval=5, max_interval=600, base_interval=60, sigmas=3.0)
+
+
+def test_close_to_the_threshold_clamps_to_the_minimum():
+    assert next_interval(4.99, 5, 1e-3, **LIMITS) == 5
+
+
+def test_far_from_the_threshold_clamps_to_the_maximum():
+    assert next_interval(0, 50, 1e-6, **LIMITS) == 600
+
+
+def test_interval_in_between_follows_the_sigma_rule():
+    # 10% away at 3 sigma of 3e-3 per sqrt(second): (0.1 / 9e-3) ** 2, about two minutes.
+    assert next_interval(0, 10, 3e-3, **LIMITS) == pytest.approx((0.1 / 9e-3) ** 2)
+
+
+def test_breached_positions_keep_the_base_cadence():
+    assert next_interval(7, 5, 1e-3, **LIMITS) == 60
+
+
+@pytest.mark.parametrize("volatility", [None, 0.0, float("nan"), float("inf")])
+def test_unknown_volatility_uses_the_base_interval(volatility):
+    assert next_interval(0, 10, volatility, **LIMITS) == 60
+    assert next_interval(0, 10, volatility, **dict(LIMITS, max_interval=30)) == 30
+
+
+def test_scheduler_pops_due_keys_and_forgets_removed_ones():
+    now = [0.0]
+    scheduler = MonitorScheduler(clock=lambda: now[0], base_interval=60, min_interval=5, max_interval=600)
+    scheduler.sync({1: {"BTC": None, "ETH": None}})
+    assert sorted(scheduler.pop_due()) == [(1, "BTC"), (1, "ETH")]
+
+    scheduler.reschedule((1, "BTC"), None)  # No price: retried after the minimum interval.
+    scheduler.reschedule((1, "ETH"), {"drop_percent": 0, "threshold": 50, "volatility": 1e-6})
+    now[0] = 5
+    assert scheduler.pop_due() == [(1, "BTC")]
+
+    scheduler.sync({1: {"BTC": None}})  # ETH stopped.
+    now[0] = 1000
+    scheduler.reschedule((1, "ETH"), None)
+    assert scheduler.pop_due() == []
+    assert len(scheduler) == 1
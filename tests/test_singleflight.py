@@ -0,0 +1,127 @@
+"""
+Single-flight coalescing: one upstream call per key, shared by concurrent callers.
+"""
+
+import threading
+import time
+
+import pytest
+
+from exchanges.singleflight import SingleFlight, coalesced
+
+CALLERS = 16
+SETTLE = 0.2  # Seconds for every caller to reach the in-flight call before it is released.
+
+
+def _slow_upstream(release: threading.Event, result="price", error=None):
+    calls = []
+
+    def fn(key):
+        calls.append(key)
+        release.wait(timeout=5)
+        if error is not None:
+            raise error
+        return f"{result}:{key}"
+    return fn, calls
+
+
+def _run_concurrently(target, n=CALLERS):
+    results, errors = [], []
+
+    def run():
+        try:
+            results.append(target())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    time.sleep(SETTLE)
+    return threads, results, errors
+
+
+def _join(threads):
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight(name="test")
+    release = threading.Event()
+    fn, calls = _slow_upstream(release)
+    threads, results, errors = _run_concurrently(lambda: flight.do("BTC", fn, "BTC"))
+    release.set()
+    _join(threads)
+
+    assert calls == ["BTC"]
+    assert results == ["price:BTC"] * CALLERS
+    assert errors == []
+
+
+def test_different_keys_do_not_wait_for_each_other():
+    flight = SingleFlight(name="test")
+    release = threading.Event()
+    fn, calls = _slow_upstream(release)
+    threads, _, _ = _run_concurrently(lambda: flight.do("BTC", fn, "BTC"), n=2)
+    assert flight.do("ETH", lambda key: f"fast:{key}", "ETH") == "fast:ETH"  # BTC is still in flight.
+    release.set()
+    _join(threads)
+
+
+def test_errors_are_shared_but_not_cached():
+    flight = SingleFlight(ttl=60, name="test")
+    release = threading.Event()
+    fn, calls = _slow_upstream(release, error=ConnectionError("venue down"))
+    threads, results, errors = _run_concurrently(lambda: flight.do("BTC", fn, "BTC"))
+    release.set()
+    _join(threads)
+
+    assert len(calls) == 1
+    assert results == [] and len(errors) == CALLERS
+    assert all(e is errors[0] for e in errors)
+    assert flight.do("BTC", lambda key: "recovered", "BTC") == "recovered"
+
+
+def test_results_are_reused_within_the_ttl_only():
+    flight = SingleFlight(ttl=60, name="test")
+    calls = []
+
+    def fn(key):
+        calls.append(key)
+        return len(calls)
+
+    assert flight.do("BTC", fn, "BTC") == 1
+    assert flight.do("BTC", fn, "BTC") == 1
+    flight.forget("BTC")
+    assert flight.do("BTC", fn, "BTC") == 2
+
+    no_cache = SingleFlight(ttl=0, name="test")
+    assert no_cache.do("BTC", fn, "BTC") == 3
+    assert no_cache.do("BTC", fn, "BTC") == 4
+
+
+def test_coalesced_keys_on_the_arguments():
+    calls = []
+
+    @coalesced(ttl=60, name="test")
+    def mark_price(asset, venue=None):
+        calls.append((asset, venue))
+        return len(calls)
+
+    assert mark_price("BTC") == mark_price("BTC") == 1
+    assert mark_price("BTC", venue="delta") == 2
+    assert mark_price("ETH") == 3
+    mark_price.flight.forget()
+    assert mark_price("BTC") == 4
+
+
+@pytest.mark.parametrize("ttl", [0, 60])
+def test_a_failed_leader_lets_the_next_caller_retry(ttl):
+    def fail():
+        raise ValueError("bad")
+
+    flight = SingleFlight(ttl=ttl, name="test")
+    with pytest.raises(ValueError):
+        flight.do("BTC", fail)
+    assert flight.do("BTC", lambda: "ok") == "ok"
@@ -0,0 +1,20 @@
+"""
+Startup regression tests: the bot must stay ready to poll within
+STARTUP_BUDGET, without importing the heavy dependencies on the way.
+"""
+
+import statistics
+
+from observability import startup
+
+HEAVY_MODULES = ("scipy", "pandas", "sklearn", "joblib", "matplotlib")
+
+
+def test_time_to_first_poll_within_budget():
+    result = startup.profile(runs=3)
+    assert statistics.median(result["ready_s"]) < startup.BUDGET, result["ready_s"]
+
+
+def test_heavy_dependencies_not_imported_at_startup():
+    imported = {module.split(".")[0] for _, _, module in startup.profile(runs=1)["imports"]}
+    assert not imported.intersection(HEAVY_MODULES)
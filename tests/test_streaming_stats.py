@@ -0,0 +1,67 @@
+"""
+Streaming EW statistics against a weighted np.cov of the same fixed series.
+"""
+
+import numpy as np
+import pytest
+
+from riskEngine import streaming_stats
+from riskEngine.streaming_stats import StreamingStats
+
+INTERVAL = 60.0
+HALF_LIFE = 3000.0
+SYMBOLS = ("A", "B", "C")
+COV = [[1e-4, 5e-5, 0.0], [5e-5, 2e-4, -3e-5], [0.0, -3e-5, 5e-5]]
+
+
+@pytest.fixture(scope="module")
+def returns():
+    return np.random.default_rng(3).multivariate_normal(np.zeros(3), COV, 400)
+
+
+def _feed(returns, stats):
+    prices = 100 * np.exp(np.vstack([np.zeros(len(SYMBOLS)), np.cumsum(returns, axis=0)]))
+    for t, row in enumerate(prices):
+        snapshot = stats.update(dict(zip(SYMBOLS, row)), now=INTERVAL * t)
+    return snapshot
+
+
+def test_ew_covariance_matches_weighted_np_cov(returns):
+    snapshot = _feed(returns, StreamingStats(half_lives=(HALF_LIFE,), interval=INTERVAL))
+
+    # The recursion weighs sample t by a (1 - a)^(T - t), plus the zero it
+    # starts from by (1 - a)^T.
+    a = 1 - 0.5 ** (INTERVAL / HALF_LIFE)
+    n = len(returns)
+    weights = np.concatenate([[(1 - a) ** n], a * (1 - a) ** np.arange(n - 1, -1, -1)])
+    samples = np.vstack([np.zeros(len(SYMBOLS)), returns])
+    expected = np.cov(samples.T, aweights=weights, ddof=0)
+
+    np.testing.assert_allclose(snapshot.cov[0], expected, rtol=1e-9, atol=1e-15)
+    np.testing.assert_allclose(snapshot.mean[0], weights @ samples / weights.sum(), rtol=1e-9, atol=1e-15)
+
+
+def test_half_lives_are_tracked_side_by_side(returns):
+    both = _feed(returns, StreamingStats(half_lives=(HALF_LIFE, 10 * HALF_LIFE), interval=INTERVAL))
+    short = _feed(returns, StreamingStats(half_lives=(HALF_LIFE,), interval=INTERVAL))
+    np.testing.assert_allclose(both.covariance(half_life=HALF_LIFE), short.covariance())
+    assert not np.allclose(both.cov[0], both.cov[1])
+
+
+def test_nothing_is_reported_before_min_samples(returns):
+    stats = StreamingStats(half_lives=(HALF_LIFE,), interval=INTERVAL)
+    snapshot = _feed(returns[:streaming_stats.MIN_SAMPLES - 1], stats)
+    assert snapshot.volatility("A") is None
+    assert snapshot.portfolio_var({"A": 1000.0}) is None
+
+    snapshot = stats.update({"A": 100.0, "B": 100.0, "C": 100.0}, now=INTERVAL * streaming_stats.MIN_SAMPLES)
+    assert snapshot.volatility("A") is not None
+    np.testing.assert_allclose(np.diag(snapshot.correlation()), 1.0)
+
+
+def test_published_snapshots_do_not_change(returns):
+    stats = StreamingStats(half_lives=(HALF_LIFE,), interval=INTERVAL)
+    before = _feed(returns[:50], stats)
+    cov = before.cov.copy()
+    stats.update({"A": 1.0, "B": 1.0, "C": 1.0}, now=INTERVAL * 100)
+    np.testing.assert_array_equal(before.cov, cov)
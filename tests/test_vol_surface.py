@@ -0,0 +1,83 @@
+"""
+IV surface interpolation: log-moneyness within an expiry, total variance between expiries.
+"""
+
+import numpy as np
+import pytest
+
+from riskEngine.vol_surface import YEAR_MS, SurfaceCache, VolSurface
+
+DAY_MS = 24 * 3600 * 1000
+NOW = 1_700_000_000_000
+SPOT = 100.0
+T1, T2, T3 = NOW + 30 * DAY_MS, NOW + 90 * DAY_MS, NOW + 180 * DAY_MS
+
+
+def _flat(iv):
+    return np.array([-1.0, 1.0]), np.array([iv, iv])
+
+
+@pytest.fixture
+def surface():
+    return VolSurface({T1: _flat(0.5), T2: _flat(0.7), T3: _flat(0.6)}, SPOT, NOW)
+
+
+def _years(expiry):
+    return (expiry - NOW) / YEAR_MS
+
+
+def test_between_expiries_total_variance_is_linear_in_time(surface):
+    for t_ms, (lo, iv_lo), (hi, iv_hi) in ((NOW + 60 * DAY_MS, (T1, 0.5), (T2, 0.7)),
+                                          (NOW + 100 * DAY_MS, (T2, 0.7), (T3, 0.6))):
+        t, t_lo, t_hi = _years(t_ms), _years(lo), _years(hi)
+        weight = (t - t_lo) / (t_hi - t_lo)
+        variance = iv_lo ** 2 * t_lo + weight * (iv_hi ** 2 * t_hi - iv_lo ** 2 * t_lo)
+        assert surface.iv([SPOT], [t_ms], SPOT, NOW)[0] == pytest.approx(np.sqrt(variance / t))
+
+
+def test_listed_expiries_return_their_own_slice(surface):
+    np.testing.assert_allclose(surface.iv([SPOT] * 3, [T1, T2, T3], SPOT, NOW), [0.5, 0.7, 0.6])
+
+
+def test_outside_the_listed_expiries_the_nearest_slice_is_used(surface):
+    ivs = surface.iv([SPOT, SPOT, SPOT], [NOW + DAY_MS, NOW + 400 * DAY_MS, NOW - DAY_MS], SPOT, NOW)
+    assert ivs[0] == pytest.approx(0.5)
+    assert ivs[1] == pytest.approx(0.6)
+    assert np.isnan(ivs[2])  # Already expired.
+
+
+def test_within_an_expiry_iv_is_linear_in_log_moneyness():
+    surface = VolSurface({T1: (np.array([np.log(0.8), np.log(1.25)]), np.array([0.8, 0.6]))}, SPOT, NOW)
+    strikes = [SPOT, 50.0, 200.0]
+    ivs = surface.iv(strikes, [T1] * 3, SPOT, NOW)
+    weight = (0.0 - np.log(0.8)) / (np.log(1.25) - np.log(0.8))
+    assert ivs[0] == pytest.approx(0.8 + weight * (0.6 - 0.8))
+    np.testing.assert_allclose(ivs[1:], [0.8, 0.6])  # Flat past the listed strikes.
+
+
+def test_from_chain_takes_the_out_of_the_money_leg():
+    chain = [
+        {"expiry": T1, "strike": 90.0, "type": "put", "iv": 0.9},
+        {"expiry": T1, "strike": 90.0, "type": "call", "iv": 0.1},
+        {"expiry": T1, "strike": 110.0, "type": "call", "iv": 0.4},
+        {"expiry": T1, "strike": 110.0, "type": "put", "iv": 0.2},
+    ]
+    k, iv = VolSurface.from_chain(SPOT, chain, NOW).slices[T1]
+    np.testing.assert_allclose(k, np.log([0.9, 1.1]))
+    np.testing.assert_allclose(iv, [0.9, 0.4])
+
+
+def test_failed_refresh_keeps_the_previous_surface_until_it_is_too_old():
+    answers = [(SPOT, [{"expiry": T1, "strike": SPOT, "type": "call", "iv": 0.5}])]
+
+    def fetch(asset):
+        if not answers:
+            raise ConnectionError("venue down")
+        return answers.pop()
+
+    cache = SurfaceCache(fetch, refresh_interval=60, max_staleness=600)
+    assert cache.refresh(["BTC"], NOW) == 1
+    assert cache.refresh(["BTC"], NOW + 30_000) == 0  # Not due yet.
+    assert cache.refresh(["BTC"], NOW + 60_000) == 0  # Due, but the download fails.
+    assert cache.get("BTC", NOW + 60_000) is not None
+    assert cache.get("BTC", NOW + 601_000) is None